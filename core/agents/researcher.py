@@ -2,7 +2,7 @@
 from __future__ import annotations
 from typing import Dict, List
 from core.web_search import web_search, fetch_text
-from core.crawler import crawl_site
+from core.crawler import crawl_sites
 
 def research(goal: str, extra_urls: list[str] | None = None, k: int = 5) -> dict:
     notes: List[str] = []
@@ -17,11 +17,12 @@ def research(goal: str, extra_urls: list[str] | None = None, k: int = 5) -> dict
             notes.append(txt[:2000])
             sources.append({"title": r.get("title",""), "url": url})
 
-    # قراءة الروابط المعطاة + زحف خفيف
-    for u in (extra_urls or []):
-        for item in crawl_site(u, max_pages=3):
+    # قراءة الروابط المعطاة + زحف خفيف (كل الروابط معاً بشكل متوازٍ، 3 صفحات لكل رابط)
+    # بلا استئناف: الصفحات المجلوبة في تشغيل سابق لا تُحفظ نصوصها فلا تعود في النتائج
+    if extra_urls:
+        for item in crawl_sites(extra_urls, max_pages=3 * len(extra_urls), pages_per_seed=3):
             notes.append(item["text"][:2000])
-            sources.append({"title": u, "url": item["url"]})
+            sources.append({"title": item["url"], "url": item["url"]})
 
     # موجز بسيط
     brief = []
@@ -1,80 +1,36 @@
 # core/brain.py — النواة الذكية المتقدمة
 from __future__ import annotations
 from typing import List, Tuple, Dict, Optional
+import asyncio
+import contextvars
 import logging
 import re
 from datetime import datetime
 
-from core.memory import search_memory, add_fact, save_conv, get_context
+from core.memory import search_memory, get_context
 from core.web_search import web_search, fetch_text, wiki_summary_ar
-from core.code_team import build_project
-from core.coder import generate_code
-from core.learn_loop import learn_from_conversation
+from core.intent_router import get_global_intent_router
+from core.message_analysis import MessageAnalysis
+from core.prewarm import get_global_answer_prewarmer
+from core.learner import get_global_learner
+from core.persistence import get_global_persistence_worker
+from core.tracing import get_global_tracer, span, traced
+from core.budget import RequestBudget, use_budget
+from utils.arabic_text import fold, STOPWORDS
+
+# مولّدا الأكواد والمشاريع اختياريان: تعذّر استيرادهما لا يعطّل المحادثة
+try:
+    from core.code_team import build_project
+except Exception:
+    build_project = None
+try:
+    from core.coder import generate_code
+except Exception:
+    generate_code = None
 
 # إعداد التسجيل
 logger = logging.getLogger(__name__)
 
-class IntentAnalyzer:
-    """محلل نوايا متقدم"""
-    
-    def __init__(self):
-        self.code_patterns = [
-            r"(اكتب|انشئ|اصنع|برمج)(.*)(كود|برنامج|دالة|سكريبت)",
-            r"(كود|برمجة|شفرة)\s+(ل|في)\s+",
-            r"(python|javascript|java|html|css|sql)\s+"
-        ]
-        
-        self.project_patterns = [
-            r"(ابني|انشئ|اصنع)(.*)(مشروع|نظام|تطبيق|موقع)",
-            r"(مشروع|تطبيق)\s+(ل|في)\s+",
-            r"(تصميم|برمجة)\s+(موقع|تطبيق)"
-        ]
-        
-        self.question_patterns = [
-            r"(ما هو|ماهو|ما هي|ماهي|كيف|لماذا|أين|متى)",
-            r"(شرح|تعريف|مفهوم)\s+",
-            r"(ما رأيك|ما تقول)\s+في"
-        ]
-
-    def analyze(self, text: str) -> Dict:
-        """تحليل النوايا مع تقييم الثقة"""
-        text = self._normalize_text(text)
-        
-        intents = []
-        
-        # تحليل النوايا
-        if self._matches_patterns(text, self.code_patterns):
-            intents.append({"type": "code", "confidence": 0.85})
-        
-        if self._matches_patterns(text, self.project_patterns):
-            intents.append({"type": "project", "confidence": 0.80})
-            
-        if self._matches_patterns(text, self.question_patterns):
-            intents.append({"type": "question", "confidence": 0.75})
-        
-        # إذا لم توجد نوايا واضحة
-        if not intents:
-            if len(text.split()) <= 4:
-                intents.append({"type": "small_talk", "confidence": 0.90})
-            else:
-                intents.append({"type": "general_search", "confidence": 0.70})
-        
-        # ترتيب حسب الثقة
-        intents.sort(key=lambda x: x["confidence"], reverse=True)
-        return intents[0] if intents else {"type": "unknown", "confidence": 0.5}
-
-    def _normalize_text(self, text: str) -> str:
-        """تنقية النص للتحليل"""
-        text = re.sub(r'[^\w\s]', ' ', text.lower())
-        return ' '.join(text.split())
-
-    def _matches_patterns(self, text: str, patterns: List[str]) -> bool:
-        """التحقق من تطابق الأنماط"""
-        for pattern in patterns:
-            if re.search(pattern, text):
-                return True
-        return False
-
 class ResponseGenerator:
     """مولد ردود ذكي"""
     
@@ -127,37 +83,86 @@ class ConversationManager:
         return self.context_history[-2:] if len(self.context_history) >= 2 else []
 
 # الكائنات العالمية
-intent_analyzer = IntentAnalyzer()
+intent_router = get_global_intent_router()
 response_generator = ResponseGenerator()
 conversation_manager = ConversationManager()
 
-def enhanced_chat_answer(q: str) -> Tuple[str, List[dict]]:
+# عند التسخين المسبق تُحسب الإجابة فقط دون حفظ محادثات أو حقائق
+_persist_enabled: contextvars.ContextVar[bool] = contextvars.ContextVar("brain_persist", default=True)
+
+def _remember_conv(q: str, response: str):
+    """حفظ المحادثة في الخلفية (إلا أثناء التسخين المسبق)"""
+    if _persist_enabled.get():
+        get_global_persistence_worker().submit_conversation(q, response)
+
+def _remember_fact(text: str, source: str):
+    """إضافة حقيقة إلى الذاكرة في الخلفية (إلا أثناء التسخين المسبق)"""
+    if _persist_enabled.get():
+        get_global_persistence_worker().submit_fact(text, source=source)
+
+# أقل ثقة لتنفيذ طلب كود/مشروع (الكلمات المفتاحية تعطي 0.85/0.80؛ ثقة المحلل الكامل أقل فيُعامل كبحث)
+ACTION_CONFIDENCE = 0.7
+
+# الميزانية الزمنية الافتراضية للطلب المتزامن بالثواني (عند عدم تمريرها من نقطة النهاية)
+CHAT_BUDGET_SECONDS = 8.0
+
+def enhanced_chat_answer(q: str, persist: bool = True,
+                         budget: Optional[RequestBudget] = None) -> Tuple[str, List[dict]]:
     """
     نسخة محسنة من chat_answer مع تحليل نوايا متقدم
+    persist=False: حساب الإجابة فقط (للتسخين المسبق) دون حفظ أو تسجيل حمل
+    budget: ميزانية الطلب؛ مراحل البحث والجلب تأخذ مهلها منها وتُتخطى عند نفادها
     """
     q = (q or "").strip()
     if not q:
         return "الرجاء إدخال سؤال أو طلب.", []
 
+    token = _persist_enabled.set(persist)
+    prewarmer = get_global_answer_prewarmer() if persist else None
+    if prewarmer:
+        prewarmer.request_started()
+    try:
+        with get_global_tracer().trace_request("chat"), \
+                use_budget(budget or RequestBudget(CHAT_BUDGET_SECONDS)):
+            if prewarmer:
+                # إجابة مسخّنة مسبقاً لسؤال شائع
+                with span("prewarm_lookup"):
+                    warm = prewarmer.lookup(q)
+                if warm:
+                    logger.info(f"🔥 إجابة مسخّنة: {q}")
+                    _remember_conv(q, warm[0])
+                    return warm
+            return _answer(q)
+    finally:
+        _persist_enabled.reset(token)
+        if prewarmer:
+            prewarmer.request_finished()
+
+def _answer(q: str) -> Tuple[str, List[dict]]:
+    """توجيه الرسالة حسب النوايا"""
     logger.info(f"معالجة رسالة: {q}")
+    message = MessageAnalysis.from_text(q)
 
     try:
-        # 1. تحليل النوايا
-        intent = intent_analyzer.analyze(q)
+        # 1. تحليل النوايا (الكلمات المفتاحية، ثم النموذج المتعلم، ثم التحليل الكامل)
+        with span("intent"):
+            intent = intent_router.route(q)
         logger.info(f"تم تحليل النوايا: {intent}")
+        if _persist_enabled.get():
+            get_global_learner().learn_from_message(q, {"intent": intent["type"], "topics": []}, "default")
 
         # 2. معالجة حسب النوايا
-        if intent["type"] == "code" and intent["confidence"] > 0.7:
+        if intent["type"] == "code" and intent["confidence"] > ACTION_CONFIDENCE:
             return handle_code_request(q, intent)
             
-        elif intent["type"] == "project" and intent["confidence"] > 0.7:
+        elif intent["type"] == "project" and intent["confidence"] > ACTION_CONFIDENCE:
             return handle_project_request(q, intent)
             
         elif intent["type"] == "question":
-            return handle_question_request(q, intent)
+            return handle_question_request(q, intent, message)
             
         else:
-            return handle_general_request(q, intent)
+            return handle_general_request(q, intent, message)
 
     except Exception as e:
         logger.error(f"خطأ في المعالجة: {e}")
@@ -165,8 +170,11 @@ def enhanced_chat_answer(q: str) -> Tuple[str, List[dict]]:
 
 def handle_code_request(q: str, intent: Dict) -> Tuple[str, List[dict]]:
     """معالجة طلبات الأكواد"""
+    if generate_code is None:
+        return response_generator.generate_fallback("code"), []
     try:
-        result = generate_code(q)
+        with span("generate_code"):
+            result = generate_code(q)
         
         if result and result.get("code"):
             code = result["code"]
@@ -180,8 +188,8 @@ def handle_code_request(q: str, intent: Dict) -> Tuple[str, List[dict]]:
                 response += f"```{lang}\n{code}\n```"
                 
                 # حفظ في الذاكرة
-                add_fact(f"كود {lang}: {title}", source="code_generation")
-                save_conv(q, response)
+                _remember_fact(f"كود {lang}: {title}", source="code_generation")
+                _remember_conv(q, response)
                 
                 return response, []
             else:
@@ -195,8 +203,11 @@ def handle_code_request(q: str, intent: Dict) -> Tuple[str, List[dict]]:
 
 def handle_project_request(q: str, intent: Dict) -> Tuple[str, List[dict]]:
     """معالجة طلبات المشاريع"""
+    if build_project is None:
+        return response_generator.generate_fallback("project"), []
     try:
-        result = build_project(q)
+        with span("build_project"):
+            result = build_project(q)
         
         if result.get("ok"):
             files = result.get("files", {})
@@ -216,9 +227,9 @@ def handle_project_request(q: str, intent: Dict) -> Tuple[str, List[dict]]:
             
             # حفظ في الذاكرة
             for filename in list(files.keys())[:3]:
-                add_fact(f"ملف مشروع: {filename}", source="project_builder")
+                _remember_fact(f"ملف مشروع: {filename}", source="project_builder")
             
-            save_conv(q, response)
+            _remember_conv(q, response)
             return response, []
         else:
             return response_generator.generate_fallback("project"), []
@@ -227,17 +238,17 @@ def handle_project_request(q: str, intent: Dict) -> Tuple[str, List[dict]]:
         logger.error(f"خطأ في بناء المشروع: {e}")
         return "حدث خطأ في بناء المشروع. حاول مرة أخرى.", []
 
-def handle_question_request(q: str, intent: Dict) -> Tuple[str, List[dict]]:
+def handle_question_request(q: str, intent: Dict, message: Optional[MessageAnalysis] = None) -> Tuple[str, List[dict]]:
     """معالجة الأسئلة والاستفسارات"""
     # البحث في الذاكرة أولاً
-    mem_results = search_memory(q, limit=8)
+    mem_results = search_memory(message or q, limit=8)
     mem_texts = [r["text"] for r in mem_results if r["score"] > 0.2]
     
     # إذا كانت الذاكرة كافية
     if mem_texts and any(r["score"] > 1.0 for r in mem_results):
         response = f"{response_generator.generate_opener('question')}\n"
         response += "\n".join([f"• {text}" for text in mem_texts[:3]])
-        save_conv(q, response)
+        _remember_conv(q, response)
         return response, []
 
     # البحث في الويب إذا لزم الأمر
@@ -256,9 +267,9 @@ def handle_question_request(q: str, intent: Dict) -> Tuple[str, List[dict]]:
                 # التعلم من المعلومات الجديدة
                 for info in useful_info[:2]:
                     if should_learn_info(info):
-                        add_fact(info, source="web_learning")
+                        _remember_fact(info, source="web_learning")
                 
-                save_conv(q, response)
+                _remember_conv(q, response)
                 return response, sources
 
     except Exception as e:
@@ -266,10 +277,10 @@ def handle_question_request(q: str, intent: Dict) -> Tuple[str, List[dict]]:
 
     return response_generator.generate_fallback("question"), []
 
-def handle_general_request(q: str, intent: Dict) -> Tuple[str, List[dict]]:
+def handle_general_request(q: str, intent: Dict, message: Optional[MessageAnalysis] = None) -> Tuple[str, List[dict]]:
     """معالجة الطلبات العامة"""
     # البحث المباشر في الذاكرة والويب
-    mem_results = search_memory(q, limit=5)
+    mem_results = search_memory(message or q, limit=5)
     mem_texts = [r["text"] for r in mem_results if r["score"] > 0.1]
     
     try:
@@ -283,7 +294,7 @@ def handle_general_request(q: str, intent: Dict) -> Tuple[str, List[dict]]:
             response += "\n".join([f"• {info}" for info in all_info[:5]])
             sources = [{"title": r.get("title", ""), "url": r.get("url", "")} for r in web_results[:3]] if web_results else []
             
-            save_conv(q, response)
+            _remember_conv(q, response)
             return response, sources
         else:
             return response_generator.generate_fallback("general_search"), []
@@ -305,6 +316,7 @@ def is_valid_code(code: str, lang: str) -> bool:
         
     return True
 
+@traced()
 def extract_useful_info(web_results: List[Dict]) -> List[str]:
     """استخراج المعلومات المفيدة من نتائج الويب"""
     useful_info = []
@@ -329,6 +341,151 @@ def should_learn_info(info: str) -> bool:
         
     return True
 
+# ---------- النسخة غير المتزامنة: بحث متوازٍ في الذاكرة والويب وويكيبيديا ----------
+
+_WIKI_SKIP_WORDS = frozenset(fold(w) for w in ["ما", "هو", "هي", "من", "اشرح", "شرح", "عرف", "تعريف", "معنى"])
+
+def _wiki_title(message: MessageAnalysis) -> str:
+    """عنوان مقال ويكيبيديا المحتمل: كلمات الرسالة بدون أدوات الاستفهام وكلمات التوقف"""
+    words = [w for w in message.normalized.split() if fold(w) not in STOPWORDS and fold(w) not in _WIKI_SKIP_WORDS]
+    return " ".join(words[:4])
+
+async def enhanced_chat_answer_async(q: str, deadline: float = 6.0, persist: bool = True,
+                                     budget: Optional[RequestBudget] = None) -> Tuple[str, List[dict]]:
+    """
+    نسخة غير متزامنة من enhanced_chat_answer: تطلق البحث في الذاكرة والويب وويكيبيديا معاً
+    ضمن ميزانية الطلب (أو deadline ثانية) وترجع فور توفر محتوى كافٍ وتلغي الباقي
+    """
+    q = (q or "").strip()
+    if not q:
+        return "الرجاء إدخال سؤال أو طلب.", []
+
+    token = _persist_enabled.set(persist)
+    prewarmer = get_global_answer_prewarmer() if persist else None
+    if prewarmer:
+        prewarmer.request_started()
+    try:
+        budget = budget or RequestBudget(deadline)
+        with get_global_tracer().trace_request("chat_async"), use_budget(budget):
+            if prewarmer:
+                with span("prewarm_lookup"):
+                    warm = prewarmer.lookup(q)
+                if warm:
+                    _remember_conv(q, warm[0])
+                    return warm
+
+            message = MessageAnalysis.from_text(q)
+            with span("intent"):
+                # التوجيه (قد يحمّل النموذج أو يدرّبه أول مرة) والتعلم خارج حلقة الأحداث
+                intent = await asyncio.to_thread(intent_router.route, q)
+                logger.info(f"تم تحليل النوايا: {intent}")
+                if _persist_enabled.get():
+                    await asyncio.to_thread(get_global_learner().learn_from_message,
+                                            q, {"intent": intent["type"], "topics": []}, "default")
+
+            # الأكواد والمشاريع لا تعتمد على البحث: تُنفَّذ في خيط منفصل
+            if intent["type"] == "code" and intent["confidence"] > ACTION_CONFIDENCE:
+                return await asyncio.to_thread(handle_code_request, q, intent)
+            if intent["type"] == "project" and intent["confidence"] > ACTION_CONFIDENCE:
+                return await asyncio.to_thread(handle_project_request, q, intent)
+
+            return await _answer_with_fan_out(q, intent, message, budget)
+
+    except Exception as e:
+        logger.error(f"خطأ في المعالجة: {e}")
+        return "حدث خطأ في المعالجة. الرجاء المحاولة مرة أخرى.", []
+    finally:
+        _persist_enabled.reset(token)
+        if prewarmer:
+            prewarmer.request_finished()
+
+async def _answer_with_fan_out(q: str, intent: Dict, message: MessageAnalysis,
+                               budget: RequestBudget) -> Tuple[str, List[dict]]:
+    """بحث متوازٍ مع خروج مبكر عند وجود محتوى كافٍ وإلغاء المهام المتبقية"""
+    is_question = intent["type"] == "question"
+    tasks = {
+        asyncio.create_task(asyncio.to_thread(search_memory, message, 8 if is_question else 5)): "memory",
+        asyncio.create_task(asyncio.to_thread(web_search, q, 5 if is_question else 4, 0)): "web",
+    }
+    title = _wiki_title(message)
+    if title:
+        tasks[asyncio.create_task(asyncio.to_thread(wiki_summary_ar, title))] = "wiki"
+
+    results: Dict[str, object] = {}
+    loop = asyncio.get_running_loop()
+    end_time = loop.time() + budget.remaining()
+    pending = set(tasks)
+    try:
+        while pending:
+            timeout = end_time - loop.time()
+            if timeout <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    results[tasks[task]] = task.result()
+                except Exception as e:
+                    logger.error(f"خطأ في مصدر {tasks[task]}: {e}")
+                    results[tasks[task]] = None
+            if _has_enough_content(results, is_question):
+                break
+    finally:
+        # إلغاء المصادر المتأخرة (الخيوط الجارية تنتهي في الخلفية وتُهمل نتائجها)
+        for task in pending:
+            task.cancel()
+
+    if pending:
+        logger.info(f"⏱️ خروج مبكر دون انتظار: {[tasks[t] for t in pending]}")
+        if budget.expired:
+            for task in pending:
+                budget.skip(tasks[task], "deadline")
+    return _compose_fan_out_answer(q, intent, results)
+
+def _has_enough_content(results: Dict[str, object], is_question: bool) -> bool:
+    """هل يكفي ما وصل حتى الآن لتكوين إجابة عالية الثقة"""
+    mem_results = results.get("memory") or []
+    if any(r["score"] > 1.0 for r in mem_results):
+        return True
+    web_results = results.get("web") or []
+    if len(extract_useful_info(web_results[:3])) >= 2:
+        return True
+    return is_question and bool(results.get("wiki"))
+
+def _compose_fan_out_answer(q: str, intent: Dict, results: Dict[str, object]) -> Tuple[str, List[dict]]:
+    """تكوين الإجابة من نتائج المصادر التي وصلت (بنفس صيغة النسخة المتزامنة)"""
+    is_question = intent["type"] == "question"
+    opener_type = "question" if is_question else "general_search"
+    mem_results = results.get("memory") or []
+    web_results = results.get("web") or []
+    wiki_text = results.get("wiki") or ""
+
+    mem_texts = [r["text"] for r in mem_results if r["score"] > (0.2 if is_question else 0.1)]
+    if is_question and mem_texts and any(r["score"] > 1.0 for r in mem_results):
+        response = f"{response_generator.generate_opener('question')}\n"
+        response += "\n".join([f"• {text}" for text in mem_texts[:3]])
+        _remember_conv(q, response)
+        return response, []
+
+    useful_info = extract_useful_info(web_results[:3])
+    if wiki_text:
+        useful_info.insert(0, wiki_text)
+    all_info = useful_info[:4] if is_question else (mem_texts + useful_info)[:5]
+    if not all_info:
+        return response_generator.generate_fallback(opener_type), []
+
+    response = f"{response_generator.generate_opener(opener_type)}\n"
+    response += "\n".join([f"• {info}" for info in all_info])
+    sources = [{"title": r.get("title", ""), "url": r.get("url", "")} for r in web_results[:3]]
+
+    # التعلم من المعلومات الجديدة
+    if is_question:
+        for info in useful_info[:2]:
+            if should_learn_info(info):
+                _remember_fact(info, source="web_learning")
+
+    _remember_conv(q, response)
+    return response, sources
+
 # دالة التوافق مع الإصدار السابق
 def chat_answer(q: str) -> Tuple[str, List[dict]]:
     """واجهة متوافقة مع الإصدار السابق"""
@@ -0,0 +1,70 @@
+# core/budget.py — ميزانية زمنية للطلب تُمرَّر عبر مراحل الإجابة (بحث، جلب، التقاط، توليد)
+from __future__ import annotations
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+# إعداد التسجيل
+logger = logging.getLogger(__name__)
+
+class RequestBudget:
+    """الوقت المتبقي للطلب: كل مرحلة تأخذ مهلتها منه وتتخطى نفسها عند نفاده"""
+
+    __slots__ = ("total", "start", "degraded")
+
+    def __init__(self, total: float):
+        self.total = total
+        self.start = time.monotonic()
+        self.degraded: List[Dict[str, Any]] = []
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.start
+
+    def remaining(self) -> float:
+        return max(0.0, self.total - self.elapsed())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def allows(self, seconds: float, reserve: float = 0.0) -> bool:
+        """هل يكفي المتبقي لمرحلة تحتاج seconds مع إبقاء reserve للمراحل اللاحقة"""
+        return self.remaining() - reserve >= seconds
+
+    def timeout(self, cap: float, reserve: float = 0.0) -> float:
+        """مهلة المرحلة: الأقل بين حدها الأقصى والمتبقي بعد حجز reserve"""
+        return max(0.0, min(cap, self.remaining() - reserve))
+
+    def skip(self, stage: str, reason: str = "budget"):
+        """تسجيل مرحلة تم تخطيها أو تقليصها بسبب الميزانية"""
+        self.degraded.append({"stage": stage, "reason": reason, "at": round(self.elapsed(), 3)})
+        logger.info(f"⏱️ تقليص المرحلة {stage}: {reason} (متبقٍ {self.remaining():.2f}s)")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total": self.total,
+            "elapsed": round(self.elapsed(), 3),
+            "remaining": round(self.remaining(), 3),
+            "degraded": list(self.degraded)
+        }
+
+
+_current_budget: contextvars.ContextVar[Optional[RequestBudget]] = contextvars.ContextVar("request_budget", default=None)
+
+def current_budget() -> Optional[RequestBudget]:
+    """ميزانية الطلب الجاري (تنتقل تلقائياً إلى asyncio.to_thread والمهام)"""
+    return _current_budget.get()
+
+@contextmanager
+def use_budget(budget: Optional[RequestBudget]) -> Iterator[Optional[RequestBudget]]:
+    """تفعيل ميزانية للطلب الحالي (None يُبقي الميزانية الموجودة)"""
+    if budget is None:
+        yield _current_budget.get()
+        return
+    token = _current_budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _current_budget.reset(token)
@@ -9,6 +9,8 @@ from datetime import datetime, timedelta
 from dataclasses import dataclass
 from enum import Enum
 
+from core.message_analysis import MessageAnalysis, KeywordGroups, DOMAIN_KEYWORDS
+
 # إعداد التسجيل
 logger = logging.getLogger(__name__)
 
@@ -87,20 +89,15 @@ class ContextManager:
         self.context_ttl = 3600  # ثانية واحدة
         
         # أنماط الكشف التلقائي
-        self.domain_patterns = {
-            "programming": [r"كود", r"برمجة", r"بايثون", r"جافا", r"html", r"css", r"سكريبت"],
-            "technology": [r"تقنية", r"تكنولوجيا", r"ذكاء", r"آلة", r"بيانات", r"سيرفر"],
-            "science": [r"علم", r"بحث", r"دراسة", r"نظرية", r"تجربة"],
-            "business": [r"تجارة", r"شركة", r"سوق", ر"ربح", ر"استثمار"],
-            "education": [r"تعلم", r"دراسة", ر"مدرسة", ر"جامعة", ر"تعليم"]
-        }
+        self.domain_patterns = DOMAIN_KEYWORDS
         
         logger.info(f"🚀 تم تهيئة مدير السياق للجلسة: {session_id}")
 
-    def add_conversation_turn(self, user_message: str, bot_response: str, metadata: Dict = None):
+    def add_conversation_turn(self, user_message: str | MessageAnalysis, bot_response: str, metadata: Dict = None):
         """إضافة دور محادثة جديد إلى التاريخ"""
+        message = MessageAnalysis.of(user_message)
         turn = {
-            "user": user_message,
+            "user": message.text,
             "bot": bot_response,
             "timestamp": time.time(),
             "metadata": metadata or {}
@@ -113,12 +110,13 @@ class ContextManager:
             self.conversation_history.pop(0)
         
         # تحديث السياق تلقائياً
-        self._auto_update_context(user_message, bot_response)
+        self._auto_update_context(message, bot_response)
         
         logger.debug(f"📝 تم إضافة دور محادثة ({len(self.conversation_history)} أدوار)")
 
-    def _auto_update_context(self, user_message: str, bot_response: str):
+    def _auto_update_context(self, user_message: str | MessageAnalysis, bot_response: str):
         """التحديث التلقائي للسياق بناءً على المحادثة"""
+        user_message = MessageAnalysis.of(user_message)
         
         # كشف المجال التلقائي
         detected_domains = self._detect_domains(user_message)
@@ -139,67 +137,50 @@ class ContextManager:
                 PriorityLevel.MEDIUM
             )
 
-    def _detect_domains(self, text: str) -> List[str]:
+    def _detect_domains(self, text: str | MessageAnalysis) -> List[str]:
         """كشف المجالات التلقائي من النص"""
-        detected = []
-        text_lower = text.lower()
-        
-        for domain, patterns in self.domain_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, text_lower):
-                    detected.append(domain)
-                    break
-        
-        return detected
+        return list(MessageAnalysis.of(text).match(self.domain_patterns))
 
-    def _extract_preferences(self, text: str) -> Dict[str, Any]:
+    # كشف مستوى التفصيل المفضل
+    DETAIL_INDICATORS = KeywordGroups({
+        "high_detail": [r"بالتفصيل", r"شرح مفصل", r"تفصيلي", r"كامل"],
+        "low_detail": [r"باختصار", r"ملخص", r"بشكل مختصر", r"سريع"]
+    })
+    
+    # كشف نوع المساعدة المفضلة
+    HELP_INDICATORS = KeywordGroups({
+        "practical": [r"عملي", r"تطبيقي", r"مثال", r"تنفيذ"],
+        "theoretical": [r"نظري", r"مفهوم", r"شرح", r"فهم"]
+    })
+    
+    EMOTIONAL_INDICATORS = KeywordGroups({
+        "frustration": [r"لا أفهم", r"لماذا", r"مشكلة", r"صعب", r"معقد"],
+        "satisfaction": [r"شكراً", r"ممتاز", r"رائع", r"جميل", r"أحسنت"],
+        "urgency": [r"بسرعة", r"عاجل", r"الآن", r"فوري"],
+        "confusion": [r"ماذا", r"كيف", r"أين", r"متى", r"لماذا"]
+    })
+
+    def _extract_preferences(self, text: str | MessageAnalysis) -> Dict[str, Any]:
         """استخراج تفضيلات المستخدم من النص"""
+        message = MessageAnalysis.of(text)
         preferences = {}
         
-        # كشف مستوى التفصيل المفضل
-        detail_indicators = {
-            "high_detail": [r"بالتفصيل", r"شرح مفصل", r"تفصيلي", r"كامل"],
-            "low_detail": [r"باختصار", r"ملخص", ر"بشكل مختصر", ر"سريع"]
-        }
-        
-        for level, indicators in detail_indicators.items():
-            for indicator in indicators:
-                if re.search(indicator, text.lower()):
-                    preferences["preferred_detail_level"] = level
-                    break
-        
-        # كشف نوع المساعدة المفضلة
-        help_indicators = {
-            "practical": [r"عملي", r"تطبيقي", ر"مثال", ر"تنفيذ"],
-            "theoretical": [r"نظري", ر"مفهوم", ر"شرح", ر"فهم"]
-        }
+        # المطابقة الأخيرة هي المعتمدة
+        detail_levels = message.match(self.DETAIL_INDICATORS)
+        if detail_levels:
+            preferences["preferred_detail_level"] = detail_levels[-1]
         
-        for help_type, indicators in help_indicators.items():
-            for indicator in indicators:
-                if re.search(indicator, text.lower()):
-                    preferences["preferred_help_type"] = help_type
-                    break
+        help_types = message.match(self.HELP_INDICATORS)
+        if help_types:
+            preferences["preferred_help_type"] = help_types[-1]
         
         return preferences
 
-    def _analyze_emotional_context(self, user_message: str, bot_response: str) -> Dict[str, Any]:
+    def _analyze_emotional_context(self, user_message: str | MessageAnalysis, bot_response: str) -> Dict[str, Any]:
         """تحليل السياق العاطفي"""
-        emotional_indicators = {
-            "frustration": [r"لا أفهم", r"لماذا", ر"مشكلة", ر"صعب", ر"معقد"],
-            "satisfaction": [r"شكراً", ر"ممتاز", ر"رائع", ر"جميل", ر"أحسنت"],
-            "urgency": [r"بسرعة", ر"عاجل", ر"الآن", ر"فوري"],
-            "confusion": [r"ماذا", ر"كيف", ر"أين", ر"متى", ر"لماذا"]
-        }
-        
-        emotional_state = "neutral"
-        confidence = 0.0
-        
-        for state, indicators in emotional_indicators.items():
-            for indicator in indicators:
-                if re.search(indicator, user_message.lower()):
-                    emotional_state = state
-                    confidence = 0.7
-                    break
+        states = MessageAnalysis.of(user_message).match(self.EMOTIONAL_INDICATORS)
+        emotional_state = states[-1] if states else "neutral"
+        confidence = 0.7 if states else 0.0
         
         if emotional_state != "neutral":
             return {
@@ -236,9 +217,10 @@ class ContextManager:
         logger.debug(f"➕ تم إضافة عنصر سياق: {context_type.value} (الأولوية: {priority.value})")
         return context_id
 
-    def get_relevant_context(self, query: str, limit: int = 10) -> List[ContextItem]:
+    def get_relevant_context(self, query: str | MessageAnalysis, limit: int = 10) -> List[ContextItem]:
         """الحصول على السياق ذي الصلة بالاستعلام"""
         self._cleanup_expired_context()
+        query = MessageAnalysis.of(query)
         
         relevant_items = []
         
@@ -252,16 +234,15 @@ class ContextManager:
         
         return [item for item, score in relevant_items[:limit]]
 
-    def _calculate_relevance(self, context_item: ContextItem, query: str) -> float:
+    def _calculate_relevance(self, context_item: ContextItem, query: str | MessageAnalysis) -> float:
         """حساب درجة صلة السياق بالاستعلام"""
         relevance_score = 0.0
         
         # البحث في محتوى السياق
         content_text = str(context_item.content).lower()
-        query_lower = query.lower()
         
         # مطابقة الكلمات الرئيسية
-        query_words = set(query_lower.split())
+        query_words = MessageAnalysis.of(query).token_set
         content_words = set(content_text.split())
         
         common_words = query_words.intersection(content_words)
@@ -313,9 +294,9 @@ class ContextManager:
         topic_indicators = {
             "برمجة": [r"كود", r"برمجة", r"بايثون", r"جافا", r"html"],
             "تقنية": [r"تقنية", r"تكنولوجيا", r"ذكاء", r"آلة"],
-            "تعلم": [r"تعلم", r"دراسة", ر"شرح", ر"فهم"],
-            "بحث": [r"بحث", ر"معلومات", ر"ما هو", ر"شرح"],
-            "مشروع": [r"مشروع", ر"تطبيق", ر"موقع", ر"برنامج"]
+            "تعلم": [r"تعلم", r"دراسة", r"شرح", r"فهم"],
+            "بحث": [r"بحث", r"معلومات", r"ما هو", r"شرح"],
+            "مشروع": [r"مشروع", r"تطبيق", r"موقع", r"برنامج"]
         }
         
         for topic, patterns in topic_indicators.items():
@@ -370,10 +351,12 @@ class ContextManager:
             ttl=7200  # انتهاء بعد ساعتين
         )
 
-    def get_comprehensive_context(self, query: str) -> Dict[str, Any]:
+    def get_comprehensive_context(self, query: str | MessageAnalysis) -> Dict[str, Any]:
         """الحصول على سياق شامل للاستعلام"""
+        message = MessageAnalysis.of(query)
+        query = message.text
         
-        relevant_context_items = self.get_relevant_context(query)
+        relevant_context_items = self.get_relevant_context(message)
         conversation_context = self.get_conversation_context()
         
         comprehensive_context = {
@@ -388,7 +371,7 @@ class ContextManager:
             "user_profile": self.user_profile,
             
             # سياق المجال
-            "domain_context": self._get_relevant_domains(query),
+            "domain_context": self._get_relevant_domains(message),
             
             # العناصر السياقية ذات الصلة
             "context_items": [item.to_dict() for item in relevant_context_items],
@@ -397,12 +380,12 @@ class ContextManager:
             "suggestions": self._generate_context_suggestions(query, relevant_context_items),
             
             # تحليل النوايا
-            "intent_analysis": self._analyze_intent_with_context(query, relevant_context_items)
+            "intent_analysis": self._analyze_intent_with_context(message, relevant_context_items)
         }
         
         return comprehensive_context
 
-    def _get_relevant_domains(self, query: str) -> Dict[str, Any]:
+    def _get_relevant_domains(self, query: str | MessageAnalysis) -> Dict[str, Any]:
         """الحصول على المجالات ذات الصلة بالاستعلام"""
         relevant_domains = {}
         detected_domains = self._detect_domains(query)
@@ -438,7 +421,7 @@ class ContextManager:
         
         return suggestions
 
-    def _analyze_intent_with_context(self, query: str, context_items: List[ContextItem]) -> Dict[str, Any]:
+    def _analyze_intent_with_context(self, query: str | MessageAnalysis, context_items: List[ContextItem]) -> Dict[str, Any]:
         """تحليل النوايا مع مراعاة السياق"""
         intent_analysis = {
             "primary_intent": "information_request",
@@ -457,7 +440,7 @@ class ContextManager:
                     intent_analysis["expected_response_type"] = item.content["preferred_help_type"]
         
         # تحليل النص
-        query_lower = query.lower()
+        query_lower = MessageAnalysis.of(query).lowered
         
         if any(word in query_lower for word in ["كود", "برمجة", "اكتب", "انشئ"]):
             intent_analysis["primary_intent"] = "code_generation"
@@ -0,0 +1,242 @@
+# core/crawl_store.py — حفظ مهام الزحف في SQLite (واجهة قابلة للاستئناف + بصمات المحتوى + الإنتاجية)
+from __future__ import annotations
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+# إعداد التسجيل
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+IN_PROGRESS = "in_progress"
+DONE = "done"
+UNCHANGED = "unchanged"
+FAILED = "failed"
+
+def content_hash(text: str) -> str:
+    """بصمة محتوى الصفحة (لتخطي الصفحات التي لم تتغير منذ آخر جلب)"""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+def make_job_id(seeds: Iterable[str], max_pages: int) -> str:
+    """معرّف ثابت للمهمة من روابطها الأولية (نفس الزحف بعد إعادة التشغيل يستأنف نفس المهمة)"""
+    raw = json.dumps([sorted(seeds), max_pages], ensure_ascii=False)
+    return "crawl-" + hashlib.blake2b(raw.encode("utf-8"), digest_size=8).hexdigest()
+
+class CrawlStore:
+    """جداول مهام الزحف: المهام وعداداتها، الواجهة لكل مهمة، وآخر بصمة لكل رابط"""
+
+    def __init__(self, db_path: str = "crawl_jobs.db"):
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._setup_database()
+
+    def _setup_database(self):
+        """إعداد قاعدة البيانات"""
+        try:
+            with self._lock:
+                cursor = self._conn.cursor()
+                cursor.execute("PRAGMA journal_mode=WAL")
+                cursor.execute("PRAGMA synchronous=NORMAL")
+
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS crawl_jobs (
+                        job_id TEXT PRIMARY KEY,
+                        seeds_json TEXT NOT NULL,
+                        max_pages INTEGER NOT NULL,
+                        status TEXT NOT NULL DEFAULT 'running',
+                        pages INTEGER DEFAULT 0,
+                        unchanged INTEGER DEFAULT 0,
+                        failed INTEGER DEFAULT 0,
+                        bytes INTEGER DEFAULT 0,
+                        elapsed REAL DEFAULT 0.0,
+                        runs INTEGER DEFAULT 0,
+                        created_at REAL NOT NULL,
+                        updated_at REAL NOT NULL
+                    )
+                ''')
+
+                # واجهة الزحف: حالة كل رابط داخل المهمة
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS crawl_frontier (
+                        job_id TEXT NOT NULL,
+                        url TEXT NOT NULL,
+                        depth INTEGER NOT NULL,
+                        status TEXT NOT NULL DEFAULT 'pending',
+                        content_hash TEXT,
+                        bytes INTEGER DEFAULT 0,
+                        fetched_at REAL,
+                        seq INTEGER NOT NULL,
+                        PRIMARY KEY (job_id, url)
+                    )
+                ''')
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_frontier_status ON crawl_frontier(job_id, status, seq)")
+
+                # آخر بصمة محتوى معروفة لكل رابط عبر جميع المهام
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS crawl_pages (
+                        url TEXT PRIMARY KEY,
+                        content_hash TEXT NOT NULL,
+                        fetched_at REAL NOT NULL
+                    )
+                ''')
+                self._conn.commit()
+        except Exception as e:
+            logger.error(f"❌ خطأ في إعداد قاعدة بيانات الزحف: {e}")
+
+    # ---------- المهام ----------
+
+    def start_job(self, job_id: str, seeds: List[str], max_pages: int) -> Dict[str, Any]:
+        """بدء مهمة أو استئنافها؛ المهمة المكتملة تبدأ تمريرة جديدة مع إبقاء بصمات المحتوى"""
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT status FROM crawl_jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                self._conn.execute(
+                    "INSERT INTO crawl_jobs (job_id, seeds_json, max_pages, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    (job_id, json.dumps(seeds, ensure_ascii=False), max_pages, now, now)
+                )
+            elif row[0] == "completed":
+                self._conn.execute("DELETE FROM crawl_frontier WHERE job_id = ?", (job_id,))
+                self._conn.execute(
+                    "UPDATE crawl_jobs SET status = 'running', seeds_json = ?, max_pages = ?, pages = 0, "
+                    "unchanged = 0, failed = 0, bytes = 0, elapsed = 0.0, updated_at = ? WHERE job_id = ?",
+                    (json.dumps(seeds, ensure_ascii=False), max_pages, now, job_id)
+                )
+            else:
+                # روابط كانت قيد الجلب عند توقف العملية تعود إلى الانتظار
+                self._conn.execute(
+                    "UPDATE crawl_frontier SET status = ? WHERE job_id = ? AND status = ?",
+                    (PENDING, job_id, IN_PROGRESS)
+                )
+                logger.info(f"🔁 استئناف مهمة الزحف {job_id}")
+            self._conn.execute("UPDATE crawl_jobs SET runs = runs + 1 WHERE job_id = ?", (job_id,))
+            self._insert_urls(job_id, [(seed, 0) for seed in seeds])
+        return self.get_job(job_id)
+
+    def finish_job(self, job_id: str, completed: bool):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE crawl_jobs SET status = ?, updated_at = ? WHERE job_id = ?",
+                ("completed" if completed else "interrupted", time.time(), job_id)
+            )
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """حالة المهمة مع الإنتاجية (صفحات/ث وبايت/ث) وأعداد الواجهة"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT job_id, seeds_json, max_pages, status, pages, unchanged, failed, bytes, elapsed, runs, "
+                "created_at, updated_at FROM crawl_jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            counts = dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM crawl_frontier WHERE job_id = ? GROUP BY status", (job_id,)
+            ).fetchall())
+        elapsed = row[8]
+        return {
+            "job_id": row[0],
+            "seeds": json.loads(row[1]),
+            "max_pages": row[2],
+            "status": row[3],
+            "pages": row[4],
+            "unchanged": row[5],
+            "failed": row[6],
+            "bytes": row[7],
+            "elapsed": elapsed,
+            "runs": row[9],
+            "created_at": row[10],
+            "updated_at": row[11],
+            "pages_per_second": (row[4] + row[5]) / elapsed if elapsed else 0.0,
+            "bytes_per_second": row[7] / elapsed if elapsed else 0.0,
+            "frontier": counts
+        }
+
+    def list_jobs(self, limit: int = 20) -> List[Dict[str, Any]]:
+        with self._lock:
+            ids = [r[0] for r in self._conn.execute(
+                "SELECT job_id FROM crawl_jobs ORDER BY updated_at DESC LIMIT ?", (limit,)
+            ).fetchall()]
+        return [self.get_job(job_id) for job_id in ids]
+
+    # ---------- الواجهة ----------
+
+    def add_urls(self, job_id: str, urls: List[Tuple[str, int]]):
+        """إضافة روابط جديدة للواجهة (الموجودة مسبقاً تُتجاهل)"""
+        if not urls:
+            return
+        with self._lock, self._conn:
+            self._insert_urls(job_id, urls)
+
+    def _insert_urls(self, job_id: str, urls: List[Tuple[str, int]]):
+        seq = self._conn.execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM crawl_frontier WHERE job_id = ?", (job_id,)
+        ).fetchone()[0]
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO crawl_frontier (job_id, url, depth, seq) VALUES (?, ?, ?, ?)",
+            [(job_id, url, depth, seq + i + 1) for i, (url, depth) in enumerate(urls)]
+        )
+
+    def load_frontier(self, job_id: str) -> Tuple[List[Tuple[str, int]], Set[str], int]:
+        """(الروابط المنتظرة بالترتيب، كل الروابط المعروفة، عدد الصفحات المنجزة)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url, depth, status FROM crawl_frontier WHERE job_id = ? ORDER BY seq", (job_id,)
+            ).fetchall()
+        pending = [(url, depth) for url, depth, status in rows if status == PENDING]
+        done = sum(1 for _, _, status in rows if status in (DONE, UNCHANGED))
+        return pending, {url for url, _, _ in rows}, done
+
+    def mark_in_progress(self, job_id: str, url: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE crawl_frontier SET status = ? WHERE job_id = ? AND url = ?", (IN_PROGRESS, job_id, url)
+            )
+
+    def previous_hash(self, url: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT content_hash FROM crawl_pages WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    def record_page(self, job_id: str, url: str, status: str, digest: Optional[str] = None,
+                    size: int = 0, elapsed: float = 0.0, new_urls: Optional[List[Tuple[str, int]]] = None):
+        """تسجيل نتيجة جلب صفحة والروابط المكتشفة فيها وتحديث عدادات المهمة في معاملة واحدة"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE crawl_frontier SET status = ?, content_hash = ?, bytes = ?, fetched_at = ? "
+                "WHERE job_id = ? AND url = ?", (status, digest, size, now, job_id, url)
+            )
+            if digest:
+                self._conn.execute(
+                    "INSERT INTO crawl_pages (url, content_hash, fetched_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(url) DO UPDATE SET content_hash = excluded.content_hash, fetched_at = excluded.fetched_at",
+                    (url, digest, now)
+                )
+            column = {DONE: "pages", UNCHANGED: "unchanged", FAILED: "failed"}[status]
+            self._conn.execute(
+                f"UPDATE crawl_jobs SET {column} = {column} + 1, bytes = bytes + ?, elapsed = elapsed + ?, "
+                "updated_at = ? WHERE job_id = ?", (size, elapsed, now, job_id)
+            )
+            if new_urls:
+                self._insert_urls(job_id, new_urls)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# المخزن العالمي
+_global_crawl_store: Optional[CrawlStore] = None
+
+def get_global_crawl_store() -> CrawlStore:
+    """الحصول على مخزن مهام الزحف العالمي (المسار من CRAWL_DB)"""
+    global _global_crawl_store
+    if _global_crawl_store is None:
+        _global_crawl_store = CrawlStore(os.environ.get("CRAWL_DB", "crawl_jobs.db"))
+    return _global_crawl_store
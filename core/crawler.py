@@ -1,50 +1,277 @@
-# core/crawler.py — جلب صفحة + زحف بسيط داخل نفس النطاق
+# core/crawler.py — جلب صفحة + زاحف غير متزامن داخل نفس النطاق (حدود لكل مضيف وتوحيد الروابط)
 from __future__ import annotations
-import re, urllib.parse, requests
+import asyncio, hashlib, json, re, threading, time, urllib.parse
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+import httpx
 from bs4 import BeautifulSoup
 
+from core.budget import RequestBudget
+from utils.http_cache import CachedResponse, get_global_http_cache
+from core.crawl_store import (CrawlStore, DONE, FAILED, UNCHANGED, content_hash,
+                              get_global_crawl_store, make_job_id)
+
 UA = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
                     "(KHTML, like Gecko) Chrome/124 Safari/537.36"}
 
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+_MULTI_SLASH_RE = re.compile(r"/{2,}")
+
+def canonicalize_url(url: str) -> str:
+    """توحيد الرابط: حذف المرساة، ترتيب معاملات الاستعلام، توحيد المضيف والشرطة الأخيرة."""
+    try:
+        parts = urllib.parse.urlsplit(url.strip())
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    port = parts.port if parts.port and parts.port != _DEFAULT_PORTS.get(scheme) else None
+    netloc = f"{host}:{port}" if port else host
+    path = _MULTI_SLASH_RE.sub("/", parts.path or "/")
+    if len(path) > 1 and path.endswith("/"):
+        path = path.rstrip("/") or "/"
+    query = urllib.parse.urlencode(sorted(urllib.parse.parse_qsl(parts.query, keep_blank_values=True)))
+    return urllib.parse.urlunsplit((scheme, netloc, path, query, ""))
+
+def _url_key(url: str) -> int:
+    """بصمة 64 بت للرابط الموحّد (مجموعة المزار أصغر بكثير من تخزين النصوص الكاملة)"""
+    return int.from_bytes(hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest(), "big")
+
+def _parse_html(url: str, html: str) -> tuple[str, list[str]]:
+    soup = BeautifulSoup(html, "lxml")
+    for s in soup(["script","style","noscript"]): s.extract()
+    text = " ".join(soup.get_text(" ").split())
+    links: list[str] = []
+    for a in soup.find_all("a", href=True):
+        abs_url = urllib.parse.urljoin(url, a["href"])
+        if abs_url.startswith("http"):
+            links.append(abs_url)
+    return text, links
+
+def _page_extractor(response: CachedResponse) -> str:
+    if not response.ok:
+        return json.dumps(["", []])
+    return json.dumps(_parse_html(response.url, response.text), ensure_ascii=False)
+
 def fetch_url(url: str, timeout: int = 12) -> tuple[str, list[str]]:
-    """يرجع (نص_مُنظّف, روابط_مطلقة) لصفحة واحدة."""
+    """يرجع (نص_مُنظّف, روابط_مطلقة) لصفحة واحدة (عبر الذاكرة المؤقتة المشتركة)."""
     try:
-        r = requests.get(url, headers=UA, timeout=timeout)
-        r.raise_for_status()
-        html = r.text
-        soup = BeautifulSoup(html, "lxml")
-        for s in soup(["script","style","noscript"]): s.extract()
-        text = " ".join(soup.get_text(" ").split())
-        links: list[str] = []
-        for a in soup.find_all("a", href=True):
-            abs_url = urllib.parse.urljoin(url, a["href"])
-            if abs_url.startswith("http"):
-                links.append(abs_url)
+        text, links = json.loads(get_global_http_cache().fetch_text(
+            url, _page_extractor, "crawler_page", timeout=timeout, headers=UA, url_dependent=True))
         return text, links
     except Exception:
         return "", []
 
-def crawl_site(seed_url: str, max_pages: int = 5) -> list[dict]:
-    """يزحف داخل نفس النطاق بشكل محدود ويجمع نصوصًا وروابط."""
-    seen, queue = set(), [seed_url]
-    out: list[dict] = []
+
+class AsyncCrawler:
+    """زاحف غير متزامن: عدد ثابت من العمال، حد اتصالات لكل مضيف، وواجهة زحف بالعرض (BFS)
+    مع store تُحفظ الواجهة في SQLite فيُستأنف الزحف بعد إعادة التشغيل وتُتخطى الصفحات غير المتغيرة"""
+
+    def __init__(self, max_pages: int = 20, concurrency: int = 8, per_host: int = 2,
+                 timeout: float = 10.0, max_depth: int = 3, same_host: bool = True,
+                 max_frontier: Optional[int] = None, budget: Optional[RequestBudget] = None,
+                 client: Optional[httpx.AsyncClient] = None, store: Optional[CrawlStore] = None,
+                 job_id: Optional[str] = None, skip_unchanged: bool = True,
+                 pages_per_seed: Optional[int] = None):
+        self.max_pages = max_pages
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.max_depth = max_depth
+        self.same_host = same_host
+        self.max_frontier = max_frontier or max_pages * 3
+        self.budget = budget
+        self.client = client
+        self.store = store
+        self.job_id = job_id
+        self.skip_unchanged = skip_unchanged
+        # حصة كل رابط أولي من صفحات مضيفه (حتى لا يستهلك موقع واحد الحد الكلي)
+        self.pages_per_seed = pages_per_seed
+
+        self._frontier: Deque[Tuple[str, int]] = deque()
+        self._seen: Set[int] = set()
+        self._hosts: Set[str] = set()
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        self._host_quota: Dict[str, int] = {}
+        self._host_dispatched: Dict[str, int] = {}
+        self._in_flight = 0
+        self._pages = 0  # الصفحات المنجزة (بما فيها تشغيلات سابقة للمهمة نفسها)
+        self._last_progress = 0.0
+        self._wakeup: Optional[asyncio.Event] = None
+        self.results: List[dict] = []
+        self.stats = {"fetched": 0, "unchanged": 0, "failed": 0, "skipped_duplicates": 0,
+                      "bytes": 0, "elapsed": 0.0}
+
+    def _enqueue(self, url: str, depth: int) -> Optional[Tuple[str, int]]:
+        url = canonicalize_url(url)
+        key = _url_key(url)
+        if key in self._seen:
+            self.stats["skipped_duplicates"] += 1
+            return None
+        if len(self._frontier) >= self.max_frontier:
+            return None
+        host = urllib.parse.urlsplit(url).netloc
+        if self.same_host and host not in self._hosts:
+            return None
+        self._seen.add(key)
+        self._frontier.append((url, depth))
+        return url, depth
+
+    def _out_of_time(self) -> bool:
+        return self.budget is not None and self.budget.expired
+
+    async def _fetch(self, client: httpx.AsyncClient, url: str) -> Tuple[Optional[str], int]:
+        host = urllib.parse.urlsplit(url).netloc
+        limit = self._host_limits.setdefault(host, asyncio.Semaphore(self.per_host))
+        timeout = self.budget.timeout(self.timeout) if self.budget else self.timeout
+        async with limit:
+            r = await client.get(url, timeout=timeout)
+        r.raise_for_status()
+        if "html" not in r.headers.get("content-type", "text/html"):
+            return None, len(r.content)
+        return r.text, len(r.content)
+
+    def _record(self, url: str, status: str, digest: Optional[str] = None, size: int = 0,
+                new_urls: Optional[List[Tuple[str, int]]] = None):
+        self._pages += status != FAILED
+        self.stats["bytes"] += size
+        if self.store is not None:
+            now = time.perf_counter()
+            # زمن الحائط منذ آخر تقدم (وليس مجموع أزمنة الطلبات المتوازية)
+            elapsed, self._last_progress = now - self._last_progress, now
+            self.store.record_page(self.job_id, url, status, digest, size, elapsed, new_urls)
+
+    async def _visit(self, client: httpx.AsyncClient, url: str, depth: int):
+        try:
+            html, size = await self._fetch(client, url)
+            if html is None:
+                self._record(url, DONE, size=size)
+                return
+            # التحليل يحجز المعالج: يُنفَّذ في خيط حتى لا يوقف بقية العمال
+            text, links = await asyncio.to_thread(_parse_html, url, html)
+        except Exception:
+            self.stats["failed"] += 1
+            self._record(url, FAILED)
+            return
+
+        new_urls = []
+        if depth < self.max_depth:
+            for link in links:
+                added = self._enqueue(link, depth + 1)
+                if added:
+                    new_urls.append(added)
+
+        digest = content_hash(text) if self.store is not None else None
+        if digest and self.skip_unchanged and self.store.previous_hash(url) == digest:
+            self.stats["unchanged"] += 1
+            self._record(url, UNCHANGED, digest, size, new_urls)
+            return
+        self.stats["fetched"] += 1
+        if text and len(self.results) < self.max_pages:
+            self.results.append({"url": url, "text": text})
+        self._record(url, DONE, digest, size, new_urls)
+
+    async def _worker(self, client: httpx.AsyncClient):
+        while True:
+            if self._pages >= self.max_pages or self._out_of_time():
+                return
+            if not self._frontier or self._pages + self._in_flight >= self.max_pages:
+                if self._in_flight == 0:
+                    return
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            url, depth = self._frontier.popleft()
+            if self._host_quota:
+                host = urllib.parse.urlsplit(url).netloc
+                if self._host_dispatched.get(host, 0) >= self._host_quota.get(host, self.max_pages):
+                    continue
+                self._host_dispatched[host] = self._host_dispatched.get(host, 0) + 1
+            if self.store is not None:
+                self.store.mark_in_progress(self.job_id, url)
+            self._in_flight += 1
+            try:
+                await self._visit(client, url, depth)
+            finally:
+                self._in_flight -= 1
+                self._wakeup.set()
+
+    async def crawl(self, seeds: Iterable[str]) -> List[dict]:
+        """الزحف من الروابط الأولية حتى max_pages صفحة أو نفاد الميزانية"""
+        start = self._last_progress = time.perf_counter()
+        self._wakeup = asyncio.Event()
+        seeds = [canonicalize_url(s) for s in seeds if s]
+        self._hosts.update(urllib.parse.urlsplit(s).netloc for s in seeds)
+        if self.pages_per_seed:
+            for seed in seeds:
+                host = urllib.parse.urlsplit(seed).netloc
+                self._host_quota[host] = self._host_quota.get(host, 0) + self.pages_per_seed
+        if self.store is not None:
+            # استئناف الواجهة المحفوظة (أو بدء تمريرة جديدة لمهمة مكتملة)
+            self.job_id = self.job_id or make_job_id(seeds, self.max_pages)
+            self.store.start_job(self.job_id, seeds, self.max_pages)
+            pending, known, self._pages = self.store.load_frontier(self.job_id)
+            self._seen.update(_url_key(url) for url in known)
+            self._hosts.update(urllib.parse.urlsplit(url).netloc for url in known)
+            self._frontier.extend(pending)
+        else:
+            for seed in seeds:
+                self._enqueue(seed, 0)
+
+        client = self.client or httpx.AsyncClient(
+            headers=UA, follow_redirects=True,
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency))
+        try:
+            workers = [asyncio.create_task(self._worker(client)) for _ in range(self.concurrency)]
+            timeout = self.budget.remaining() if self.budget else None
+            done, pending = await asyncio.wait(workers, timeout=timeout)
+            for task in pending:
+                task.cancel()
+            if pending:
+                self.budget.skip("crawl", f"{self._pages}/{self.max_pages} صفحات")
+            if self.store is not None:
+                self.store.finish_job(self.job_id, completed=not pending and not self._out_of_time())
+        finally:
+            if self.client is None:
+                await client.aclose()
+        elapsed = self.stats["elapsed"] = time.perf_counter() - start
+        self.stats["pages_per_second"] = (self.stats["fetched"] + self.stats["unchanged"]) / elapsed if elapsed else 0.0
+        self.stats["bytes_per_second"] = self.stats["bytes"] / elapsed if elapsed else 0.0
+        return self.results[:self.max_pages]
+
+
+def _run_sync(coro):
+    """تشغيل coroutine من كود متزامن (في خيط مستقل إذا كانت هناك حلقة أحداث جارية)"""
     try:
-        base = urllib.parse.urlparse(seed_url).netloc
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    result: dict = {}
+    def runner():
+        try:
+            result["value"] = asyncio.run(coro)
+        except BaseException as e:
+            result["error"] = e
+    t = threading.Thread(target=runner, daemon=True)
+    t.start()
+    t.join()
+    if "error" in result:
+        raise result["error"]
+    return result["value"]
+
+def crawl_sites(seed_urls: Iterable[str], max_pages: int = 10, job_id: Optional[str] = None,
+                resume: bool = False, **kwargs) -> list[dict]:
+    """يزحف داخل نطاقات الروابط الأولية معاً بشكل متوازٍ ويجمع نصوصًا.
+    resume/job_id: مهمة محفوظة تُستأنف بعد إعادة التشغيل ولا ترجع الصفحات غير المتغيرة."""
+    if resume or job_id:
+        kwargs.setdefault("store", get_global_crawl_store())
+        kwargs["job_id"] = job_id
+    try:
+        return _run_sync(AsyncCrawler(max_pages=max_pages, **kwargs).crawl(seed_urls))
     except Exception:
-        base = ""
-    while queue and len(out) < max_pages:
-        u = queue.pop(0)
-        if u in seen: 
-            continue
-        seen.add(u)
-        txt, links = fetch_url(u)
-        if txt:
-            out.append({"url": u, "text": txt})
-        # روابط داخل نفس النطاق فقط
-        for v in links:
-            try:
-                if urllib.parse.urlparse(v).netloc == base and v not in seen and len(queue) < max_pages*3:
-                    queue.append(v)
-            except Exception:
-                continue
-    return out
+        return []
+
+def crawl_site(seed_url: str, max_pages: int = 5) -> list[dict]:
+    """يزحف داخل نفس النطاق بشكل محدود ويجمع نصوصًا وروابط."""
+    return crawl_sites([seed_url], max_pages=max_pages)
@@ -2,13 +2,19 @@
 from __future__ import annotations
 import logging
 import re
+import copy
 import json
+import os
 import time
-from typing import Dict, List, Optional, Any, Tuple
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Any, Tuple, Sequence, Iterator, Callable
 from dataclasses import dataclass
 from enum import Enum
 import numpy as np
-from collections import defaultdict
+from collections import defaultdict, deque, OrderedDict
+
+from utils.arabic_text import clean as clean_arabic, fold_patterns
 
 # إعداد التسجيل
 logger = logging.getLogger(__name__)
@@ -78,10 +84,13 @@ class IntentAnalysis:
 class AdvancedIntentAnalyzer:
     """محلل النوايا المتقدم - يفهم النوايا العميقة للمستخدم"""
     
-    def __init__(self):
-        self.pattern_library = self._build_pattern_library()
-        self.entity_extractors = self._build_entity_extractors()
-        self.context_analyzer = self._build_context_analyzer()
+    def __init__(self, cache_size: int = 2048):
+        # الأنماط تُوحَّد مثل النص المنظّف حتى تتطابق (أين/اين، الآن/الان)
+        self.pattern_library = fold_patterns(self._build_pattern_library())
+        self.entity_extractors = fold_patterns(self._build_entity_extractors())
+        self.context_analyzer = fold_patterns(self._build_context_analyzer())
+        self.complexity_indicators = fold_patterns(self._build_complexity_indicators())
+        self.urgency_indicators = fold_patterns(self._build_urgency_indicators())
         self.confidence_calculator = self._build_confidence_calculator()
         
         # إحصائيات التحليل
@@ -92,6 +101,12 @@ class AdvancedIntentAnalyzer:
             "intent_distribution": defaultdict(int)
         }
         
+        # ذاكرة تخزين مؤقت محدودة (LRU) لنتائج التحليل
+        self.cache_size = cache_size
+        self._analysis_cache: "OrderedDict[Tuple[str, Tuple[IntentType, ...]], IntentAnalysis]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.cache_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+        
         logger.info("🎯 تم تهيئة محلل النوايا المتقدم")
 
     def _build_pattern_library(self) -> Dict[IntentType, Dict[str, Any]]:
@@ -134,7 +149,7 @@ class AdvancedIntentAnalyzer:
                     r"كيف ترى", r"ما تحليلك", r"دراسة", r"تقييم", r"فحص", r"تحليل"
                 ],
                 "weight": 1.1,
-                "complexity_indicators": [r"مفصل", r"شامل", ر"عميق", ر"دقيق"]
+                "complexity_indicators": [r"مفصل", r"شامل", r"عميق", r"دقيق"]
             },
             
             IntentType.LEARNING_REQUEST: {
@@ -143,7 +158,7 @@ class AdvancedIntentAnalyzer:
                     r"تعلم هذا", r"احفظ المعلومة", r"تعلم وتذكر", r"كن ذكياً"
                 ],
                 "weight": 0.9,
-                "complexity_indicators": [r"دائم", ر"مستمر", ر"دوري"]
+                "complexity_indicators": [r"دائم", r"مستمر", r"دوري"]
             },
             
             IntentType.CALCULATION: {
@@ -152,58 +167,58 @@ class AdvancedIntentAnalyzer:
                     r"ناتج", r"حساب", r"ما ناتج", r"ما نتيجة", r"كم يساوي"
                 ],
                 "weight": 1.0,
-                "complexity_indicators": [r"معقد", ر"صعب", ر"متقدم", ر"كبير"]
+                "complexity_indicators": [r"معقد", r"صعب", r"متقدم", r"كبير"]
             },
             
             IntentType.EXPLANATION: {
                 "patterns": [
-                    r"اشرح", r"وضح", r"فصل", ر"بين", ر"ما الفرق", ر"ما الفروقات",
-                    r"كيف يعمل", ر"ما آلية", ر"ما طريقة", ر"ما خطوات"
+                    r"اشرح", r"وضح", r"فصل", r"بين", r"ما الفرق", r"ما الفروقات",
+                    r"كيف يعمل", r"ما آلية", r"ما طريقة", r"ما خطوات"
                 ],
                 "weight": 1.0,
-                "complexity_indicators": [r"مفصل", ر"وافي", ر"شامل", ر"دقيق"]
+                "complexity_indicators": [r"مفصل", r"وافي", r"شامل", r"دقيق"]
             },
             
             IntentType.COMPARISON: {
                 "patterns": [
                     r"قارن", r"ما الفرق بين", r"ما الفروقات", r"أيهما أفضل",
-                    r"مقارنة بين", ر"ما الاختلاف", ر"ما أوجه الشبه"
+                    r"مقارنة بين", r"ما الاختلاف", r"ما أوجه الشبه"
                 ],
                 "weight": 1.1,
-                "complexity_indicators": [r"شامل", ر"مفصل", ر"دقيق", ر"وافي"]
+                "complexity_indicators": [r"شامل", r"مفصل", r"دقيق", r"وافي"]
             },
             
             IntentType.RECOMMENDATION: {
                 "patterns": [
                     r"ماذا تنصح", r"ما توصيك", r"ما رأيك في", r"أفضل",
-                    r"أنصحني", ر"ما ترشيحك", ر"ما اقتراحك", ر"ما تفضيلك"
+                    r"أنصحني", r"ما ترشيحك", r"ما اقتراحك", r"ما تفضيلك"
                 ],
                 "weight": 1.0,
-                "complexity_indicators": [r"مفصل", ر"شامل", ر"مدروس"]
+                "complexity_indicators": [r"مفصل", r"شامل", r"مدروس"]
             },
             
             IntentType.PROBLEM_SOLVING: {
                 "patterns": [
                     r"حل المشكلة", r"كيف أحل", r"ما الحل", r"واجهت مشكلة",
-                    r"عندي issue", ر"ما troubleshooting", ر"إصلاح", ر"علاج"
+                    r"عندي issue", r"ما troubleshooting", r"إصلاح", r"علاج"
                 ],
                 "weight": 1.2,
-                "complexity_indicators": [r"صعب", ر"معقد", ر"مستعصي", ر"كبير"]
+                "complexity_indicators": [r"صعب", r"معقد", r"مستعصي", r"كبير"]
             },
             
             IntentType.CREATIVE_TASK: {
                 "patterns": [
-                    r"اصنع", r"ابتكر", r"أنشئ", ر"صمم", ر"اكتشف", ر"اخترع",
-                    r"فكرة", ر"مبتكر", ر"إبداعي", ر"جديد", ر"مختلف"
+                    r"اصنع", r"ابتكر", r"أنشئ", r"صمم", r"اكتشف", r"اخترع",
+                    r"فكرة", r"مبتكر", r"إبداعي", r"جديد", r"مختلف"
                 ],
                 "weight": 1.3,
-                "complexity_indicators": [r"كبير", ر"معقد", ر"مبتكر", ر"فريد"]
+                "complexity_indicators": [r"كبير", r"معقد", r"مبتكر", r"فريد"]
             },
             
             IntentType.SMALL_TALK: {
                 "patterns": [
                     r"مرحبا", r"اهلا", r"كيف حالك", r"من انت", r"شكرا", r"مساء الخير",
-                    r"صباح الخير", ر"السلام عليكم", ر"وعليكم السلام", ر"حياك الله"
+                    r"صباح الخير", r"السلام عليكم", r"وعليكم السلام", r"حياك الله"
                 ],
                 "weight": 0.5,
                 "complexity_indicators": []
@@ -211,11 +226,11 @@ class AdvancedIntentAnalyzer:
             
             IntentType.ERROR_HANDLING: {
                 "patterns": [
-                    r"خطأ", r"error", r"مشكلة", r"لا يعمل", ر"لماذا لا", ر"ما الخلل",
-                    r"تصحيح", ر"إصلاح", ر"debug", ر"fix", ر"solve"
+                    r"خطأ", r"error", r"مشكلة", r"لا يعمل", r"لماذا لا", r"ما الخلل",
+                    r"تصحيح", r"إصلاح", r"debug", r"fix", r"solve"
                 ],
                 "weight": 1.2,
-                "complexity_indicators": [r"صعب", ر"معقد", ر"مستعصي"]
+                "complexity_indicators": [r"صعب", r"معقد", r"مستعصي"]
             }
         }
 
@@ -264,7 +279,7 @@ class AdvancedIntentAnalyzer:
                 "patterns": [
                     r"عاجل", r"فوري", r"الآن", r"بسرعة", r"مستعجل",
                     r"عادي", r"وقت", r"لاحق", r"مستقبل",
-                    r"مهم", r"ضروري", r"حيوي", ر"حاسم"
+                    r"مهم", r"ضروري", r"حيوي", r"حاسم"
                 ],
                 "type": "urgency"
             }
@@ -280,12 +295,30 @@ class AdvancedIntentAnalyzer:
                 "example_request": [r"مثال", r"مثلاً", r"على سبيل المثال", r"توضيح"]
             },
             "sentiment_indicators": {
-                "positive": [r"شكراً", r"ممتاز", ر"رائع", ر"جميل", ر"أحسنت"],
-                "negative": [r"خطأ", ر"غلط", ر"سيء", ر"لا يعمل", ر"مشكلة"],
-                "confused": [r"لم أفهم", ر"ماذا", ر"كيف", ر"لماذا", ر"أين"]
+                "positive": [r"شكراً", r"ممتاز", r"رائع", r"جميل", r"أحسنت"],
+                "negative": [r"خطأ", r"غلط", r"سيء", r"لا يعمل", r"مشكلة"],
+                "confused": [r"لم أفهم", r"ماذا", r"كيف", r"لماذا", r"أين"]
             }
         }
 
+    def _build_complexity_indicators(self) -> Dict[ComplexityLevel, List[str]]:
+        """بناء مؤشرات مستوى التعقيد"""
+        return {
+            ComplexityLevel.SIMPLE: [r"بسيط", r"سهل", r"مبدئي", r"أولي", r"مبتدئ"],
+            ComplexityLevel.MEDIUM: [r"متوسط", r"عادي", r"معتاد", r"معتدل"],
+            ComplexityLevel.COMPLEX: [r"معقد", r"صعب", r"متقدم", r"محترف"],
+            ComplexityLevel.ADVANCED: [r"شامل", r"كامل", r"مفصل", r"وافي", r"دقيق"]
+        }
+
+    def _build_urgency_indicators(self) -> Dict[UrgencyLevel, List[str]]:
+        """بناء مؤشرات مستوى الاستعجال"""
+        return {
+            UrgencyLevel.LOW: [r"لاحق", r"مستقبل", r"ليس عاجل", r"في وقت"],
+            UrgencyLevel.NORMAL: [],  # الحالة الافتراضية
+            UrgencyLevel.HIGH: [r"مهم", r"ضروري", r"حيوي", r"حاسم"],
+            UrgencyLevel.URGENT: [r"عاجل", r"فوري", r"الآن", r"بسرعة", r"مستعجل"]
+        }
+
     def _build_confidence_calculator(self) -> Dict[str, Any]:
         """بناء حاسبة الثقة"""
         return {
@@ -306,11 +339,33 @@ class AdvancedIntentAnalyzer:
 
     def analyze_intent(self, text: str, context: Dict[str, Any] = None) -> IntentAnalysis:
         """تحليل النوايا الرئيسي"""
-        if context is None:
-            context = {}
+        context = context or {}
+        cleaned_text = self._clean_text(text)
+        cache_key = (cleaned_text, self._context_fingerprint(context))
         
+        analysis = self._cache_get(cache_key)
+        if analysis is not None:
+            analysis.metadata.update({
+                "text_length": len(text),
+                "word_count": len(text.split()),
+                "analysis_timestamp": time.time(),
+                "cache_hit": True
+            })
+        else:
+            analysis = self._run_analysis(text, context, cleaned_text)
+            self._cache_put(cache_key, analysis)
+        
+        # تحديث الإحصائيات
+        self._update_analysis_stats(analysis.primary_intent, analysis.confidence)
+        
+        logger.info(f"🎯 تحليل النوايا: {analysis.primary_intent.value} (ثقة: {analysis.confidence:.2f})")
+        return analysis
+
+    def _run_analysis(self, text: str, context: Dict[str, Any], cleaned_text: Optional[str] = None) -> IntentAnalysis:
+        """تنفيذ التحليل الكامل دون تحديث الإحصائيات"""
         # تنظيف النص
-        cleaned_text = self._clean_text(text)
+        if cleaned_text is None:
+            cleaned_text = self._clean_text(text)
         
         # استخراج الكيانات
         entities = self._extract_entities(cleaned_text)
@@ -332,11 +387,8 @@ class AdvancedIntentAnalyzer:
         # توليد الإجراءات المقترحة
         suggested_actions = self._generate_suggested_actions(primary_intent, entities, complexity)
         
-        # تحديث الإحصائيات
-        self._update_analysis_stats(primary_intent, confidence)
-        
         # إنشاء نتيجة التحليل
-        analysis = IntentAnalysis(
+        return IntentAnalysis(
             primary_intent=primary_intent,
             confidence=confidence,
             secondary_intents=secondary_intents,
@@ -352,33 +404,104 @@ class AdvancedIntentAnalyzer:
                 "cleaned_text": cleaned_text
             }
         )
-        
-        logger.info(f"🎯 تحليل النوايا: {primary_intent.value} (ثقة: {confidence:.2f})")
-        return analysis
+
+    def _recent_intents(self, context: Dict[str, Any]) -> Tuple[IntentType, ...]:
+        """النوايا السريعة لآخر 3 رسائل للمستخدم (كل ما يقرؤه التحليل من السياق)"""
+        history = (context or {}).get("conversation_history") or []
+        return tuple(self._quick_analyze(turn.get("user", "")) for turn in history[-3:] if turn.get("user", ""))
+
+    def _context_fingerprint(self, context: Dict[str, Any]) -> Tuple[IntentType, ...]:
+        """مفتاح السياق في الذاكرة المؤقتة: النوايا السابقة نفسها التي يعتمد عليها حساب درجة السياق"""
+        return self._recent_intents(context)
+
+    def _cache_get(self, key: Tuple[str, Tuple[IntentType, ...]]) -> Optional[IntentAnalysis]:
+        """جلب نسخة من نتيجة مخزنة مع تحديث ترتيب الاستخدام"""
+        if self.cache_size <= 0:
+            return None
+        with self._cache_lock:
+            cached = self._analysis_cache.get(key)
+            if cached is None:
+                self.cache_stats["misses"] += 1
+                return None
+            self._analysis_cache.move_to_end(key)
+            self.cache_stats["hits"] += 1
+        return copy.deepcopy(cached)
+
+    def _cache_put(self, key: Tuple[str, Tuple[IntentType, ...]], analysis: IntentAnalysis):
+        """تخزين نسخة من النتيجة مع طرد الأقدم عند امتلاء الذاكرة"""
+        if self.cache_size <= 0:
+            return
+        stored = copy.deepcopy(analysis)
+        with self._cache_lock:
+            self._analysis_cache[key] = stored
+            self._analysis_cache.move_to_end(key)
+            while len(self._analysis_cache) > self.cache_size:
+                self._analysis_cache.popitem(last=False)
+
+    def invalidate_cache(self):
+        """مسح ذاكرة التحليل المؤقتة (عند تغيّر مكتبة الأنماط)"""
+        with self._cache_lock:
+            self._analysis_cache.clear()
+            self.cache_stats["invalidations"] += 1
+
+    def analyze_batch(self, texts: Sequence[str], workers: Optional[int] = None,
+                      chunk_size: int = 500,
+                      progress: Optional[Callable[[int, int], None]] = None) -> List[IntentAnalysis]:
+        """تحليل دفعة من النصوص عبر مجمع عمليات مع الحفاظ على الترتيب"""
+        return list(self.iter_analyze_batch(texts, workers=workers, chunk_size=chunk_size, progress=progress))
+
+    def iter_analyze_batch(self, texts: Sequence[str], workers: Optional[int] = None,
+                           chunk_size: int = 500,
+                           progress: Optional[Callable[[int, int], None]] = None) -> Iterator[IntentAnalysis]:
+        """
+        تحليل دفعة كبيرة من النصوص وإرجاع النتائج تدريجياً بنفس ترتيب المدخلات.
+        يُقسَّم العمل إلى شرائح على مجمع عمليات، ويُستدعى progress(done, total)
+        بعد كل شريحة، وتُدمج الإحصائيات مرة واحدة في النهاية.
+        الشرائح تُقطع عند الحاجة ولا يتجاوز المُرسَل منها 2×workers فتبقى الذاكرة محدودة.
+        """
+        total = len(texts)
+        chunk_size = max(1, chunk_size)
+        chunks = (list(texts[i:i + chunk_size]) for i in range(0, total, chunk_size))
+        batch_stats = {"count": 0, "high_confidence": 0, "confidence_sum": 0.0,
+                       "intent_distribution": defaultdict(int)}
+        high_threshold = self.confidence_calculator["thresholds"]["high_confidence"]
+        done = 0
+        
+        if total > chunk_size and (workers is None or workers > 1):
+            workers = workers or os.cpu_count() or 1
+            executor = ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_batch_worker,
+                initargs=(self.pattern_library,)
+            )
+            chunk_results = _bounded_map(executor, _analyze_chunk, chunks, 2 * workers)
+        else:
+            executor = None
+            chunk_results = ([self._run_analysis(text, {}) for text in chunk] for chunk in chunks)
+        
+        try:
+            for results in chunk_results:
+                for analysis in results:
+                    batch_stats["count"] += 1
+                    batch_stats["confidence_sum"] += analysis.confidence
+                    batch_stats["intent_distribution"][analysis.primary_intent.value] += 1
+                    if analysis.confidence >= high_threshold:
+                        batch_stats["high_confidence"] += 1
+                    yield analysis
+                
+                done += len(results)
+                if progress is not None:
+                    progress(done, total)
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+            self._merge_batch_stats(batch_stats)
+            logger.info(f"📦 تحليل دفعة: {done}/{total} نص")
 
     def _clean_text(self, text: str) -> str:
         """تنظيف النص المدخل"""
-        if not text:
-            return ""
-        
-        # تحويل إلى lowercase
-        text = text.lower()
-        
-        # إزالة علامات الترقيم الزائدة
-        text = re.sub(r'[^\w\s]', ' ', text)
-        
-        # إزالة المسافات الزائدة
-        text = ' '.join(text.split())
-        
-        # استبدال الحروف المتباينة
-        replacements = {
-            "أ": "ا", "إ": "ا", "آ": "ا", "ة": "ه", "ى": "ي"
-        }
-        
-        for old, new in replacements.items():
-            text = text.replace(old, new)
-        
-        return text
+        # أحرف صغيرة + توحيد الحروف + إزالة الترقيم والمسافات الزائدة
+        return clean_arabic(text)
 
     def _extract_entities(self, text: str) -> Dict[str, Any]:
         """استخراج الكيانات من النص"""
@@ -453,7 +576,6 @@ class AdvancedIntentAnalyzer:
         entity_support_map = {
             IntentType.CODE_GENERATION: ["programming_languages", "technologies"],
             IntentType.PROJECT_CREATION: ["programming_languages", "technologies", "domains"],
-            IntentType.TECHNICAL_QUESTION: ["programming_languages", "technologies"],
             IntentType.ANALYSIS_REQUEST: ["domains"]
         }
         
@@ -485,14 +607,8 @@ class AdvancedIntentAnalyzer:
         if not conversation_history:
             return 0.5
         
-        # البحث عن نوايا سابقة مشابهة
-        recent_intents = []
-        for turn in conversation_history[-3:]:  # آخر 3 أدوار
-            user_msg = turn.get("user", "")
-            if user_msg:
-                # تحليل سريع للنوايا السابقة
-                quick_analysis = self._quick_analyze(user_msg)
-                recent_intents.append(quick_analysis)
+        # البحث عن نوايا سابقة مشابهة (تحليل سريع لآخر 3 أدوار)
+        recent_intents = self._recent_intents(context)
         
         # حساب التوافق مع النوايا السابقة
         if recent_intents:
@@ -563,12 +679,7 @@ class AdvancedIntentAnalyzer:
 
     def _analyze_complexity(self, text: str, entities: Dict[str, Any], primary_intent: IntentType) -> ComplexityLevel:
         """تحليل مستوى التعقيد"""
-        complexity_indicators = {
-            ComplexityLevel.SIMPLE: [r"بسيط", r"سهل", r"مبدئي", r"أولي", r"مبتدئ"],
-            ComplexityLevel.MEDIUM: [r"متوسط", r"عادي", r"معتاد", r"معتدل"],
-            ComplexityLevel.COMPLEX: [r"معقد", r"صعب", r"متقدم", r"محترف"],
-            ComplexityLevel.ADVANCED: [r"شامل", r"كامل", r"مفصل", r"وافي", r"دقيق"]
-        }
+        complexity_indicators = self.complexity_indicators
         
         text_lower = text.lower()
         complexity_scores = {}
@@ -598,12 +709,7 @@ class AdvancedIntentAnalyzer:
 
     def _analyze_urgency(self, text: str, entities: Dict[str, Any]) -> UrgencyLevel:
         """تحليل مستوى الاستعجال"""
-        urgency_indicators = {
-            UrgencyLevel.LOW: [r"لاحق", r"مستقبل", r"ليس عاجل", r"في وقت"],
-            UrgencyLevel.NORMAL: [],  # الحالة الافتراضية
-            UrgencyLevel.HIGH: [r"مهم", r"ضروري", r"حيوي", r"حاسم"],
-            UrgencyLevel.URGENT: [r"عاجل", r"فوري", r"الآن", r"بسرعة", r"مستعجل"]
-        }
+        urgency_indicators = self.urgency_indicators
         
         text_lower = text.lower()
         
@@ -700,10 +806,34 @@ class AdvancedIntentAnalyzer:
             (current_avg * (total - 1) + confidence) / total
         )
 
+    def _merge_batch_stats(self, batch_stats: Dict[str, Any]):
+        """دمج إحصائيات دفعة كاملة دفعة واحدة"""
+        count = batch_stats["count"]
+        if count == 0:
+            return
+        
+        previous_total = self.analysis_stats["total_analyses"]
+        total = previous_total + count
+        self.analysis_stats["total_analyses"] = total
+        self.analysis_stats["high_confidence_analyses"] += batch_stats["high_confidence"]
+        for intent_value, intent_count in batch_stats["intent_distribution"].items():
+            self.analysis_stats["intent_distribution"][intent_value] += intent_count
+        
+        self.analysis_stats["average_confidence"] = (
+            (self.analysis_stats["average_confidence"] * previous_total + batch_stats["confidence_sum"]) / total
+        )
+
     def get_analysis_stats(self) -> Dict[str, Any]:
         """الحصول على إحصائيات التحليل"""
+        lookups = self.cache_stats["hits"] + self.cache_stats["misses"]
         return {
             **self.analysis_stats,
+            "cache": {
+                **self.cache_stats,
+                "size": len(self._analysis_cache),
+                "max_size": self.cache_size,
+                "hit_rate": self.cache_stats["hits"] / lookups if lookups else 0.0
+            },
             "confidence_thresholds": self.confidence_calculator["thresholds"],
             "total_intent_types": len(IntentType)
         }
@@ -725,6 +855,29 @@ class AdvancedIntentAnalyzer:
         if accuracy < 0.7:
             logger.warning("⚠️ دقة تحليل النوايا منخفضة - يوصى بمراجعة الأنماط")
 
+# محلل خاص بكل عملية في مجمع التحليل الدفعي
+_batch_worker_analyzer: Optional[AdvancedIntentAnalyzer] = None
+
+def _init_batch_worker(pattern_library: Dict[IntentType, Dict[str, Any]]):
+    """تهيئة محلل العملية العاملة بنفس مكتبة الأنماط"""
+    global _batch_worker_analyzer
+    _batch_worker_analyzer = AdvancedIntentAnalyzer()
+    _batch_worker_analyzer.pattern_library = pattern_library
+
+def _analyze_chunk(texts: List[str]) -> List[IntentAnalysis]:
+    """تحليل شريحة من النصوص داخل العملية العاملة"""
+    return [_batch_worker_analyzer._run_analysis(text, {}) for text in texts]
+
+def _bounded_map(executor: ProcessPoolExecutor, fn: Callable, items: Iterator, window: int) -> Iterator:
+    """مثل executor.map بالترتيب، لكن لا يبقى أكثر من window مهمة مُرسلة (تُستهلك items عند الحاجة)"""
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
 # استخدام عالمي
 _global_intent_analyzer = None
 
@@ -0,0 +1,232 @@
+# core/intent_router.py — موجّه النوايا المتدرّج: الكلمات المفتاحية للأكواد والمشاريع، ثم النموذج المتعلم، ثم المحلل الكامل
+from __future__ import annotations
+import logging
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, Optional, Deque
+
+import numpy as np
+
+from core.intent_analyzer import IntentType, get_global_intent_analyzer
+from core.message_analysis import MessageAnalysis, KeywordGroups
+
+# إعداد التسجيل
+logger = logging.getLogger(__name__)
+
+# تحويل تصنيفات النموذج المتعلم (engine.intent) إلى أنواع النوايا في النواة
+MODEL_LABEL_MAP = {
+    "greeting": "small_talk",
+    "code": "code",
+    "web_search": "general_search",
+    "summarize": "question",
+    "analyze": "question"
+}
+
+# تحويل نتائج المحلل المتقدم إلى أنواع النوايا في النواة (UNKNOWN يُحسم بالكلمات المفتاحية)
+ANALYZER_INTENT_MAP = {
+    IntentType.INFORMATION_REQUEST: "question",
+    IntentType.CODE_GENERATION: "code",
+    IntentType.PROJECT_CREATION: "project",
+    IntentType.ANALYSIS_REQUEST: "question",
+    IntentType.LEARNING_REQUEST: "question",
+    IntentType.CALCULATION: "question",
+    IntentType.EXPLANATION: "question",
+    IntentType.COMPARISON: "question",
+    IntentType.RECOMMENDATION: "question",
+    IntentType.PROBLEM_SOLVING: "question",
+    IntentType.CREATIVE_TASK: "general_search",
+    IntentType.SMALL_TALK: "small_talk",
+    IntentType.ERROR_HANDLING: "question",
+    IntentType.UNKNOWN: None
+}
+
+# الأنواع التي تُنفَّذ (توليد كود/بناء مشروع) بدل البحث
+ACTION_INTENTS = ("code", "project")
+
+class KeywordIntentAnalyzer:
+    """محلل نوايا بالكلمات المفتاحية: يحسم طلبات الأكواد والمشاريع ويصنّف ما لم يعرفه المحلل الكامل"""
+    
+    def __init__(self):
+        self.intent_patterns = KeywordGroups({
+            "code": [
+                r"(اكتب|انشئ|اصنع|برمج)(.*)(كود|برنامج|دالة|سكريبت)",
+                r"(كود|برمجة|شفرة)\s+(ل|في)\s+",
+                r"(python|javascript|java|html|css|sql)\s+"
+            ],
+            "project": [
+                r"(ابني|انشئ|اصنع)(.*)(مشروع|نظام|تطبيق|موقع)",
+                r"(مشروع|تطبيق)\s+(ل|في)\s+",
+                r"(تصميم|برمجة)\s+(موقع|تطبيق)"
+            ],
+            "question": [
+                r"(ما هو|ماهو|ما هي|ماهي|كيف|لماذا|أين|متى)",
+                r"(شرح|تعريف|مفهوم)\s+",
+                r"(ما رأيك|ما تقول)\s+في"
+            ]
+        })
+        self.intent_confidence = {"code": 0.85, "project": 0.80, "question": 0.75}
+
+    def analyze(self, text: str | MessageAnalysis) -> Dict:
+        """تحليل النوايا مع تقييم الثقة"""
+        message = MessageAnalysis.of(text)
+        
+        # تحليل النوايا
+        intents = [
+            {"type": intent, "confidence": self.intent_confidence[intent]}
+            for intent in message.match(self.intent_patterns, normalized=True)
+        ]
+        
+        # إذا لم توجد نوايا واضحة
+        if not intents:
+            if len(message.normalized.split()) <= 4:
+                intents.append({"type": "small_talk", "confidence": 0.90})
+            else:
+                intents.append({"type": "general_search", "confidence": 0.70})
+        
+        # ترتيب حسب الثقة
+        intents.sort(key=lambda x: x["confidence"], reverse=True)
+        return intents[0]
+
+class _StageStats:
+    """إحصائيات زمن مرحلة واحدة"""
+    
+    def __init__(self, window: int = 1000):
+        self.count = 0
+        self.total_ms = 0.0
+        self.recent_ms: Deque[float] = deque(maxlen=window)
+    
+    def record(self, elapsed_ms: float):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.recent_ms.append(elapsed_ms)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        recent = np.fromiter(self.recent_ms, dtype=float) if self.recent_ms else None
+        return {
+            "count": self.count,
+            "avg_ms": self.total_ms / self.count if self.count else 0.0,
+            "p50_ms": float(np.percentile(recent, 50)) if recent is not None else 0.0,
+            "p95_ms": float(np.percentile(recent, 95)) if recent is not None else 0.0
+        }
+
+class IntentRouter:
+    """
+    موجّه متدرّج: الكلمات المفتاحية تحسم طلبات الأكواد والمشاريع، ثم النموذج المتعلم
+    (إذا تدرّب على min_model_examples مثالاً حقيقياً على الأقل وكانت ثقته فوق العتبة)،
+    ثم التحليل الكامل بالأنماط والكيانات؛ وما لم يعرفه المحلل يصنّفه محلل الكلمات المفتاحية.
+    """
+    
+    def __init__(self, model=None, analyzer=None, keyword_analyzer=None, confidence_threshold: float = 0.6,
+                 min_model_examples: Optional[int] = None):
+        self._model = model
+        self._model_unavailable = False
+        self.analyzer = analyzer or get_global_intent_analyzer()
+        self.keyword_analyzer = keyword_analyzer or KeywordIntentAnalyzer()
+        self.confidence_threshold = confidence_threshold
+        # النموذج الافتراضي (5 أمثلة) ثقته نحو 0.35 فيصعّد دائماً: المرحلة معطلة حتى يتدرّب على بيانات حقيقية
+        if min_model_examples is None:
+            from engine.config import cfg
+            min_model_examples = cfg.INTENT_ROUTER_MIN_EXAMPLES
+        self.min_model_examples = min_model_examples
+        
+        self._lock = threading.Lock()
+        self.stage_stats = {"keyword": _StageStats(), "model": _StageStats(), "analyzer": _StageStats()}
+        self.total_routed = 0
+        self.escalations = 0
+
+    def _get_model(self):
+        """تحميل النموذج المتعلم عند أول استخدام (المرحلة تُعطّل إن تعذّر تحميله)"""
+        if self._model is None and not self._model_unavailable:
+            try:
+                from engine.intent import IntentModel
+                model = IntentModel()
+                model.load_or_init()
+                self._model = model
+            except Exception as e:
+                logger.warning(f"⚠️ النموذج المتعلم غير متاح، سيُستخدم المحلل الكامل فقط: {e}")
+                self._model_unavailable = True
+        return self._model
+
+    def _model_enabled(self, model) -> bool:
+        """مرحلة النموذج تُستخدم فقط بعد تدريبه على عدد كافٍ من الأمثلة"""
+        return model is not None and model.num_examples() >= self.min_model_examples
+
+    def route(self, text: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
+        """تحديد نوع النية بالمرحلة الأرخص الكافية"""
+        # المرحلة الأولى: الكلمات المفتاحية (الأرخص) تحسم طلبات الأكواد والمشاريع
+        start = time.perf_counter()
+        keyword = self.keyword_analyzer.analyze(text)
+        self._record("keyword", start)
+        if keyword["type"] in ACTION_INTENTS:
+            self._count(escalated=False)
+            return {"type": keyword["type"], "confidence": keyword["confidence"],
+                    "stage": "keyword", "label": keyword["type"]}
+
+        # المرحلة الثانية: النموذج المتعلم
+        model = self._get_model()
+        if self._model_enabled(model):
+            start = time.perf_counter()
+            try:
+                label, confidence = model.predict_with_confidence(text)
+            except Exception as e:
+                logger.error(f"❌ خطأ في تصنيف النموذج المتعلم: {e}")
+                label, confidence = None, 0.0
+            self._record("model", start)
+            
+            intent_type = MODEL_LABEL_MAP.get(label)
+            if intent_type and confidence >= self.confidence_threshold:
+                self._count(escalated=False)
+                return {"type": intent_type, "confidence": confidence, "stage": "model", "label": label}
+        
+        # المرحلة الثالثة: التحليل الكامل بالأنماط والكيانات
+        start = time.perf_counter()
+        analysis = self.analyzer.analyze_intent(text, context)
+        self._record("analyzer", start)
+        self._count(escalated=True)
+        
+        intent_type = ANALYZER_INTENT_MAP.get(analysis.primary_intent)
+        if intent_type is None:
+            return {"type": keyword["type"], "confidence": keyword["confidence"],
+                    "stage": "keyword", "label": analysis.primary_intent.value}
+        return {
+            "type": intent_type,
+            "confidence": analysis.confidence,
+            "stage": "analyzer",
+            "label": analysis.primary_intent.value
+        }
+
+    def _record(self, stage: str, start: float):
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.stage_stats[stage].record(elapsed_ms)
+
+    def _count(self, escalated: bool):
+        with self._lock:
+            self.total_routed += 1
+            if escalated:
+                self.escalations += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """إحصائيات التدرّج: زمن كل مرحلة ومعدل التصعيد"""
+        with self._lock:
+            return {
+                "total_routed": self.total_routed,
+                "escalations": self.escalations,
+                "escalation_rate": self.escalations / self.total_routed if self.total_routed else 0.0,
+                "confidence_threshold": self.confidence_threshold,
+                "model_available": self._model is not None,
+                "model_enabled": self._model is not None and self._model_enabled(self._model),
+                "min_model_examples": self.min_model_examples,
+                "stages": {name: stats.to_dict() for name, stats in self.stage_stats.items()}
+            }
+
+# استخدام عالمي
+_global_intent_router = None
+
+def get_global_intent_router() -> IntentRouter:
+    """الحصول على موجّه النوايا العالمي"""
+    global _global_intent_router
+    if _global_intent_router is None:
+        _global_intent_router = IntentRouter()
+    return _global_intent_router
@@ -1,9 +1,10 @@
 from __future__ import annotations
 from typing import List, Dict
-from duckduckgo_search import DDGS
-import requests, json, os
-from bs4 import BeautifulSoup
+import json, os
 from core.memory import add_fact, get_recent_conversations
+from core.crawler import crawl_sites
+from core.web_search import fetch_text
+from utils.search import get_global_search
 
 UA = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
 KNOW_PATH = os.path.join("knowledge", "elite_knowledge.json")
@@ -25,26 +26,12 @@ def _save_knowledge(items: List[Dict]) -> None:
         json.dump(items, f, ensure_ascii=False, indent=2)
 
 def _ddg_search(q: str, max_results: int = 6) -> List[Dict]:
-    with DDGS() as ddg:
-        res = ddg.text(q, max_results=max_results, region="xa-ar")
-        out = []
-        for r in res or []:
-            out.append({
-                "title": r.get("title") or "",
-                "url": r.get("href") or r.get("url") or "",
-                "snippet": r.get("body") or r.get("snippet") or ""
-            })
-        return out
+    res = get_global_search().search(q, n=max_results, region="xa-ar", provider="ddg")
+    return [{"title": r["title"], "url": r["url"], "snippet": r["snippet"]} for r in res]
 
 def _fetch_clean_text(url: str, max_chars: int = 4000) -> str:
-    if not url: return ""
-    try:
-        html = requests.get(url, headers=UA, timeout=12).text
-        soup = BeautifulSoup(html, "lxml")
-        for s in soup(["script", "style", "noscript"]): s.extract()
-        text = " ".join(soup.get_text(" ").split())
-        return text[:max_chars]
-    except Exception: return ""
+    # نفس المستخرِج والذاكرة المؤقتة المشتركة في core.web_search
+    return fetch_text(url, max_chars=max_chars)
 
 def _summarize_lines(blobs: List[str], max_lines: int = 4) -> List[str]:
     sents = []
@@ -89,10 +76,11 @@ def run_once(topics: List[str] | None = None) -> int:
     added = 0
     for t in topics:
         results = _ddg_search(t, max_results=5)
-        blobs = []
-        for r in results[:3]:
-            txt = _fetch_clean_text(r.get("url", ""))
-            if txt: blobs.append(txt)
+        # مهمة زحف محفوظة لكل موضوع: الصفحات التي لم يتغير محتواها منذ آخر تشغيل لا تُعاد معالجتها
+        urls = [r.get("url", "") for r in results[:3] if r.get("url")]
+        pages = crawl_sites(urls, max_pages=len(urls), max_depth=0, same_host=False,
+                            job_id=f"learn:{t}") if urls else []
+        blobs = [p["text"][:4000] for p in pages if p.get("text")]
         lines = _summarize_lines(blobs, max_lines=4)
         for ln in lines:
             ln = ln.strip()
@@ -1,73 +1,314 @@
 # core/learner.py - نظام التعلم
+import atexit
 import json
+import logging
 import os
+import threading
+from collections import OrderedDict
 from datetime import datetime
 
+from utils.arabic_text import clean as normalize_question
+
+logger = logging.getLogger(__name__)
+
+class _Bucket:
+    """سلة عدد واحد في قائمة مرتبة تصاعدياً (الأقل تكراراً في الرأس)"""
+    __slots__ = ("count", "keys", "prev", "next")
+
+    def __init__(self, count):
+        self.count = count
+        self.keys = OrderedDict()  # المفاتيح بهذا العدد (الأقدم أولاً)
+        self.prev = None
+        self.next = None
+
+class SpaceSavingTopK:
+    """ملخص Space-Saving للعناصر الأكثر تكراراً: ذاكرة ثابتة وتحديث O(1) و top(k) بتكلفة O(k)"""
+
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self.entries = {}
+        # سلة لكل عدد في قائمة مرتبطة مرتبة + فهرس count -> سلة
+        self._buckets = {}
+        self._head = None  # أقل عدد
+        self._tail = None  # أعلى عدد
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    @property
+    def _min_count(self):
+        return self._head.count if self._head else 0
+
+    def _unlink(self, key, count):
+        """إزالة المفتاح من سلته؛ يرجع السلة السابقة موضعاً لإدراج العدد الجديد"""
+        bucket = self._buckets[count]
+        del bucket.keys[key]
+        if bucket.keys:
+            return bucket
+        # حذف السلة الفارغة من القائمة
+        del self._buckets[count]
+        if bucket.prev:
+            bucket.prev.next = bucket.next
+        else:
+            self._head = bucket.next
+        if bucket.next:
+            bucket.next.prev = bucket.prev
+        else:
+            self._tail = bucket.prev
+        return bucket.prev
+
+    def _link(self, key, count, after=None):
+        """إضافة المفتاح لسلة العدد؛ البحث عن الموضع يبدأ من after (عادة خطوة واحدة عند الزيادة بواحد)"""
+        bucket = self._buckets.get(count)
+        if bucket is None:
+            bucket = _Bucket(count)
+            if self._tail is not None and self._tail.count < count:
+                prev = self._tail
+            else:
+                prev = after if after is not None and after.count < count else None
+                node = prev.next if prev else self._head
+                while node is not None and node.count < count:
+                    prev, node = node, node.next
+            bucket.prev = prev
+            bucket.next = prev.next if prev else self._head
+            if bucket.prev:
+                bucket.prev.next = bucket
+            else:
+                self._head = bucket
+            if bucket.next:
+                bucket.next.prev = bucket
+            else:
+                self._tail = bucket
+            self._buckets[count] = bucket
+        bucket.keys[key] = None
+
+    def add(self, key, weight=1, **fields):
+        """زيادة عدد المفتاح (يُستبدل الأقل تكراراً عند امتلاء الملخص)"""
+        entry = self.entries.get(key)
+        if entry is not None:
+            position = self._unlink(key, entry["count"])
+            entry["count"] += weight
+            entry.update((k, v) for k, v in fields.items() if k not in ("first_seen", "question"))
+            self._link(key, entry["count"], position)
+            return entry
+
+        error = 0
+        position = None
+        if len(self.entries) >= self.capacity:
+            # استبدال عنصر من أقل سلة؛ العنصر الجديد يرث عدده كحد أعلى للخطأ
+            error = self._head.count
+            evicted = next(iter(self._head.keys))
+            position = self._unlink(evicted, error)
+            del self.entries[evicted]
+
+        entry = dict(fields)
+        entry["count"] = error + weight
+        entry["error"] = error
+        self.entries[key] = entry
+        self._link(key, entry["count"], position)
+        return entry
+
+    def top(self, k):
+        """أكثر k عناصر تكراراً (تمر على السلال من الذيل وتتوقف بعد k)"""
+        result = []
+        bucket = self._tail
+        while bucket is not None:
+            for key in reversed(bucket.keys):
+                result.append(self.entries[key])
+                if len(result) >= k:
+                    return result
+            bucket = bucket.prev
+        return result
+
+    def to_dict(self):
+        return {key: dict(entry) for key, entry in self.entries.items()}
+
+    @classmethod
+    def from_dict(cls, data, capacity=1000):
+        """بناء الملخص من البيانات المحفوظة (تُبقى أعلى capacity عناصر فقط)"""
+        sketch = cls(capacity)
+        items = sorted(data.items(), key=lambda item: item[1].get("count", 0), reverse=True)[:capacity]
+        for key, entry in reversed(items):
+            entry = dict(entry)
+            count = entry.pop("count", 1)
+            entry.pop("error", None)
+            sketch.add(key, count, **entry)
+            sketch.entries[key]["error"] = data[key].get("error", 0)
+        return sketch
+
 class AdaptiveLearner:
-    def __init__(self):
+    def __init__(self, path='memory/learning_cache.json', flush_interval=5.0,
+                 max_common_questions=1000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_common_questions = max_common_questions
+        self._lock = threading.RLock()
+        self._flush_timer = None
+        self._file_mtime = None
+
+        # التغييرات المحلية منذ آخر حفظ (تُعاد تطبيقها إذا عدّل عامل آخر الملف)
+        self._pending_users = {}
+        self._pending_questions = {}
+
         self.learning_data = self.load_learning_data()
-    
+        self.common_questions = self._load_common_questions()
+        atexit.register(self.flush)
+
+    def _empty_data(self):
+        return {
+            "user_preferences": {},
+            "common_questions": {},
+            "response_effectiveness": {},
+            "learned_patterns": {}
+        }
+
+    def _load_common_questions(self):
+        return SpaceSavingTopK.from_dict(self.learning_data["common_questions"], self.max_common_questions)
+
+    def _file_changed(self):
+        """هل عدّل عامل آخر ملف التعلم منذ آخر قراءة/كتابة"""
+        try:
+            return os.stat(self.path).st_mtime_ns != self._file_mtime
+        except OSError:
+            return False
+
     def load_learning_data(self):
         """تحميل بيانات التعلم"""
         try:
-            with open('memory/learning_cache.json', 'r', encoding='utf-8') as f:
-                return json.load(f)
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._file_mtime = os.stat(self.path).st_mtime_ns
+            for key, value in self._empty_data().items():
+                data.setdefault(key, value)
+            return data
         except:
-            return {
-                "user_preferences": {},
-                "common_questions": {},
-                "response_effectiveness": {},
-                "learned_patterns": {}
-            }
-    
+            return self._empty_data()
+
     def save_learning_data(self):
-        """حفظ بيانات التعلم"""
-        try:
-            with open('memory/learning_cache.json', 'w', encoding='utf-8') as f:
-                json.dump(self.learning_data, f, ensure_ascii=False, indent=2)
-        except:
-            pass
-    
-    def learn_from_message(self, message, analysis, user_id):
-        """التعلم من الرسالة"""
-        # تعلم تفضيلات المستخدم
-        if user_id not in self.learning_data["user_preferences"]:
-            self.learning_data["user_preferences"][user_id] = {
+        """حفظ بيانات التعلم (كتابة ذرّية: ملف مؤقت ثم إعادة تسمية)"""
+        self.flush()
+
+    def flush(self):
+        """كتابة التغييرات المتراكمة إلى القرص"""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._pending_users and not self._pending_questions:
+                return
+
+            try:
+                # إعادة تحميل تزايدية: دمج تغييراتنا مع ما كتبه العمال الآخرون
+                if self._file_changed():
+                    self.learning_data = self.load_learning_data()
+                    self.common_questions = self._load_common_questions()
+                    self._apply_pending()
+                self.learning_data["common_questions"] = self.common_questions.to_dict()
+
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self.learning_data, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+                self._file_mtime = os.stat(self.path).st_mtime_ns
+
+                self._pending_users = {}
+                self._pending_questions = {}
+            except Exception as e:
+                # التغييرات تبقى منتظرة وتُعاد محاولة حفظها لاحقاً
+                logger.error(f"❌ فشل حفظ بيانات التعلم: {e}")
+                self._schedule_flush()
+
+    def _schedule_flush(self):
+        """جدولة حفظ مؤجل واحد خلال flush_interval ثانية"""
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def _apply_pending(self):
+        """تطبيق التغييرات المحلية المنتظرة على البيانات المحمّلة"""
+        for user_id, delta in self._pending_users.items():
+            self._apply_user_delta(user_id, delta["count"], delta["topics"], delta["last_interaction"])
+        for question_key, delta in self._pending_questions.items():
+            self._apply_question_delta(question_key, delta)
+
+    def _apply_user_delta(self, user_id, count, topics, last_interaction):
+        users = self.learning_data["user_preferences"]
+        if user_id not in users:
+            users[user_id] = {
                 "preferred_topics": [],
                 "interaction_count": 0,
-                "last_interaction": datetime.now().isoformat()
+                "last_interaction": last_interaction
             }
-        
-        user_data = self.learning_data["user_preferences"][user_id]
-        user_data["interaction_count"] += 1
-        user_data["last_interaction"] = datetime.now().isoformat()
-        
+
+        user_data = users[user_id]
+        user_data["interaction_count"] += count
+        user_data["last_interaction"] = max(user_data["last_interaction"], last_interaction)
+
         # إضافة المواضيع المفضلة
-        for topic in analysis.get("topics", []):
+        for topic in topics:
             if topic not in user_data["preferred_topics"]:
                 user_data["preferred_topics"].append(topic)
-        
-        # تعلم الأسئلة الشائعة
-        question_key = message[:50]  # استخدام أول 50 حرف كمفتاح
-        if question_key in self.learning_data["common_questions"]:
-            self.learning_data["common_questions"][question_key]["count"] += 1
-        else:
-            self.learning_data["common_questions"][question_key] = {
+
+    def _apply_question_delta(self, question_key, delta):
+        fields = {k: v for k, v in delta.items() if k != "count"}
+        self.common_questions.add(question_key, delta["count"], **fields)
+
+    def learn_from_message(self, message, analysis, user_id):
+        """التعلم من الرسالة"""
+        now = datetime.now().isoformat()
+        topics = analysis.get("topics", [])
+
+        with self._lock:
+            # تعلم تفضيلات المستخدم
+            self._apply_user_delta(user_id, 1, topics, now)
+            pending_user = self._pending_users.setdefault(
+                user_id, {"count": 0, "topics": [], "last_interaction": now}
+            )
+            pending_user["count"] += 1
+            pending_user["last_interaction"] = now
+            pending_user["topics"].extend(t for t in topics if t not in pending_user["topics"])
+
+            # تعلم الأسئلة الشائعة
+            question_key = normalize_question(message)[:100] or message[:50]
+            delta = {
                 "question": message,
                 "count": 1,
-                "first_seen": datetime.now().isoformat(),
-                "last_seen": datetime.now().isoformat(),
+                "first_seen": now,
+                "last_seen": now,
                 "intent": analysis.get("intent", "general")
             }
-        
-        self.save_learning_data()
-    
+            self._apply_question_delta(question_key, delta)
+            if question_key in self._pending_questions:
+                self._pending_questions[question_key]["count"] += 1
+                self._pending_questions[question_key]["last_seen"] = now
+            else:
+                self._pending_questions[question_key] = delta
+
+            self._schedule_flush()
+
     def get_user_preferences(self, user_id):
         """الحصول على تفضيلات المستخدم"""
         return self.learning_data["user_preferences"].get(user_id, {})
-    
+
     def get_common_questions(self, limit=5):
         """الحصول على الأسئلة الشائعة"""
-        questions = list(self.learning_data["common_questions"].values())
-        questions.sort(key=lambda x: x["count"], reverse=True)
-        return questions[:limit]
+        with self._lock:
+            return [dict(entry) for entry in self.common_questions.top(limit)]
+
+
+# المتعلم العالمي
+_global_learner = None
+
+def get_global_learner():
+    """الحصول على المتعلم العالمي"""
+    global _global_learner
+    if _global_learner is None:
+        _global_learner = AdaptiveLearner()
+    return _global_learner
@@ -5,6 +5,9 @@ import json
 import time
 import sqlite3
 import hashlib
+import atexit
+import random
+import threading
 from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
 from dataclasses import dataclass
@@ -13,6 +16,9 @@ import re
 import numpy as np
 from collections import defaultdict, deque
 
+from core.metrics_buffer import MetricsRingBuffer
+from core.message_analysis import MessageAnalysis
+
 # إعداد التسجيل
 logger = logging.getLogger(__name__)
 
@@ -34,6 +40,16 @@ class KnowledgeDomain(Enum):
     EDUCATION = "education"
     GENERAL = "general"
 
+# أوزان حساب النتيجة الإجمالية (مشتركة مع مخزن المقاييس العمودي)
+METRIC_WEIGHTS = {
+    'accuracy': 0.25,
+    'relevance': 0.20,
+    'completeness': 0.15,
+    'response_time': 0.15,
+    'user_satisfaction': 0.15,
+    'knowledge_retention': 0.10
+}
+
 @dataclass
 class LearningMetrics:
     """مقاييس أداء التعلم"""
@@ -46,18 +62,9 @@ class LearningMetrics:
     
     def overall_score(self) -> float:
         """حساب النتيجة الإجمالية"""
-        weights = {
-            'accuracy': 0.25,
-            'relevance': 0.20,
-            'completeness': 0.15,
-            'response_time': 0.15,
-            'user_satisfaction': 0.15,
-            'knowledge_retention': 0.10
-        }
-        
         return sum(
             getattr(self, metric) * weight 
-            for metric, weight in weights.items()
+            for metric, weight in METRIC_WEIGHTS.items()
         )
 
 @dataclass
@@ -108,13 +115,123 @@ class LearningSession:
             "duration": self.duration()
         }
 
+class StrategyBandit:
+    """
+    مختار استراتيجيات بأسلوب Thompson sampling لكل مجال (توزيع Beta لكل ذراع).
+    الحالة كلها في الذاكرة؛ يُحمَّل من جدول strategy_performance عند البدء
+    وتُكتب الأذرع المتغيرة إليه دورياً.
+    """
+    
+    def __init__(self, prior_strength: float = 2.0, max_warm_start: int = 50):
+        self.prior_strength = prior_strength
+        self.max_warm_start = max_warm_start
+        self.arms: Dict[Tuple[KnowledgeDomain, LearningStrategy], Dict[str, float]] = {}
+        self._dirty: set = set()
+        self._lock = threading.Lock()
+
+    def _arm(self, domain: KnowledgeDomain, strategy: LearningStrategy, prior_mean: float = 0.5) -> Dict[str, float]:
+        """الحصول على الذراع أو إنشاؤه بتوزيع أولي مركزه prior_mean"""
+        key = (domain, strategy)
+        arm = self.arms.get(key)
+        if arm is None:
+            arm = {
+                "alpha": 1.0 + prior_mean * self.prior_strength,
+                "beta": 1.0 + (1.0 - prior_mean) * self.prior_strength,
+                "count": 0,
+                "reward_sum": 0.0,
+                "efficiency_sum": 0.0,
+                "last_used": None
+            }
+            self.arms[key] = arm
+        return arm
+
+    def warm_start(self, domain: KnowledgeDomain, strategy: LearningStrategy, success_rate: float,
+                   efficiency: float, usage_count: int, last_used: Optional[float]):
+        """تهيئة الذراع من الأداء المحفوظ (مع سقف لوزن التاريخ)"""
+        with self._lock:
+            arm = self._arm(domain, strategy)
+            weight = min(usage_count, self.max_warm_start)
+            arm["alpha"] += success_rate * weight
+            arm["beta"] += (1.0 - success_rate) * weight
+            arm["count"] = usage_count
+            arm["reward_sum"] = success_rate * usage_count
+            arm["efficiency_sum"] = efficiency * usage_count
+            arm["last_used"] = last_used
+
+    def select(self, domain: KnowledgeDomain, priors: Dict[LearningStrategy, float], explore: bool = True) -> LearningStrategy:
+        """اختيار استراتيجية: عيّنة من كل ذراع (أو المتوسط عند explore=False)"""
+        best_strategy, best_value = None, -1.0
+        with self._lock:
+            for strategy, prior_mean in priors.items():
+                arm = self._arm(domain, strategy, prior_mean)
+                if explore:
+                    value = random.betavariate(arm["alpha"], arm["beta"])
+                else:
+                    value = arm["alpha"] / (arm["alpha"] + arm["beta"])
+                if value > best_value:
+                    best_strategy, best_value = strategy, value
+        return best_strategy
+
+    def update(self, domain: KnowledgeDomain, strategy: LearningStrategy, reward: float,
+               efficiency: float, timestamp: Optional[float]):
+        """تحديث الذراع بمكافأة في [0, 1]"""
+        reward = min(max(reward, 0.0), 1.0)
+        with self._lock:
+            arm = self._arm(domain, strategy)
+            arm["alpha"] += reward
+            arm["beta"] += 1.0 - reward
+            arm["count"] += 1
+            arm["reward_sum"] += reward
+            arm["efficiency_sum"] += efficiency
+            arm["last_used"] = timestamp
+            self._dirty.add((domain, strategy))
+
+    def mean(self, domain: KnowledgeDomain, strategy: LearningStrategy) -> float:
+        """متوسط التوزيع الحالي للذراع"""
+        with self._lock:
+            arm = self.arms.get((domain, strategy))
+            if arm is None:
+                return 0.5
+            return arm["alpha"] / (arm["alpha"] + arm["beta"])
+
+    def pop_dirty_rows(self) -> List[Tuple]:
+        """صفوف strategy_performance للأذرع التي تغيرت منذ آخر حفظ"""
+        with self._lock:
+            rows = []
+            for domain, strategy in self._dirty:
+                arm = self.arms[(domain, strategy)]
+                count = max(arm["count"], 1)
+                rows.append((
+                    strategy.value,
+                    domain.value,
+                    arm["reward_sum"] / count,
+                    arm["efficiency_sum"] / count,
+                    arm["count"],
+                    arm["last_used"]
+                ))
+            self._dirty.clear()
+            return rows
+
+    def mark_dirty(self, rows: List[Tuple]):
+        """إعادة أذرع فشل حفظها إلى قائمة التغيير (تُكتب قيمها الحالية مع الحفظ التالي)"""
+        with self._lock:
+            for strategy, domain, *_ in rows:
+                self._dirty.add((KnowledgeDomain(domain), LearningStrategy(strategy)))
+
 class LearningOptimizer:
     """محسن التعلم المتقدم - يحسن أداء النظام باستمرار"""
     
-    def __init__(self, db_path: str = "learning_optimizer.db"):
+    def __init__(self, db_path: str = "learning_optimizer.db",
+                 flush_interval: float = 5.0, flush_batch_size: int = 100,
+                 retention_days: int = 30, max_attempts: int = 3, max_pending: int = 10000):
         self.db_path = db_path
         self.learning_sessions: Dict[str, LearningSession] = {}
-        self.performance_history: deque = deque(maxlen=1000)
+        self.performance_history = MetricsRingBuffer(
+            fields=list(METRIC_WEIGHTS),
+            categories=[domain.value for domain in KnowledgeDomain],
+            capacity=1000,
+            weights=METRIC_WEIGHTS
+        )
         self.knowledge_domains: Dict[KnowledgeDomain, Dict] = {}
         self.learning_strategies: Dict[LearningStrategy, Dict] = {}
         
@@ -128,11 +245,41 @@ class LearningOptimizer:
             "domains_covered": set()
         }
         
+        # اتصال واحد طويل العمر (WAL) مع كتابات مجمّعة في معاملات دورية
+        self.flush_interval = flush_interval
+        self.flush_batch_size = flush_batch_size
+        self._db_lock = threading.RLock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        # الصفوف المنتظرة مع عدد محاولات كتابتها: بعد max_attempts تُسقط وتُحتسب (كعامل الحفظ)
+        # ولا يتجاوز المنتظر max_pending صفاً لكل نوع أثناء تعطل القاعدة
+        self.max_attempts = max_attempts
+        self.max_pending = max_pending
+        self._pending_sessions: List[Tuple[Tuple, int]] = []
+        self._pending_progress_updates: List[Tuple[Tuple, int]] = []
+        self._pending_rollups: Dict[Tuple[str, str, str], List[float]] = {}
+        self._rollup_attempts: Dict[Tuple[str, str, str], int] = {}
+        self._strategy_attempts: Dict[Tuple[str, str], int] = {}
+        self.persistence_stats = {"flush_errors": 0, "retried": 0, "dropped_sessions": 0,
+                                  "dropped_progress_updates": 0, "dropped_rollups": 0, "dropped_strategies": 0}
+        self._stop_event = threading.Event()
+        
+        # الجلسات الخام الأقدم من retention_days تُحذف (ملخصاتها محفوظة في learning_rollups)
+        self.retention_days = retention_days
+        self._last_compaction = 0.0
+        
         # إعداد استراتيجيات التعلم
         self._initialize_strategies()
         self._initialize_domains()
         self._setup_database()
         
+        # اختيار الاستراتيجيات حساب داخلي بالكامل دون استعلامات
+        self.strategy_bandit = StrategyBandit()
+        self._load_strategy_bandit()
+        
+        self._flusher = threading.Thread(target=self._flush_loop, name="learning-optimizer-flush", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+        
         logger.info("🧠 تم تهيئة محسن التعلم المتقدم")
 
     def _initialize_strategies(self):
@@ -232,8 +379,10 @@ class LearningOptimizer:
     def _setup_database(self):
         """إعداد قاعدة البيانات"""
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = self._conn
             cursor = conn.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
             
             # جدول جلسات التعلم
             cursor.execute('''
@@ -276,13 +425,74 @@ class LearningOptimizer:
                 )
             ''')
             
+            # ملخصات يومية لكل مجال/استراتيجية تُحدَّث تزايدياً عند نهاية كل جلسة
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS learning_rollups (
+                    day TEXT NOT NULL,
+                    domain TEXT NOT NULL,
+                    strategy TEXT NOT NULL,
+                    sessions_count INTEGER DEFAULT 0,
+                    successful_sessions INTEGER DEFAULT 0,
+                    total_score REAL DEFAULT 0.0,
+                    total_knowledge_gained INTEGER DEFAULT 0,
+                    total_confidence_boost REAL DEFAULT 0.0,
+                    total_duration REAL DEFAULT 0.0,
+                    PRIMARY KEY (day, domain, strategy)
+                )
+            ''')
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_end_time ON learning_sessions(end_time)")
+            
             conn.commit()
-            conn.close()
+            self._backfill_rollups()
             logger.info("✅ تم إعداد قاعدة بيانات التعلم بنجاح")
             
         except Exception as e:
             logger.error(f"❌ خطأ في إعداد قاعدة البيانات: {e}")
 
+    def _backfill_rollups(self):
+        """بناء الملخصات من الجلسات الموجودة مسبقاً (مرة واحدة لقواعد البيانات القديمة)"""
+        cursor = self._conn.cursor()
+        if cursor.execute("SELECT 1 FROM learning_rollups LIMIT 1").fetchone():
+            return
+        
+        cursor.execute('''
+            SELECT domain, strategy, start_time, end_time, metrics_json, knowledge_gained, confidence_boost
+            FROM learning_sessions WHERE end_time IS NOT NULL
+        ''')
+        metric_fields = set(LearningMetrics.__dataclass_fields__)
+        for domain, strategy, start_time, end_time, metrics_json, knowledge_gained, confidence_boost in cursor.fetchall():
+            try:
+                metrics = LearningMetrics(**{
+                    k: v for k, v in json.loads(metrics_json).items() if k in metric_fields
+                })
+            except Exception:
+                metrics = LearningMetrics()
+            self._add_rollup(domain, strategy, end_time, metrics.overall_score(),
+                             knowledge_gained or 0, confidence_boost or 0.0, end_time - start_time)
+        
+        if self._pending_rollups:
+            with self._conn:
+                self._conn.executemany(self._UPDATE_ROLLUP_SQL, self._pop_rollup_rows())
+            logger.info("📊 تم بناء ملخصات التعلم من الجلسات السابقة")
+
+    def _load_strategy_bandit(self):
+        """تهيئة المختار من جدول strategy_performance"""
+        try:
+            with self._db_lock:
+                rows = self._conn.execute(
+                    "SELECT strategy, domain, success_rate, efficiency, usage_count, last_used FROM strategy_performance"
+                ).fetchall()
+            for strategy, domain, success_rate, efficiency, usage_count, last_used in rows:
+                try:
+                    self.strategy_bandit.warm_start(
+                        KnowledgeDomain(domain), LearningStrategy(strategy),
+                        success_rate or 0.0, efficiency or 0.0, usage_count or 0, last_used
+                    )
+                except ValueError:
+                    continue
+        except Exception as e:
+            logger.error(f"❌ خطأ في تحميل أداء الاستراتيجيات: {e}")
+
     def start_learning_session(self, domain: KnowledgeDomain, 
                              strategy: Optional[LearningStrategy] = None) -> str:
         """بدء جلسة تعلم جديدة"""
@@ -305,51 +515,29 @@ class LearningOptimizer:
         logger.info(f"🎯 بدء جلسة تعلم: {domain.value} باستراتيجية {strategy.value}")
         return session_id
 
-    def _select_optimal_strategy(self, domain: KnowledgeDomain) -> LearningStrategy:
+    def _select_optimal_strategy(self, domain: KnowledgeDomain, explore: bool = True) -> LearningStrategy:
         """اختيار أفضل استراتيجية تعلم للمجال"""
-        # تحليل أداء الاستراتيجيات السابقة
-        strategy_scores = {}
+        # التوزيع الأولي لكل استراتيجية من الكفاءة والسرعة والاحتفاظ
+        priors = {}
         
         for strategy, config in self.learning_strategies.items():
             if domain in config["applicable_domains"]:
-                # حساب النتيجة بناءً على الكفاءة والسرعة والاحتفاظ
-                base_score = (
+                priors[strategy] = (
                     config["efficiency"] * 0.4 +
                     config["speed"] * 0.3 +
                     config["retention"] * 0.3
                 )
-                
-                # تعديل بناءً على الأداء التاريخي
-                historical_performance = self._get_strategy_performance(strategy, domain)
-                adjusted_score = base_score * (1 + historical_performance * 0.2)
-                
-                strategy_scores[strategy] = adjusted_score
-        
-        if not strategy_scores:
+        
+        if not priors:
             # استراتيجية افتراضية إذا لم توجد مناسبة
             return LearningStrategy.ACTIVE_LEARNING
         
-        return max(strategy_scores.items(), key=lambda x: x[1])[0]
+        # Thompson sampling على الأداء التاريخي (بدون استعلامات قاعدة البيانات)
+        return self.strategy_bandit.select(domain, priors, explore=explore)
 
     def _get_strategy_performance(self, strategy: LearningStrategy, domain: KnowledgeDomain) -> float:
         """الحصول على الأداء التاريخي للاستراتيجية"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute(
-                "SELECT success_rate FROM strategy_performance WHERE strategy = ? AND domain = ?",
-                (strategy.value, domain.value)
-            )
-            
-            result = cursor.fetchone()
-            conn.close()
-            
-            return result[0] if result else 0.5  # قيمة افتراضية
-            
-        except Exception as e:
-            logger.error(f"❌ خطأ في جلب أداء الاستراتيجية: {e}")
-            return 0.5
+        return self.strategy_bandit.mean(domain, strategy)
 
     def update_learning_metrics(self, session_id: str, metrics: LearningMetrics):
         """تحديث مقاييس التعلم للجلسة"""
@@ -359,6 +547,7 @@ class LearningOptimizer:
         
         session = self.learning_sessions[session_id]
         session.metrics = metrics
+        self.performance_history.append(session.domain.value, metrics.__dict__)
         
         # تحديث الإحصائيات
         overall_score = metrics.overall_score()
@@ -401,20 +590,94 @@ class LearningOptimizer:
         # تحديث تقدم التعلم
         self._update_learning_progress(session)
         
+        # تحديث الملخص اليومي
+        with self._db_lock:
+            self._add_rollup(session.domain.value, session.strategy.value, session.end_time,
+                             session.metrics.overall_score(), knowledge_gained, confidence_boost,
+                             session.duration())
+        
+        # الجلسة لم تعد نشطة
+        del self.learning_sessions[session_id]
+        
+        # الكتابة الفعلية تتم دفعة واحدة عند امتلاء المخزن المؤقت أو دورياً
+        if self._pending_count() >= self.flush_batch_size:
+            self.flush()
+        
         logger.info(f"✅ تم إنهاء جلسة التعلم: {session_id} (المعرفة المكتسبة: {knowledge_gained})")
 
+    _SAVE_SESSION_SQL = '''
+        INSERT OR REPLACE INTO learning_sessions 
+        (session_id, domain, strategy, start_time, end_time, metrics_json, 
+         topics_covered_json, knowledge_gained, confidence_boost)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+
+    _CHECKPOINT_STRATEGY_SQL = '''
+        INSERT INTO strategy_performance 
+        (strategy, domain, success_rate, efficiency, usage_count, last_used)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(strategy, domain) DO UPDATE SET
+        success_rate = excluded.success_rate,
+        efficiency = excluded.efficiency,
+        usage_count = excluded.usage_count,
+        last_used = excluded.last_used
+    '''
+
+    _UPDATE_PROGRESS_SQL = '''
+        INSERT INTO learning_progress 
+        (domain, knowledge_level, confidence_level, last_updated, sessions_count, total_knowledge_gained)
+        VALUES (?, ?, ?, ?, 1, ?)
+        ON CONFLICT(domain) DO UPDATE SET
+        knowledge_level = knowledge_level + ?,
+        confidence_level = (confidence_level + ?) / 2,
+        last_updated = ?,
+        sessions_count = sessions_count + 1,
+        total_knowledge_gained = total_knowledge_gained + ?
+    '''
+
+    _UPDATE_ROLLUP_SQL = '''
+        INSERT INTO learning_rollups 
+        (day, domain, strategy, sessions_count, successful_sessions, total_score,
+         total_knowledge_gained, total_confidence_boost, total_duration)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(day, domain, strategy) DO UPDATE SET
+        sessions_count = sessions_count + excluded.sessions_count,
+        successful_sessions = successful_sessions + excluded.successful_sessions,
+        total_score = total_score + excluded.total_score,
+        total_knowledge_gained = total_knowledge_gained + excluded.total_knowledge_gained,
+        total_confidence_boost = total_confidence_boost + excluded.total_confidence_boost,
+        total_duration = total_duration + excluded.total_duration
+    '''
+
+    def _add_rollup(self, domain: str, strategy: str, end_time: float, score: float,
+                    knowledge_gained: int, confidence_boost: float, duration: float):
+        """دمج جلسة في الملخص اليومي المنتظر للكتابة"""
+        key = (time.strftime("%Y-%m-%d", time.gmtime(end_time)), domain, strategy)
+        totals = self._pending_rollups.setdefault(key, [0, 0, 0.0, 0, 0.0, 0.0])
+        totals[0] += 1
+        totals[1] += 1 if score > 0.7 else 0
+        totals[2] += score
+        totals[3] += knowledge_gained
+        totals[4] += confidence_boost
+        totals[5] += duration
+
+    def _pop_rollup_rows(self) -> List[Tuple]:
+        """صفوف الملخصات المنتظرة (صف واحد لكل يوم/مجال/استراتيجية)"""
+        rows = [key + tuple(totals) for key, totals in self._pending_rollups.items()]
+        self._pending_rollups = {}
+        return rows
+
+    def _restore_rollup_rows(self, rows: List[Tuple]):
+        """إعادة صفوف ملخصات فشلت كتابتها إلى المنتظر (تُجمع مع ما أضيف بعدها)"""
+        for row in rows:
+            totals = self._pending_rollups.setdefault(row[:3], [0, 0, 0.0, 0, 0.0, 0.0])
+            for i, value in enumerate(row[3:]):
+                totals[i] += value
+
     def _save_session_to_db(self, session: LearningSession):
-        """حفظ جلسة التعلم في قاعدة البيانات"""
+        """إضافة جلسة التعلم إلى دفعة الكتابة التالية"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT OR REPLACE INTO learning_sessions 
-                (session_id, domain, strategy, start_time, end_time, metrics_json, 
-                 topics_covered_json, knowledge_gained, confidence_boost)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
+            row = (
                 session.session_id,
                 session.domain.value,
                 session.strategy.value,
@@ -424,10 +687,11 @@ class LearningOptimizer:
                 json.dumps(session.topics_covered),
                 session.knowledge_gained,
                 session.confidence_boost
-            ))
+            )
             
-            conn.commit()
-            conn.close()
+            with self._db_lock:
+                self._pending_sessions.append((row, 0))
+                self._trim_pending()
             
         except Exception as e:
             logger.error(f"❌ خطأ في حفظ جلسة التعلم: {e}")
@@ -435,33 +699,14 @@ class LearningOptimizer:
     def _update_strategy_performance(self, session: LearningSession):
         """تحديث أداء الاستراتيجية"""
         try:
-            success_rate = session.metrics.overall_score()
-            
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT INTO strategy_performance 
-                (strategy, domain, success_rate, efficiency, usage_count, last_used)
-                VALUES (?, ?, ?, ?, 1, ?)
-                ON CONFLICT(strategy, domain) DO UPDATE SET
-                success_rate = (success_rate + ?) / 2,
-                efficiency = (efficiency + ?) / 2,
-                usage_count = usage_count + 1,
-                last_used = ?
-            ''', (
-                session.strategy.value,
-                session.domain.value,
-                success_rate,
-                session.metrics.accuracy,
-                session.end_time,
-                success_rate,
+            # التحديث في الذاكرة فقط؛ يُحفظ في الجدول مع الدفعة التالية
+            self.strategy_bandit.update(
+                session.domain,
+                session.strategy,
+                session.metrics.overall_score(),
                 session.metrics.accuracy,
                 session.end_time
-            ))
-            
-            conn.commit()
-            conn.close()
+            )
             
         except Exception as e:
             logger.error(f"❌ خطأ في تحديث أداء الاستراتيجية: {e}")
@@ -469,24 +714,11 @@ class LearningOptimizer:
     def _update_learning_progress(self, session: LearningSession):
         """تحديث تقدم التعلم"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
             # حساب مستوى المعرفة الجديد
             knowledge_increase = session.knowledge_gained / 1000  # تطبيع
             confidence_increase = session.confidence_boost
             
-            cursor.execute('''
-                INSERT INTO learning_progress 
-                (domain, knowledge_level, confidence_level, last_updated, sessions_count, total_knowledge_gained)
-                VALUES (?, ?, ?, ?, 1, ?)
-                ON CONFLICT(domain) DO UPDATE SET
-                knowledge_level = knowledge_level + ?,
-                confidence_level = (confidence_level + ?) / 2,
-                last_updated = ?,
-                sessions_count = sessions_count + 1,
-                total_knowledge_gained = total_knowledge_gained + ?
-            ''', (
+            row = (
                 session.domain.value,
                 knowledge_increase,
                 confidence_increase,
@@ -496,70 +728,199 @@ class LearningOptimizer:
                 confidence_increase,
                 session.end_time,
                 session.knowledge_gained
-            ))
+            )
             
-            conn.commit()
-            conn.close()
+            with self._db_lock:
+                self._pending_progress_updates.append((row, 0))
+                self._trim_pending()
             
         except Exception as e:
             logger.error(f"❌ خطأ في تحديث تقدم التعلم: {e}")
 
+    def _trim_pending(self):
+        """إسقاط أقدم الصفوف المنتظرة فوق max_pending (القاعدة معطلة والمنتظر ينمو)"""
+        for kind in ("sessions", "progress_updates"):
+            pending = getattr(self, f"_pending_{kind}")
+            overflow = len(pending) - self.max_pending
+            if overflow > 0:
+                del pending[:overflow]
+                self.persistence_stats[f"dropped_{kind}"] += overflow
+
+    def _retry_rows(self, entries: List[Tuple[Tuple, int]], kind: str) -> List[Tuple[Tuple, int]]:
+        """الصفوف التي فشلت كتابتها تُعاد حتى max_attempts ثم تُسقط وتُحتسب"""
+        retry = [(row, attempts + 1) for row, attempts in entries if attempts + 1 < self.max_attempts]
+        self.persistence_stats[f"dropped_{kind}"] += len(entries) - len(retry)
+        self.persistence_stats["retried"] += len(retry)
+        return retry
+
+    def _retry_key(self, attempts: Dict[Tuple, int], key: Tuple, kind: str) -> bool:
+        """مثل _retry_rows لصفوف مجمّعة بمفتاح (الملخصات والأذرع)"""
+        count = attempts.get(key, 0) + 1
+        if count >= self.max_attempts:
+            attempts.pop(key, None)
+            self.persistence_stats[f"dropped_{kind}"] += 1
+            return False
+        attempts[key] = count
+        self.persistence_stats["retried"] += 1
+        return True
+
+    def _pending_count(self) -> int:
+        """عدد التحديثات المنتظرة للكتابة"""
+        return len(self._pending_sessions) + len(self._pending_progress_updates)
+
+    def flush(self):
+        """كتابة كل التحديثات المنتظرة في معاملة واحدة"""
+        with self._db_lock:
+            strategy_rows = self.strategy_bandit.pop_dirty_rows()
+            if not self._pending_count() and not strategy_rows:
+                return
+            sessions = self._pending_sessions
+            progress_updates = self._pending_progress_updates
+            rollup_rows = self._pop_rollup_rows()
+            self._pending_sessions = []
+            self._pending_progress_updates = []
+            
+            try:
+                with self._conn:
+                    self._conn.executemany(self._SAVE_SESSION_SQL, [row for row, _ in sessions])
+                    self._conn.executemany(self._UPDATE_ROLLUP_SQL, rollup_rows)
+                    self._conn.executemany(self._CHECKPOINT_STRATEGY_SQL, strategy_rows)
+                    self._conn.executemany(self._UPDATE_PROGRESS_SQL, [row for row, _ in progress_updates])
+                # كل المنتظر كان في هذه الدفعة
+                self._rollup_attempts.clear()
+                self._strategy_attempts.clear()
+                logger.debug(f"💾 تم حفظ دفعة تعلم: {len(sessions)} جلسة")
+            except Exception as e:
+                # المعاملة أُلغيت كاملة: تعود الصفوف إلى المنتظر حتى max_attempts (صف تالف لا يعطّل الحفظ للأبد)
+                self.persistence_stats["flush_errors"] += 1
+                self._pending_sessions = self._retry_rows(sessions, "sessions") + self._pending_sessions
+                self._pending_progress_updates = (self._retry_rows(progress_updates, "progress_updates")
+                                                  + self._pending_progress_updates)
+                self._trim_pending()
+                self._restore_rollup_rows([row for row in rollup_rows
+                                           if self._retry_key(self._rollup_attempts, row[:3], "rollups")])
+                self.strategy_bandit.mark_dirty([row for row in strategy_rows
+                                                 if self._retry_key(self._strategy_attempts, row[:2], "strategies")])
+                logger.error(f"❌ خطأ في حفظ دفعة التعلم: {e}")
+
+    def _flush_loop(self):
+        """خيط خلفي يكتب الدفعات المنتظرة كل flush_interval ثانية"""
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+            if time.time() - self._last_compaction > 3600:
+                self.compact_sessions()
+
+    def compact_sessions(self, retention_days: Optional[int] = None) -> int:
+        """حذف الجلسات الخام الأقدم من مدة الاحتفاظ (ملخصاتها باقية في learning_rollups)"""
+        retention_days = self.retention_days if retention_days is None else retention_days
+        cutoff = time.time() - retention_days * 86400
+        self.flush()
+        self._last_compaction = time.time()
+        try:
+            with self._db_lock, self._conn:
+                deleted = self._conn.execute(
+                    "DELETE FROM learning_sessions WHERE end_time < ?", (cutoff,)
+                ).rowcount
+            if deleted:
+                logger.info(f"🧹 تم ضغط {deleted} جلسة تعلم قديمة")
+            return deleted
+        except Exception as e:
+            logger.error(f"❌ خطأ في ضغط جلسات التعلم: {e}")
+            return 0
+
+    def get_rollup_summary(self, days: int = 7) -> Dict[str, Any]:
+        """ملخص الأداء لكل مجال/استراتيجية خلال آخر days يوماً من جدول الملخصات"""
+        self.flush()
+        since_day = time.strftime("%Y-%m-%d", time.gmtime(time.time() - days * 86400))
+        try:
+            with self._db_lock:
+                rows = self._conn.execute('''
+                    SELECT domain, strategy, SUM(sessions_count), SUM(successful_sessions),
+                           SUM(total_score), SUM(total_knowledge_gained), SUM(total_confidence_boost)
+                    FROM learning_rollups
+                    WHERE day >= ?
+                    GROUP BY domain, strategy
+                ''', (since_day,)).fetchall()
+        except Exception as e:
+            logger.error(f"❌ خطأ في جلب ملخصات التعلم: {e}")
+            return {}
+        
+        summary: Dict[str, Any] = defaultdict(dict)
+        for domain, strategy, sessions, successes, score, knowledge, boost in rows:
+            summary[domain][strategy] = {
+                "sessions_count": sessions,
+                "success_rate": successes / sessions if sessions else 0.0,
+                "average_score": score / sessions if sessions else 0.0,
+                "knowledge_gained": knowledge,
+                "average_confidence_boost": boost / sessions if sessions else 0.0
+            }
+        return dict(summary)
+
+    def close(self):
+        """إيقاف الخيط الخلفي وكتابة ما تبقى وإغلاق الاتصال"""
+        if self._stop_event.is_set():
+            return
+        self._stop_event.set()
+        self.flush()
+        with self._db_lock:
+            self._conn.close()
+
     def analyze_learning_patterns(self) -> Dict[str, Any]:
         """تحليل أنماط التعلم والأداء"""
+        self.flush()
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            with self._db_lock:
+                cursor = self._conn.cursor()
             
-            # أداء الاستراتيجيات
-            cursor.execute('''
-                SELECT strategy, AVG(success_rate), COUNT(*) 
-                FROM strategy_performance 
-                GROUP BY strategy
-            ''')
-            strategy_performance = {
-                row[0]: {"avg_success": row[1], "usage_count": row[2]}
-                for row in cursor.fetchall()
-            }
-            
-            # تقدم المجالات
-            cursor.execute('''
-                SELECT domain, knowledge_level, confidence_level, sessions_count
-                FROM learning_progress
-            ''')
-            domain_progress = {
-                row[0]: {
-                    "knowledge_level": row[1],
-                    "confidence_level": row[2],
-                    "sessions_count": row[3]
+                # أداء الاستراتيجيات
+                cursor.execute('''
+                    SELECT strategy, AVG(success_rate), COUNT(*) 
+                    FROM strategy_performance 
+                    GROUP BY strategy
+                ''')
+                strategy_performance = {
+                    row[0]: {"avg_success": row[1], "usage_count": row[2]}
+                    for row in cursor.fetchall()
                 }
-                for row in cursor.fetchall()
-            }
             
-            # جلسات التعلم الحديثة
-            cursor.execute('''
-                SELECT domain, strategy, knowledge_gained, confidence_boost
-                FROM learning_sessions
-                WHERE end_time > ?
-                ORDER BY end_time DESC
-                LIMIT 50
-            ''', (time.time() - 86400,))  # آخر 24 ساعة
-            
-            recent_sessions = [
-                {
-                    "domain": row[0],
-                    "strategy": row[1],
-                    "knowledge_gained": row[2],
-                    "confidence_boost": row[3]
+                # تقدم المجالات
+                cursor.execute('''
+                    SELECT domain, knowledge_level, confidence_level, sessions_count
+                    FROM learning_progress
+                ''')
+                domain_progress = {
+                    row[0]: {
+                        "knowledge_level": row[1],
+                        "confidence_level": row[2],
+                        "sessions_count": row[3]
+                    }
+                    for row in cursor.fetchall()
                 }
-                for row in cursor.fetchall()
-            ]
             
-            conn.close()
+                # جلسات التعلم الحديثة
+                cursor.execute('''
+                    SELECT domain, strategy, knowledge_gained, confidence_boost
+                    FROM learning_sessions
+                    WHERE end_time > ?
+                    ORDER BY end_time DESC
+                    LIMIT 50
+                ''', (time.time() - 86400,))  # آخر 24 ساعة
             
+                recent_sessions = [
+                    {
+                        "domain": row[0],
+                        "strategy": row[1],
+                        "knowledge_gained": row[2],
+                        "confidence_boost": row[3]
+                    }
+                    for row in cursor.fetchall()
+                ]
+
             analysis = {
                 "strategy_performance": strategy_performance,
                 "domain_progress": domain_progress,
                 "recent_sessions": recent_sessions,
+                "weekly_rollups": self.get_rollup_summary(days=7),
                 "overall_stats": self.learning_stats,
                 "recommendations": self._generate_learning_recommendations(domain_progress, strategy_performance)
             }
@@ -601,12 +962,13 @@ class LearningOptimizer:
         
         return recommendations
 
-    def optimize_learning_parameters(self) -> Dict[str, Any]:
+    def optimize_learning_parameters(self, strategy_analysis: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """تحسين معاملات التعلم تلقائياً"""
         optimizations = {}
         
         # تحليل أداء الاستراتيجيات
-        strategy_analysis = self.analyze_learning_patterns()
+        if strategy_analysis is None:
+            strategy_analysis = self.analyze_learning_patterns()
         
         for strategy, performance in strategy_analysis.get("strategy_performance", {}).items():
             if performance["avg_success"] < 0.6:
@@ -644,8 +1006,8 @@ class LearningOptimizer:
         }
         
         for domain in target_domains:
-            # اختيار أفضل استراتيجية للمجال
-            strategy = self._select_optimal_strategy(domain)
+            # اختيار أفضل استراتيجية للمجال (بدون استكشاف عشوائي في الخطة)
+            strategy = self._select_optimal_strategy(domain, explore=False)
             
             # تقدير الوقت المطلوب
             domain_config = self.knowledge_domains[domain]
@@ -716,10 +1078,26 @@ class LearningOptimizer:
         
         return topic_templates.get(domain, ["مواضيع عامة في المجال"])
 
+    def get_metrics_summary(self, domain: Optional[str] = None,
+                            window_seconds: Optional[float] = None,
+                            trend_window: Optional[int] = None) -> Dict[str, Any]:
+        """ملخص المقاييس الحديثة (متوسط ونسب مئوية) من المخزن العمودي، مع اتجاه النتيجة عند طلبه"""
+        if domain:
+            summary = {domain: self.performance_history.summary(domain, window_seconds)}
+        else:
+            summary = {
+                "all": self.performance_history.summary(None, window_seconds),
+                "by_domain": self.performance_history.summary_by_category(window_seconds)
+            }
+        if trend_window:
+            # متوسط متحرك للنتيجة الإجمالية على آخر الجلسات بالترتيب الزمني
+            summary["trend"] = self.performance_history.rolling_mean("overall_score", domain, trend_window)
+        return summary
+
     def get_learning_report(self) -> Dict[str, Any]:
         """إنشاء تقرير تعلم شامل"""
         analysis = self.analyze_learning_patterns()
-        optimizations = self.optimize_learning_parameters()
+        optimizations = self.optimize_learning_parameters(analysis)
         learning_plan = self.get_learning_plan()
         
         report = {
@@ -730,7 +1108,8 @@ class LearningOptimizer:
                 "success_rate": self.learning_stats["successful_learnings"] / max(1, self.learning_stats["total_sessions"]),
                 "total_knowledge_gained": self.learning_stats["total_knowledge_gained"],
                 "domains_covered": len(self.learning_stats["domains_covered"]),
-                "average_confidence": self.learning_stats["average_confidence"]
+                "average_confidence": self.learning_stats["average_confidence"],
+                "persistence": dict(self.persistence_stats)
             },
             "performance_analysis": analysis,
             "optimizations_applied": optimizations,
@@ -754,7 +1133,8 @@ class LearningOptimizer:
             "active_sessions": {
                 session_id: session.to_dict() 
                 for session_id, session in self.learning_sessions.items()
-            }
+            },
+            "rollups": self.get_rollup_summary(days=self.retention_days)
         }
 
 # استخدام عالمي
@@ -768,9 +1148,10 @@ def get_global_learning_optimizer() -> LearningOptimizer:
     return _global_learning_optimizer
 
 # دالة مساعدة للاستخدام السريع
-def optimize_learning_response(user_query: str, bot_response: str, user_feedback: Optional[str] = None) -> Dict[str, Any]:
+def optimize_learning_response(user_query: str | MessageAnalysis, bot_response: str, user_feedback: Optional[str] = None) -> Dict[str, Any]:
     """تحسين استجابة التعلم بناءً على التفاعل"""
     optimizer = get_global_learning_optimizer()
+    user_query = MessageAnalysis.of(user_query)
     
     # كشف مجال الاستعلام
     domain = detect_query_domain(user_query)
@@ -795,27 +1176,12 @@ def optimize_learning_response(user_query: str, bot_response: str, user_feedback
         "knowledge_gained": knowledge_gained
     }
 
-def detect_query_domain(query: str) -> KnowledgeDomain:
+def detect_query_domain(query: str | MessageAnalysis) -> KnowledgeDomain:
     """كشف مجال الاستعلام"""
-    query_lower = query.lower()
-    
-    domain_keywords = {
-        KnowledgeDomain.PROGRAMMING: [r"كود", r"برمجة", r"بايثون", r"جافا", r"html", r"css"],
-        KnowledgeDomain.TECHNOLOGY: [r"تقنية", r"تكنولوجيا", r"ذكاء", r"آلة", r"بيانات"],
-        KnowledgeDomain.SCIENCE: [r"علم", r"بحث", r"نظرية", r"تجربة", r"فيزياء", r"كيمياء"],
-        KnowledgeDomain.BUSINESS: [r"تجارة", r"شركة", r"سوق", r"ربح", r"استثمار"],
-        KnowledgeDomain.HEALTH: [r"صحة", r"طب", r"علاج", r"دواء", r"مرض"],
-        KnowledgeDomain.EDUCATION: [r"تعلم", r"دراسة", r"مدرسة", r"جامعة", r"تعليم"]
-    }
-    
-    for domain, keywords in domain_keywords.items():
-        for keyword in keywords:
-            if re.search(keyword, query_lower):
-                return domain
-    
-    return KnowledgeDomain.GENERAL
+    domains = MessageAnalysis.of(query).domains
+    return KnowledgeDomain(domains[0]) if domains else KnowledgeDomain.GENERAL
 
-def calculate_response_metrics(user_query: str, bot_response: str, user_feedback: Optional[str] = None) -> LearningMetrics:
+def calculate_response_metrics(user_query: str | MessageAnalysis, bot_response: str, user_feedback: Optional[str] = None) -> LearningMetrics:
     """حساب مقاييس جودة الاستجابة"""
     metrics = LearningMetrics()
     
@@ -823,7 +1189,7 @@ def calculate_response_metrics(user_query: str, bot_response: str, user_feedback
     metrics.accuracy = min(len(bot_response) / 500, 1.0) * 0.8
     
     # حساب الصلة (بناءً على تطابق الكلمات الرئيسية)
-    query_words = set(user_query.lower().split())
+    query_words = MessageAnalysis.of(user_query).token_set
     response_words = set(bot_response.lower().split())
     common_words = query_words.intersection(response_words)
     metrics.relevance = min(len(common_words) / max(1, len(query_words)), 1.0)
@@ -9,6 +9,10 @@ import logging
 from typing import List, Dict, Optional, Tuple
 from datetime import datetime, timedelta
 from rank_bm25 import BM25Okapi
+
+from core.message_analysis import MessageAnalysis
+from utils import arabic_text
+from core.tracing import traced
 import hashlib
 
 # إعداد التسجيل
@@ -17,14 +21,7 @@ logger = logging.getLogger(__name__)
 DB_PATH = os.environ.get("BASSAM_DB", "bassam_v2.db")
 
 # كلمات التوقف العربية المحسنة
-_AR_STOP = set("""
-و في على من مع عن الى إلى أو أم ثم بل قد لقد كان كانت كانوا كن كنت كنتن يكون تكون تكونون تكونن
-هذا هذه ذلك تلك هناك هنا حيث كذلك كما كيف لماذا لما إن أن إنما أنما ألا إلا ما لا لم لن هل
-جدا جداً فقط أيضا أيضًا أي أيًّا أيها التي الذي الذين اللذان اللتان اللواتي اللائي أولئك هؤلاء
-حين عندما بينما أثناء بسبب لدى ضمن دون غير بين قبل بعد منذ حتى خلال فوق تحت أمام وراء
-لذلك لهذا لذا لأن كي لكي إذ إذا إلا إنّ أنّ ألا لكن اللي الي عند عنا عنه عليها عليه
-بعض كل اي اى بعد قبل حين دون غير سوى الا إلا بلا فلان انا انت انتم انتن نحن
-""".split())
+_AR_STOP = arabic_text.STOPWORDS
 
 # ذاكرة التخزين المؤقت المحسنة
 _memory_cache: List[Dict] = []
@@ -157,27 +154,9 @@ def _enhanced_normalize(s: str) -> str:
     """تنقية محسّنة للنص العربي مع معالجة متقدمة"""
     if not s:
         return ""
-        
-    s = str(s).strip().lower()
-    
-    # استبدال الحروف المتباينة
-    repl = {
-        "أ": "ا", "إ": "ا", "آ": "ا", "ة": "ه", "ى": "ي", "ـ": "",
-        "َ": "", "ُ": "", "ِ": "", "ّ": "", "ْ": "", "ً": "", "ٌ": "", "ٍ": ""
-    }
-    for k, v in repl.items():
-        s = s.replace(k, v)
-    
-    # إزالة علامات الترقيم والرموز
-    s = re.sub(r'[^\w\s]', ' ', s)
     
-    # إزالة الأرقام المنفردة
-    s = re.sub(r'\b\d+\b', ' ', s)
-    
-    # إزالة المسافات الزائدة والكلمات القصيرة
-    words = [w for w in s.split() if w not in _AR_STOP and len(w) > 1]
-    
-    return " ".join(words)
+    # توحيد الحروف وحذف التشكيل والترقيم والأرقام المنفردة وكلمات التوقف في تمريرة واحدة
+    return arabic_text.normalize(str(s))
 
 def _calculate_text_hash(text: str) -> str:
     """حساب بصمة النص لمنع التكرار"""
@@ -246,42 +225,18 @@ def add_fact(text: str, source: str | None = None, category: str = "عام"):
     if quality < 0.2:
         return False
         
-    # التحقق من التكرار
-    text_hash = _calculate_text_hash(text)
-    
     conn = _connect()
     cur = conn.cursor()
     
     try:
-        # التحقق من وجود النص مسبقاً
-        cur.execute("SELECT id FROM facts WHERE hash = ?", (text_hash,))
-        existing = cur.fetchone()
-        
-        if existing:
-            # تحديث الاستخدام إذا كان موجوداً
-            cur.execute(
-                "UPDATE facts SET usage_count = usage_count + 1, last_used = ? WHERE id = ?",
-                (int(time.time()), existing[0])
-            )
-            conn.commit()
-            _close_connection(conn)
-            return True
-        
-        # إضافة حقيقة جديدة
-        normalized = _enhanced_normalize(text)
-        cur.execute("""
-            INSERT INTO facts 
-            (text, normalized_text, source, category, quality_score, added_at, hash) 
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (text.strip(), normalized, source, category, quality, int(time.time()), text_hash))
-        
+        inserted = _insert_fact(cur, text, source, category, quality)
         conn.commit()
         _close_connection(conn)
         
         # إعادة بناء الفهرس
-        _rebuild_index(force=True)
-        
-        logger.info(f"✅ تم إضافة حقيقة جديدة: {text[:50]}...")
+        if inserted:
+            _rebuild_index(force=True)
+            logger.info(f"✅ تم إضافة حقيقة جديدة: {text[:50]}...")
         return True
         
     except Exception as e:
@@ -290,6 +245,58 @@ def add_fact(text: str, source: str | None = None, category: str = "عام"):
         _close_connection(conn)
         return False
 
+def _insert_fact(cur: sqlite3.Cursor, text: str, source: str | None, category: str, quality: float) -> bool:
+    """إدراج حقيقة أو زيادة استخدامها إن كانت مكررة (True عند الإدراج)"""
+    # التحقق من التكرار
+    text_hash = _calculate_text_hash(text)
+    cur.execute("SELECT id FROM facts WHERE hash = ?", (text_hash,))
+    existing = cur.fetchone()
+    
+    if existing:
+        # تحديث الاستخدام إذا كان موجوداً
+        cur.execute(
+            "UPDATE facts SET usage_count = usage_count + 1, last_used = ? WHERE id = ?",
+            (int(time.time()), existing[0])
+        )
+        return False
+    
+    # إضافة حقيقة جديدة
+    normalized = _enhanced_normalize(text)
+    cur.execute("""
+        INSERT INTO facts 
+        (text, normalized_text, source, category, quality_score, added_at, hash) 
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (text.strip(), normalized, source, category, quality, int(time.time()), text_hash))
+    return True
+
+def add_facts_batch(facts: List[Tuple[str, Optional[str], str]]) -> int:
+    """إضافة دفعة حقائق (text, source, category) في معاملة واحدة مع إعادة بناء واحدة للفهرس (يرفع الاستثناء عند الفشل)"""
+    conn = _connect()
+    cur = conn.cursor()
+    inserted = 0
+    
+    try:
+        for text, source, category in facts:
+            if not text or len(text.strip()) < 10:
+                continue
+            quality = _calculate_fact_quality(text)
+            if quality < 0.2:
+                continue
+            inserted += _insert_fact(cur, text, source, category or "عام", quality)
+        conn.commit()
+    except Exception as e:
+        logger.error(f"❌ خطأ في إضافة دفعة الحقائق: {e}")
+        conn.rollback()
+        # الفشل يصل إلى المستدعي (عامل الحفظ) ليُحتسب ويُعاد المحاولة
+        raise
+    finally:
+        _close_connection(conn)
+    
+    if inserted:
+        _rebuild_index(force=True)
+        logger.info(f"✅ تم إضافة {inserted} حقيقة جديدة")
+    return inserted
+
 def _calculate_fact_quality(text: str) -> float:
     """حساب جودة الحقيقة من 0 إلى 1"""
     if not text or len(text) < 20:
@@ -347,14 +354,48 @@ def save_conv(user_msg: str, bot_msg: str, intent_type: str = None,
     finally:
         _close_connection(conn)
 
-def search_memory(q: str, limit: int = 5, min_score: float = 0.1, 
+def save_convs_batch(rows: List[Tuple]) -> int:
+    """حفظ دفعة محادثات (user_msg, bot_msg, intent_type, confidence, sources, session_id, ts) في معاملة واحدة (يرفع الاستثناء عند الفشل)"""
+    if not rows:
+        return 0
+    conn = _connect()
+    cur = conn.cursor()
+    
+    try:
+        cur.executemany("""
+            INSERT INTO conversations 
+            (user_msg, bot_msg, intent_type, confidence, sources_json, session_id, ts) 
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, [
+            (user_msg, bot_msg, intent_type, confidence, json.dumps(sources or []), session_id, ts)
+            for user_msg, bot_msg, intent_type, confidence, sources, session_id, ts in rows
+        ])
+        now = int(time.time())
+        cur.execute("""
+            INSERT INTO statistics (key, value, updated_at) 
+            VALUES ('total_conversations', ?, ?)
+            ON CONFLICT(key) DO UPDATE SET 
+            value = value + excluded.value, updated_at = excluded.updated_at
+        """, (len(rows), now))
+        conn.commit()
+        return len(rows)
+    except Exception as e:
+        logger.error(f"❌ خطأ في حفظ دفعة المحادثات: {e}")
+        conn.rollback()
+        raise
+    finally:
+        _close_connection(conn)
+
+@traced("search_memory")
+def search_memory(q: str | MessageAnalysis, limit: int = 5, min_score: float = 0.1, 
                  category: str = None) -> List[Dict]:
     """بحث محسن في الذاكرة مع تصفية متقدمة"""
-    if not _bm25 or not _memory_cache or not q.strip():
+    message = MessageAnalysis.of(q)
+    if not _bm25 or not _memory_cache or not message.text.strip():
         return []
     
-    # تطبيع query
-    norm_q = _enhanced_normalize(q)
+    # تطبيع query (مرة واحدة لكل رسالة)
+    norm_q = message.derive("memory_normalized", _enhanced_normalize)
     if not norm_q:
         return []
     
@@ -548,6 +589,27 @@ def get_recent_conversations(limit: int = 10, session_id: str = "default") -> Li
     finally:
         _close_connection(conn)
 
+def get_frequent_questions(limit: int = 20, days: int = 7) -> List[str]:
+    """أكثر رسائل المستخدمين تكراراً خلال الأيام الأخيرة"""
+    conn = _connect()
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT user_msg, COUNT(*) AS c 
+            FROM conversations 
+            WHERE ts >= ? 
+            GROUP BY user_msg 
+            HAVING c > 1 
+            ORDER BY c DESC 
+            LIMIT ?
+        """, (int(time.time()) - days * 86400, limit))
+        return [row[0] for row in cur.fetchall()]
+    except Exception as e:
+        logger.error(f"❌ خطأ في جلب الأسئلة الشائعة: {e}")
+        return []
+    finally:
+        _close_connection(conn)
+
 def get_context(user_msg: str, limit: int = 3) -> List[Dict]:
     """الحصول على سياق ذكي للمحادثة"""
     recent_conv = get_recent_conversations(limit=5)
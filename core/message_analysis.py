@@ -0,0 +1,81 @@
+# core/message_analysis.py — تحليل الرسالة مرة واحدة ومشاركته بين الوحدات
+from __future__ import annotations
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, FrozenSet, List, Sequence, Union
+
+_PUNCT_RE = re.compile(r"[^\w\s]")
+
+
+class KeywordGroups:
+    """مجموعات كلمات مفتاحية مُجمّعة مسبقاً (تعبير منتظم واحد لكل مجموعة)"""
+
+    def __init__(self, groups: Dict[Any, Sequence[str]]):
+        self.groups = dict(groups)
+        self._compiled = [
+            (key, re.compile("|".join(f"(?:{p})" for p in patterns)))
+            for key, patterns in self.groups.items() if patterns
+        ]
+
+    def scan(self, text: str) -> List[Any]:
+        """مفاتيح المجموعات المطابقة بترتيب التعريف"""
+        return [key for key, regex in self._compiled if regex.search(text)]
+
+
+@dataclass
+class MessageAnalysis:
+    """نتيجة تحليل رسالة واحدة: النص المنقّى والكلمات ونتائج المطابقة المحفوظة"""
+    text: str
+    lowered: str
+    normalized: str
+    tokens: List[str]
+    token_set: FrozenSet[str]
+    _derived: Dict[Any, Any] = field(default_factory=dict, repr=False, compare=False)
+
+    @classmethod
+    def from_text(cls, text: str) -> "MessageAnalysis":
+        """تحليل النص مرة واحدة"""
+        text = text or ""
+        lowered = text.lower()
+        normalized = " ".join(_PUNCT_RE.sub(" ", lowered).split())
+        tokens = lowered.split()
+        return cls(text=text, lowered=lowered, normalized=normalized,
+                   tokens=tokens, token_set=frozenset(tokens))
+
+    @classmethod
+    def of(cls, message: Union[str, "MessageAnalysis"]) -> "MessageAnalysis":
+        """إرجاع التحليل كما هو أو إنشاؤه من نص خام"""
+        return message if isinstance(message, cls) else cls.from_text(message)
+
+    def derive(self, key: Any, fn: Callable[[str], Any]) -> Any:
+        """حساب قيمة مشتقة من النص مرة واحدة وحفظها"""
+        if key not in self._derived:
+            self._derived[key] = fn(self.text)
+        return self._derived[key]
+
+    def match(self, groups: KeywordGroups, normalized: bool = False) -> List[Any]:
+        """المجموعات المطابقة في النص (محفوظة لكل مجموعة كلمات)"""
+        key = (groups, normalized)
+        if key not in self._derived:
+            self._derived[key] = groups.scan(self.normalized if normalized else self.lowered)
+        return self._derived[key]
+
+    def contains_any(self, words: Sequence[str]) -> bool:
+        """هل يحتوي النص على أي من الكلمات (مطابقة جزئية)"""
+        return any(word in self.lowered for word in words)
+
+    @property
+    def domains(self) -> List[str]:
+        """المجالات المكتشفة في الرسالة"""
+        return self.match(DOMAIN_KEYWORDS)
+
+
+# كلمات المجالات المشتركة بين مدير السياق ومحسّن التعلم
+DOMAIN_KEYWORDS = KeywordGroups({
+    "programming": [r"كود", r"برمجة", r"بايثون", r"جافا", r"html", r"css", r"سكريبت"],
+    "technology": [r"تقنية", r"تكنولوجيا", r"ذكاء", r"آلة", r"بيانات", r"سيرفر"],
+    "science": [r"علم", r"بحث", r"نظرية", r"تجربة", r"فيزياء", r"كيمياء"],
+    "business": [r"تجارة", r"شركة", r"سوق", r"ربح", r"استثمار"],
+    "health": [r"صحة", r"طب", r"علاج", r"دواء", r"مرض"],
+    "education": [r"تعلم", r"دراسة", r"مدرسة", r"جامعة", r"تعليم"]
+})
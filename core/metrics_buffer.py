@@ -0,0 +1,110 @@
+# core/metrics_buffer.py — مخزن مقاييس عمودي بحلقة ثابتة الحجم (NumPy)
+from __future__ import annotations
+import threading
+import time
+from typing import Dict, List, Optional, Any, Sequence
+
+import numpy as np
+
+class MetricsRingBuffer:
+    """حلقة ثابتة الحجم: مصفوفة لكل حقل مقياس + الوقت + رمز المجال، مع استعلامات متجهة"""
+
+    def __init__(self, fields: Sequence[str], categories: Sequence[str],
+                 capacity: int = 1000, weights: Optional[Dict[str, float]] = None):
+        self.fields = list(fields)
+        self.categories = list(categories)
+        self.capacity = capacity
+        self._category_codes = {name: code for code, name in enumerate(self.categories)}
+        self._field_index = {name: i for i, name in enumerate(self.fields)}
+
+        # عمود لكل مقياس (مصفوفة ثنائية الأبعاد مرتبة حسب الحقل) + عمود للنتيجة الإجمالية
+        self._values = np.zeros((len(self.fields), capacity), dtype=np.float32)
+        self._scores = np.zeros(capacity, dtype=np.float32)
+        self._timestamps = np.zeros(capacity, dtype=np.float64)
+        self._domains = np.zeros(capacity, dtype=np.int16)
+        self._weights = np.array(
+            [(weights or {}).get(name, 0.0) for name in self.fields], dtype=np.float32
+        )
+
+        self._next = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, category: str, values: Dict[str, float], timestamp: Optional[float] = None):
+        """إضافة سجل واحد (يستبدل الأقدم عند امتلاء الحلقة)"""
+        row = np.array([float(values.get(name, 0.0)) for name in self.fields], dtype=np.float32)
+        with self._lock:
+            i = self._next
+            self._values[:, i] = row
+            self._scores[i] = float(row @ self._weights)
+            self._timestamps[i] = time.time() if timestamp is None else timestamp
+            self._domains[i] = self._category_codes.get(category, -1)
+            self._next = (i + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+    def _mask(self, category: Optional[str], window_seconds: Optional[float]) -> np.ndarray:
+        """قناع السجلات المطابقة للمجال والنافذة الزمنية"""
+        mask = np.zeros(self.capacity, dtype=bool)
+        mask[:self._size] = True
+        if category is not None:
+            mask &= self._domains == self._category_codes.get(category, -2)
+        if window_seconds is not None:
+            mask &= self._timestamps >= time.time() - window_seconds
+        return mask
+
+    def summary(self, category: Optional[str] = None, window_seconds: Optional[float] = None,
+                percentiles: Sequence[float] = (50, 95)) -> Dict[str, Any]:
+        """المتوسط والنسب المئوية لكل مقياس وللنتيجة الإجمالية"""
+        with self._lock:
+            mask = self._mask(category, window_seconds)
+            values = self._values[:, mask]
+            scores = self._scores[mask]
+
+        count = int(scores.size)
+        if count == 0:
+            return {"count": 0, "metrics": {}, "overall_score": {}}
+
+        means = values.mean(axis=1)
+        pcts = np.percentile(values, percentiles, axis=1)
+        score_pcts = np.percentile(scores, percentiles)
+
+        metrics = {}
+        for name, i in self._field_index.items():
+            metrics[name] = {"mean": float(means[i])}
+            for p, row in zip(percentiles, pcts):
+                metrics[name][f"p{int(p)}"] = float(row[i])
+
+        overall = {"mean": float(scores.mean())}
+        for p, value in zip(percentiles, score_pcts):
+            overall[f"p{int(p)}"] = float(value)
+
+        return {"count": count, "metrics": metrics, "overall_score": overall}
+
+    def summary_by_category(self, window_seconds: Optional[float] = None,
+                            percentiles: Sequence[float] = (50, 95)) -> Dict[str, Any]:
+        """ملخص لكل مجال يحتوي على سجلات"""
+        with self._lock:
+            present = np.unique(self._domains[:self._size])
+        return {
+            self.categories[code]: self.summary(self.categories[code], window_seconds, percentiles)
+            for code in present if 0 <= code < len(self.categories)
+        }
+
+    def rolling_mean(self, field: str = "overall_score", category: Optional[str] = None,
+                     window: int = 50) -> List[float]:
+        """متوسط متحرك على آخر السجلات بالترتيب الزمني"""
+        with self._lock:
+            order = np.roll(np.arange(self.capacity), -self._next)[-self._size:] if self._size else np.arange(0)
+            if category is not None:
+                order = order[self._domains[order] == self._category_codes.get(category, -2)]
+            series = (self._scores if field == "overall_score"
+                      else self._values[self._field_index[field]])[order].astype(np.float64)
+
+        if series.size == 0:
+            return []
+        window = max(1, min(window, series.size))
+        cumsum = np.cumsum(np.insert(series, 0, 0.0))
+        return (((cumsum[window:] - cumsum[:-window]) / window)).tolist()
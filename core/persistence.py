@@ -0,0 +1,208 @@
+# core/persistence.py — عامل حفظ خلفي: طابور محدود ودفعات وسياسة إسقاط ومقاييس تأخر
+from __future__ import annotations
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from core.tracing import get_global_tracer
+
+# إعداد التسجيل
+logger = logging.getLogger(__name__)
+
+CONVERSATION = "conversation"
+FACT = "fact"
+
+class PersistenceWorker:
+    """يستقبل أحداث المحادثات والحقائق ويكتبها دفعات في خيط خلفي بعيداً عن مسار الرد"""
+
+    def __init__(self, save_conversations: Callable[[List[Tuple]], Any],
+                 add_facts: Callable[[List[Tuple]], Any],
+                 max_queue: int = 1000, batch_size: int = 50,
+                 batch_interval: float = 0.5, block_timeout: float = 0.05, max_attempts: int = 3):
+        self.save_conversations = save_conversations
+        self.add_facts = add_facts
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        # أقصى انتظار للمحادثات عند امتلاء الطابور (ضغط عكسي) قبل إسقاطها
+        self.block_timeout = block_timeout
+        # محاولات كتابة العنصر قبل إسقاطه (الدفعة الفاشلة تعود لمقدمة الطابور)
+        self.max_attempts = max_attempts
+
+        # (النوع، وقت الإدخال، البيانات، عدد المحاولات الفاشلة)
+        self._queue: Deque[Tuple[str, float, Tuple, int]] = deque()
+        self._cond = threading.Condition()
+        self._stop = False
+        self._busy = False
+
+        self.stats = {
+            "enqueued": 0,
+            "written_conversations": 0,
+            "written_facts": 0,
+            "dropped_conversations": 0,
+            "dropped_facts": 0,
+            "batches": 0,
+            "errors": 0,
+            "retried": 0,
+            "failed_conversations": 0,
+            "failed_facts": 0,
+            "last_lag": 0.0,
+            "max_lag": 0.0,
+            "avg_lag": 0.0
+        }
+
+        self._thread = threading.Thread(target=self._run, name="persistence-worker", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # ---------- الإدخال ----------
+
+    def submit_conversation(self, user_msg: str, bot_msg: str, intent_type: str = None,
+                            confidence: float = None, sources: List[dict] = None,
+                            session_id: str = "default") -> bool:
+        """إضافة محادثة للحفظ (قد تنتظر قليلاً عند الامتلاء)"""
+        row = (user_msg, bot_msg, intent_type, confidence, sources, session_id, int(time.time()))
+        return self._put(CONVERSATION, row)
+
+    def submit_fact(self, text: str, source: Optional[str] = None, category: str = "عام") -> bool:
+        """إضافة حقيقة للحفظ (تُسقط فوراً عند الامتلاء)"""
+        return self._put(FACT, (text, source, category))
+
+    def _put(self, kind: str, payload: Tuple) -> bool:
+        with self._cond:
+            if len(self._queue) >= self.max_queue and not self._make_room(kind):
+                self.stats[f"dropped_{kind}s"] += 1
+                return False
+            self._queue.append((kind, time.time(), payload, 0))
+            self.stats["enqueued"] += 1
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify()
+            return True
+
+    def _make_room(self, kind: str) -> bool:
+        """سياسة الامتلاء: الحقائق الجديدة تُسقط، والمحادثات تُزيح أقدم حقيقة أو تنتظر مهلة قصيرة"""
+        if kind == FACT:
+            return False
+        for i, (queued_kind, _, _, _) in enumerate(self._queue):
+            if queued_kind == FACT:
+                del self._queue[i]
+                self.stats["dropped_facts"] += 1
+                return True
+        self._cond.notify()
+        deadline = time.time() + self.block_timeout
+        while len(self._queue) >= self.max_queue:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            self._cond.wait(remaining)
+        return True
+
+    # ---------- الكتابة ----------
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._queue and not self._stop:
+                    self._cond.wait(self.batch_interval)
+                if not self._queue:
+                    if self._stop:
+                        return
+                    continue
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                self._busy = True
+                self._cond.notify_all()
+            ok = False
+            try:
+                ok = self._write_batch(batch)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+                    if not ok and not self._stop:
+                        # مهلة قبل إعادة المحاولة حتى لا تُستنزف قاعدة بيانات معطلة
+                        self._cond.wait(self.batch_interval)
+
+    def _write_batch(self, batch: List[Tuple[str, float, Tuple, int]]) -> bool:
+        """كتابة الدفعة؛ الجزء الفاشل يعود لمقدمة الطابور حتى max_attempts ثم يُحتسب فاشلاً"""
+        tracer = get_global_tracer()
+        written: List[Tuple[str, float, Tuple, int]] = []
+        failed: List[Tuple[str, float, Tuple, int]] = []
+        for kind, write in ((CONVERSATION, self.save_conversations), (FACT, self.add_facts)):
+            items = [item for item in batch if item[0] == kind]
+            if not items:
+                continue
+            start = time.perf_counter()
+            try:
+                write([payload for _, _, payload, _ in items])
+            except Exception as e:
+                with self._cond:
+                    self.stats["errors"] += 1
+                logger.error(f"❌ خطأ في حفظ دفعة {kind}: {e}")
+                failed.extend(items)
+                continue
+            tracer.record(f"persist_{kind}s_batch", (time.perf_counter() - start) * 1000)
+            written.extend(items)
+
+        now = time.time()
+        with self._cond:
+            retry = [(kind, queued_at, payload, attempts + 1) for kind, queued_at, payload, attempts in failed
+                     if attempts + 1 < self.max_attempts]
+            for kind, _, _, attempts in failed:
+                if attempts + 1 >= self.max_attempts:
+                    self.stats[f"failed_{kind}s"] += 1
+            self._queue.extendleft(reversed(retry))
+            self.stats["retried"] += len(retry)
+            if written:
+                lags = [now - queued_at for _, queued_at, _, _ in written]
+                self.stats["written_conversations"] += sum(1 for item in written if item[0] == CONVERSATION)
+                self.stats["written_facts"] += sum(1 for item in written if item[0] == FACT)
+                self.stats["batches"] += 1
+                self.stats["last_lag"] = max(lags)
+                self.stats["max_lag"] = max(self.stats["max_lag"], max(lags))
+                # متوسط أسي لتأخر الكتابة
+                self.stats["avg_lag"] = 0.8 * self.stats["avg_lag"] + 0.2 * (sum(lags) / len(lags))
+        return not failed
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """انتظار كتابة كل ما في الطابور"""
+        deadline = time.time() + timeout
+        with self._cond:
+            self._cond.notify()
+            while self._queue or self._busy:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout: float = 5.0):
+        """إيقاف العامل بعد كتابة المتبقي"""
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            oldest = self._queue[0][1] if self._queue else None
+            return {
+                **self.stats,
+                "queue_depth": len(self._queue),
+                "max_queue": self.max_queue,
+                "oldest_pending_age": time.time() - oldest if oldest else 0.0
+            }
+
+
+# العامل العالمي
+_global_persistence_worker: Optional[PersistenceWorker] = None
+
+def get_global_persistence_worker() -> PersistenceWorker:
+    """الحصول على عامل الحفظ العالمي (يكتب إلى core.memory)"""
+    global _global_persistence_worker
+    if _global_persistence_worker is None:
+        from core.memory import save_convs_batch, add_facts_batch
+        _global_persistence_worker = PersistenceWorker(save_convs_batch, add_facts_batch)
+    return _global_persistence_worker
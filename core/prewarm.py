@@ -0,0 +1,206 @@
+# core/prewarm.py — تسخين مسبق لإجابات الأسئلة الشائعة في أوقات الخمول
+from __future__ import annotations
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from utils.arabic_text import clean as normalize_question
+
+# إعداد التسجيل
+logger = logging.getLogger(__name__)
+
+class AnswerPrewarmer:
+    """يحسب إجابات أكثر الأسئلة تكراراً مسبقاً ويخدمها مباشرة عند التطابق"""
+
+    def __init__(self, answer_fn: Callable[[str], Optional[Tuple[str, List[dict]]]],
+                 question_sources: Iterable[Callable[[int], List[str]]],
+                 top_n: int = 20, refresh_interval: float = 900.0,
+                 idle_seconds: float = 10.0, check_interval: float = 5.0,
+                 max_per_cycle: int = 5):
+        self.answer_fn = answer_fn
+        self.question_sources = list(question_sources)
+        self.top_n = top_n
+        self.refresh_interval = refresh_interval
+        self.idle_seconds = idle_seconds
+        self.check_interval = check_interval
+        self.max_per_cycle = max_per_cycle
+
+        self._cache: Dict[str, Dict[str, Any]] = {}
+        self._failed: Dict[str, float] = {}  # أسئلة فشل تسخينها (لا يُعاد حتى refresh_interval)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._last_request = 0.0
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.stats = {"hits": 0, "misses": 0, "warmed": 0, "stale_evictions": 0, "errors": 0}
+
+    # ---------- تتبع الحمل ----------
+
+    def request_started(self):
+        """تسجيل بداية طلب مستخدم (يوقف التسخين حتى يعود الخمول)"""
+        with self._lock:
+            self._in_flight += 1
+            self._last_request = time.time()
+
+    def request_finished(self):
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
+            self._last_request = time.time()
+
+    def is_idle(self) -> bool:
+        """لا طلبات جارية ولا طلبات خلال idle_seconds الأخيرة"""
+        with self._lock:
+            return self._in_flight == 0 and time.time() - self._last_request >= self.idle_seconds
+
+    # ---------- الخدمة ----------
+
+    def _is_fresh(self, entry: Dict[str, Any]) -> bool:
+        # الحداثة بالعمر وحده: الفهرس يُعاد بناؤه مع كل حقيقة جديدة فلا يصلح مقياساً لتغيّر الإجابة
+        return time.time() - entry["warmed_at"] < self.refresh_interval
+
+    def lookup(self, question: str) -> Optional[Tuple[str, List[dict]]]:
+        """إرجاع الإجابة المسخّنة إن كانت أحدث من refresh_interval"""
+        key = normalize_question(question)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None or not self._is_fresh(entry):
+                self.stats["misses"] += 1
+                return None
+            entry["hits"] += 1
+            self.stats["hits"] += 1
+            return entry["answer"], list(entry["sources"])
+
+    # ---------- التسخين ----------
+
+    def _candidates(self) -> List[str]:
+        """أكثر الأسئلة تكراراً من جميع المصادر (بدون تكرار)"""
+        seen, questions = set(), []
+        for source in self.question_sources:
+            try:
+                for question in source(self.top_n):
+                    key = normalize_question(question)
+                    if key and key not in seen:
+                        seen.add(key)
+                        questions.append(question)
+            except Exception as e:
+                logger.error(f"❌ خطأ في جلب الأسئلة الشائعة: {e}")
+        return questions[:self.top_n]
+
+    def warm_cycle(self, force: bool = False) -> int:
+        """تسخين الأسئلة الناقصة أو القديمة؛ يتوقف فور وصول طلب مستخدم"""
+        candidates = self._candidates()
+        wanted = {normalize_question(q) for q in candidates}
+
+        with self._lock:
+            # إزالة الأسئلة التي لم تعد ضمن الأكثر تكراراً
+            for key in [k for k in self._cache if k not in wanted]:
+                del self._cache[key]
+                self.stats["stale_evictions"] += 1
+            now = time.time()
+            self._failed = {k: t for k, t in self._failed.items() if now - t < self.refresh_interval}
+            todo = [
+                q for q in candidates
+                if normalize_question(q) not in self._failed
+                and (normalize_question(q) not in self._cache
+                     or not self._is_fresh(self._cache[normalize_question(q)]))
+            ]
+
+        warmed = 0
+        for question in todo[:self.max_per_cycle]:
+            if not force and not self.is_idle():
+                break
+            try:
+                result = self.answer_fn(question)
+            except Exception as e:
+                result = None
+                logger.error(f"❌ خطأ في تسخين الإجابة: {e}")
+            # لا تُخزَّن الإجابات البديلة أو رسائل الخطأ
+            if not result:
+                with self._lock:
+                    self._failed[normalize_question(question)] = time.time()
+                    self.stats["errors"] += 1
+                continue
+            answer, sources = result
+            with self._lock:
+                self._cache[normalize_question(question)] = {
+                    "question": question,
+                    "answer": answer,
+                    "sources": sources,
+                    "warmed_at": time.time(),
+                    "hits": 0
+                }
+                self.stats["warmed"] += 1
+            warmed += 1
+
+        if warmed:
+            logger.info(f"🔥 تم تسخين {warmed} إجابة")
+        return warmed
+
+    def _run(self):
+        while not self._stop_event.wait(self.check_interval):
+            if self.is_idle():
+                self.warm_cycle()
+
+    def start(self):
+        """تشغيل خيط التسخين الخلفي"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name="answer-prewarmer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def invalidate(self):
+        """مسح جميع الإجابات المسخّنة"""
+        with self._lock:
+            self._cache.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "size": len(self._cache),
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+                "questions": [entry["question"] for entry in self._cache.values()]
+            }
+
+
+def repeated_common_questions(learner, limit: int) -> List[str]:
+    """أسئلة المتعلم الشائعة التي طُرحت أكثر من مرة (مثل HAVING c > 1 في get_frequent_questions)"""
+    # العدد المضمون في ملخص Space-Saving هو count - error
+    return [item["question"] for item in learner.get_common_questions(limit)
+            if item["count"] - item.get("error", 0) > 1]
+
+
+# المسخّن العالمي
+_global_prewarmer: Optional[AnswerPrewarmer] = None
+
+def get_global_answer_prewarmer() -> AnswerPrewarmer:
+    """المسخّن العالمي: يسخّن إجابات الدماغ من أسئلة المتعلم وجدول المحادثات"""
+    global _global_prewarmer
+    if _global_prewarmer is None:
+        from core.brain import enhanced_chat_answer, response_generator
+        from core.learner import get_global_learner
+        from core.memory import get_frequent_questions
+
+        fallbacks = set(response_generator.fallbacks.values())
+
+        def warm_answer(question: str):
+            answer, sources = enhanced_chat_answer(question, persist=False)
+            if answer in fallbacks or answer.startswith("حدث خطأ"):
+                return None
+            return answer, sources
+
+        _global_prewarmer = AnswerPrewarmer(
+            answer_fn=warm_answer,
+            question_sources=[
+                lambda n: repeated_common_questions(get_global_learner(), n),
+                get_frequent_questions
+            ]
+        )
+        _global_prewarmer.start()
+    return _global_prewarmer
@@ -0,0 +1,186 @@
+# core/tracing.py — تتبع زمن مراحل الطلب (spans متداخلة + مدرجات تكرارية p50/p95/p99)
+from __future__ import annotations
+import bisect
+import contextvars
+import functools
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+# حدود سلال المدرج بالمللي ثانية: لوغاريتمية من 0.05ms حتى ~2 دقيقة (خطأ نسبي < 10%)
+_BUCKET_BOUNDS = [0.05 * (1.2 ** i) for i in range(81)]
+
+
+class LatencyHistogram:
+    """مدرج تكراري ثابت الحجم للأزمنة (تسجيل O(log n) وحساب النسب المئوية من العدادات)"""
+
+    def __init__(self):
+        self.counts = [0] * (len(_BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, ms: float):
+        self.counts[bisect.bisect_left(_BUCKET_BOUNDS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def percentile(self, p: float) -> float:
+        if not self.count:
+            return 0.0
+        target = p / 100.0 * self.count
+        cumulative = 0
+        for i, c in enumerate(self.counts):
+            cumulative += c
+            if cumulative >= target:
+                return min(_BUCKET_BOUNDS[i] if i < len(_BUCKET_BOUNDS) else self.max, self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count if self.count else 0.0,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "max_ms": self.max
+        }
+
+
+class Trace:
+    """تتبع طلب واحد: معرّف الطلب وقائمة المراحل المسجلة"""
+
+    __slots__ = ("request_id", "name", "start", "spans")
+
+    def __init__(self, name: str):
+        self.request_id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.start = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"request_id": self.request_id, "name": self.name, "spans": list(self.spans)}
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("current_trace", default=None)
+_current_span: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """يجمع أزمنة المراحل من الطلبات المختارة بالعينة في مدرج لكل مرحلة"""
+
+    def __init__(self, sample_rate: float = 0.1, keep_recent: int = 50):
+        self.sample_rate = sample_rate
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._recent: Deque[Dict[str, Any]] = deque(maxlen=keep_recent)
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, ms: float):
+        """تسجيل زمن مرحلة مباشرة (للعمليات الخلفية خارج الطلبات)"""
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = LatencyHistogram()
+            histogram.record(ms)
+
+    @contextmanager
+    def trace_request(self, name: str) -> Iterator[Optional[Trace]]:
+        """بداية تتبع طلب (يُتخطى كلياً إذا لم يُختر بالعينة)"""
+        if _current_trace.get() is not None or random.random() >= self.sample_rate:
+            yield _current_trace.get()
+            return
+
+        trace = Trace(name)
+        trace_token = _current_trace.set(trace)
+        span_token = _current_span.set(name)
+        try:
+            yield trace
+        finally:
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+            ms = (time.perf_counter() - trace.start) * 1000
+            trace.spans.append({"stage": name, "parent": None, "offset_ms": 0.0, "duration_ms": ms})
+            self.record(name, ms)
+            with self._lock:
+                self._recent.append(trace.to_dict())
+
+    def get_report(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sample_rate": self.sample_rate,
+                "stages": {stage: h.summary() for stage, h in sorted(self._histograms.items())},
+                "recent_traces": list(self._recent)[-10:]
+            }
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._recent.clear()
+
+
+@contextmanager
+def _active_span(trace: Trace, stage: str) -> Iterator[None]:
+    parent = _current_span.get()
+    token = _current_span.set(stage)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        _current_span.reset(token)
+        ms = (end - start) * 1000
+        trace.spans.append({
+            "stage": stage,
+            "parent": parent,
+            "offset_ms": (start - trace.start) * 1000,
+            "duration_ms": ms
+        })
+        get_global_tracer().record(stage, ms)
+
+
+def span(stage: str):
+    """قياس زمن مرحلة داخل الطلب الحالي (لا شيء تقريباً إذا لم يكن الطلب متتبعاً)"""
+    trace = _current_trace.get()
+    if trace is None:
+        return nullcontext()
+    return _active_span(trace, stage)
+
+
+def traced(stage: Optional[str] = None) -> Callable[[Callable], Callable]:
+    """مزخرف يقيس زمن الدالة كمرحلة باسم stage (افتراضياً اسم الدالة)"""
+    def decorator(fn: Callable) -> Callable:
+        name = stage or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            trace = _current_trace.get()
+            if trace is None:
+                return fn(*args, **kwargs)
+            with _active_span(trace, name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_request_id() -> Optional[str]:
+    """معرّف الطلب المتتبع الحالي (إن وجد)"""
+    trace = _current_trace.get()
+    return trace.request_id if trace else None
+
+
+# المتتبع العالمي
+_global_tracer: Optional[Tracer] = None
+
+def get_global_tracer() -> Tracer:
+    """الحصول على المتتبع العالمي (نسبة العينة من TRACE_SAMPLE_RATE)"""
+    global _global_tracer
+    if _global_tracer is None:
+        _global_tracer = Tracer(sample_rate=float(os.environ.get("TRACE_SAMPLE_RATE", "0.1")))
+    return _global_tracer
@@ -1,56 +1,88 @@
 # core/web_search.py — بحث DuckDuckGo + ملخص ويكيپيديا + تحويل HTML إلى نص
 from __future__ import annotations
-from duckduckgo_search import DDGS
-import requests, time, random
+import requests
 from bs4 import BeautifulSoup
 
+from core.budget import RequestBudget, current_budget
+from core.tracing import traced
+from utils.http_cache import CachedResponse, cached_fetch_text
+from utils.search import CircuitOpenError, get_global_search
+
 UA = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
                   "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124 Safari/537.36"
 }
 
-def web_search(query: str, max_results: int = 6, retries: int = 2):
-    """بحث آمن: عند الحظر يرجّع قائمة فاضية بدل رفع استثناء."""
+# أقل وقت يستحق معه إطلاق طلب شبكة (وإلا تُتخطى المرحلة)
+MIN_SEARCH_SECONDS = 1.0
+MIN_FETCH_SECONDS = 0.5
+
+# المحاولة الأولى بمنطقة ثابتة لتستفيد من ذاكرة البحث؛ المنطقة التالية تُستخدم للطلب الاحتياطي المتحوّط
+_REGIONS = ("xa-ar", "sa-ar", "us-en")
+
+@traced("web_search")
+def web_search(query: str, max_results: int = 6, retries: int = 2,
+               budget: RequestBudget | None = None):
+    """بحث آمن: عند الحظر يرجّع قائمة فاضية بدل رفع استثناء.
+    كل محاولة متحوّطة (مزوّد/منطقة احتياطية عند التأخر)، وإعادة المحاولة فورية بمنطقة أخرى دون نوم:
+    التراجع الأسي يتولاه قاطع الدائرة لكل مزوّد، فإذا كان مفتوحاً يفشل الطلب فوراً"""
+    budget = budget or current_budget()
     for attempt in range(retries + 1):
+        timeout = 10
+        if budget is not None:
+            if not budget.allows(MIN_SEARCH_SECONDS):
+                budget.skip("web_search")
+                return []
+            timeout = max(1, int(budget.timeout(10)))
         try:
-            region = random.choice(["xa-ar", "sa-ar", "us-en"])
-            with DDGS() as ddg:
-                results = ddg.text(query, max_results=max_results, region=region)
-            clean = []
-            for r in results or []:
-                url = r.get("href") or r.get("url")
-                if not url:
-                    continue
-                title = r.get("title") or url
-                snippet = r.get("body") or r.get("snippet") or ""
-                clean.append({"title": title, "url": url, "snippet": snippet})
-            return clean
+            regions = _REGIONS[attempt % len(_REGIONS):] + _REGIONS[:attempt % len(_REGIONS)]
+            results, _ = get_global_search().search_hedged(query, n=max_results, regions=regions, timeout=timeout)
+            return [{"title": r["title"], "url": r["url"], "snippet": r["snippet"]} for r in results]
+        except CircuitOpenError:
+            if budget is not None:
+                budget.skip("web_search", "circuit open")
+            return []
         except Exception:
-            if attempt < retries:
-                time.sleep(1.2 + attempt * 0.8)
-                continue
-            return []  # فشل نهائي بدون انهيار
+            continue
+    return []  # فشل نهائي بدون انهيار
 
-def fetch_text(url: str, max_chars: int = 4000) -> str:
-    if not url:
+def html_text(response: CachedResponse) -> str:
+    """مستخرِج نص الصفحة (يُحفظ ناتجه في الذاكرة المؤقتة المشتركة)"""
+    if not response.ok:
         return ""
-    try:
-        html = requests.get(url, headers=UA, timeout=12).text
-        soup = BeautifulSoup(html, "lxml")
-        for s in soup(["script", "style", "noscript"]):
-            s.extract()
-        text = " ".join(soup.get_text(" ").split())
-        return text[:max_chars]
-    except Exception:
+    soup = BeautifulSoup(response.text, "lxml")
+    for s in soup(["script", "style", "noscript"]):
+        s.extract()
+    return " ".join(soup.get_text(" ").split())
+
+@traced("fetch_text")
+def fetch_text(url: str, max_chars: int = 4000, budget: RequestBudget | None = None) -> str:
+    if not url:
         return ""
+    budget = budget or current_budget()
+    timeout = 12
+    if budget is not None:
+        if not budget.allows(MIN_FETCH_SECONDS):
+            budget.skip("fetch_text")
+            return ""
+        timeout = budget.timeout(12)
+    return cached_fetch_text(url, html_text, "lxml_text", timeout=timeout, headers=UA)[:max_chars]
 
-def wiki_summary_ar(title: str, max_chars: int = 1200) -> str:
+@traced("wiki_summary")
+def wiki_summary_ar(title: str, max_chars: int = 1200, budget: RequestBudget | None = None) -> str:
     """
     ملخص سريع من ويكيپيديا العربية (بدون مفاتيح).
     """
+    budget = budget or current_budget()
+    timeout = 8
+    if budget is not None:
+        if not budget.allows(MIN_FETCH_SECONDS):
+            budget.skip("wiki_summary")
+            return ""
+        timeout = budget.timeout(8)
     try:
         url = f"https://ar.wikipedia.org/api/rest_v1/page/summary/{requests.utils.quote(title)}"
-        r = requests.get(url, headers=UA, timeout=8)
+        r = requests.get(url, headers=UA, timeout=timeout)
         if r.status_code != 200:
             return ""
         j = r.json()
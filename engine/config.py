@@ -9,6 +9,14 @@ class Config:
     DB_PATH: str = os.path.join(DATA_DIR, "memory.db")
     INDEX_DIR: str = os.path.join(DATA_DIR, "index")
     INTENT_PATH: str = os.path.join(DATA_DIR, "intent.joblib")
+    INTENT_ONLINE_PATH: str = os.path.join(DATA_DIR, "intent_online.joblib")
+
+    # وضع التعلم التزايدي لنموذج النوايا (HashingVectorizer + SGDClassifier)
+    INTENT_ONLINE: bool = os.environ.get("INTENT_ONLINE", "0") == "1"
+    INTENT_MAX_EXAMPLES: int = int(os.environ.get("INTENT_MAX_EXAMPLES", "5000"))
+    INTENT_CHECKPOINT_SECONDS: float = float(os.environ.get("INTENT_CHECKPOINT_SECONDS", "30"))
+    # موجّه النوايا لا يثق بالنموذج المتعلم قبل تدريبه على هذا العدد من الأمثلة
+    INTENT_ROUTER_MIN_EXAMPLES: int = int(os.environ.get("INTENT_ROUTER_MIN_EXAMPLES", "500"))
 
     GOOGLE_CSE_ID: str = os.environ.get("GOOGLE_CSE_ID", "")
     GOOGLE_API_KEY: str = os.environ.get("GOOGLE_API_KEY", "")
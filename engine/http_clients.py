@@ -0,0 +1,239 @@
+# engine/http_clients.py — عملاء httpx غير متزامنين مشتركون (اتصالات دائمة، HTTP/2 إن توفر، حدود لكل مضيف، ومقاييس)
+from __future__ import annotations
+import asyncio
+import importlib.util
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+# HTTP/2 يتطلب الحزمة الاختيارية h2 (pip install httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+DEFAULT_HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                                 "(KHTML, like Gecko) Chrome/124 Safari/537.36"}
+
+# ملفات العملاء: "default" للطلبات العادية و"stream" للبث الطويل (بلا مهلة قراءة)
+# hold_until_close: حجز المضيف يبقى حتى إغلاق الاستجابة؛ البث الطويل يحرره عند وصول الترويسات
+# وإلا لانتظر المشاهد رقم per_host+1 إلى ما لا نهاية
+PROFILES: Dict[str, Dict[str, Any]] = {
+    "default": {"timeout": httpx.Timeout(20.0, connect=10.0), "hold_until_close": True},
+    "stream": {"timeout": httpx.Timeout(None, connect=10.0, pool=10.0), "hold_until_close": False},
+}
+
+
+class _HostStats:
+    __slots__ = ("in_flight", "peak", "requests", "errors", "total_latency")
+
+    def __init__(self):
+        self.in_flight = 0
+        self.peak = 0
+        self.requests = 0
+        self.errors = 0
+        self.total_latency = 0.0
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """يحرر حجز المضيف عند إغلاق الاستجابة (وليس عند وصول الترويسات) ليشمل البث الطويل"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+class _LimitedTransport(httpx.AsyncBaseTransport):
+    """ناقل يحد الاتصالات المتزامنة لكل مضيف ويقيس الاستخدام"""
+
+    def __init__(self, transport: httpx.AsyncHTTPTransport, per_host: int, hold_until_close: bool = True):
+        self._transport = transport
+        self._per_host = per_host
+        self._hold_until_close = hold_until_close
+        self._limits: Dict[str, asyncio.Semaphore] = {}
+        self.hosts: Dict[str, _HostStats] = {}
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        limit = self._limits.setdefault(host, asyncio.Semaphore(self._per_host))
+        stats = self.hosts.setdefault(host, _HostStats())
+        # انتظار الحجز محدود بمهلة المجمع كانتظار اتصال من httpcore نفسه
+        pool_timeout = request.extensions.get("timeout", {}).get("pool")
+        try:
+            await asyncio.wait_for(limit.acquire(), pool_timeout)
+        except asyncio.TimeoutError:
+            stats.errors += 1
+            raise httpx.PoolTimeout(f"per-host limit ({self._per_host}) reached for {host}", request=request)
+        start = time.perf_counter()
+        stats.in_flight += 1
+        stats.peak = max(stats.peak, stats.in_flight)
+        stats.requests += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        released = False
+
+        def release():
+            nonlocal released
+            if released:
+                return
+            released = True
+            stats.in_flight -= 1
+            stats.total_latency += time.perf_counter() - start
+            self.in_flight -= 1
+            limit.release()
+
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            stats.errors += 1
+            release()
+            raise
+        if not self._hold_until_close:
+            release()
+            return response
+        response.stream = _ReleasingStream(response.stream, release)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+    def open_connections(self) -> Optional[Dict[str, int]]:
+        """عدد الاتصالات المفتوحة/الخاملة في مجمع httpcore (إن أمكن قراءته)"""
+        try:
+            connections = self._transport._pool.connections
+            idle = sum(1 for c in connections if c.is_idle())
+            return {"open": len(connections), "idle": idle, "active": len(connections) - idle}
+        except Exception:
+            return None
+
+    def close_sockets(self):
+        """إغلاق مآخذ الاتصالات مباشرة (لعملاء حلقة أحداث لم تعد تعمل فلا يمكن انتظار aclose)"""
+        try:
+            connections = list(self._transport._pool.connections)
+        except Exception:
+            return
+        for connection in connections:
+            stream = getattr(getattr(connection, "_connection", None), "_network_stream", None)
+            sock = stream.get_extra_info("socket") if stream is not None else None
+            if sock is not None:
+                try:
+                    # asyncio يغلف المأخذ في TransportSocket (بلا close)
+                    getattr(sock, "_sock", sock).close()
+                except OSError:
+                    pass
+
+
+class HttpClients:
+    """مجموعة عملاء مشتركة تُنشأ مرة واحدة (في lifespan) وتُعاد لكل الطلبات"""
+
+    def __init__(self, max_connections: int = 100, max_keepalive: int = 20,
+                 keepalive_expiry: float = 30.0, per_host: int = 10, http2: bool = HTTP2_AVAILABLE):
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_keepalive,
+                                   keepalive_expiry=keepalive_expiry)
+        self.per_host = per_host
+        self.http2 = http2
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._transports: Dict[str, _LimitedTransport] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _create(self, name: str) -> httpx.AsyncClient:
+        profile = PROFILES[name]
+        transport = _LimitedTransport(
+            httpx.AsyncHTTPTransport(limits=self.limits, http2=self.http2), self.per_host,
+            hold_until_close=profile["hold_until_close"]
+        )
+        self._transports[name] = transport
+        return httpx.AsyncClient(transport=transport, headers=DEFAULT_HEADERS,
+                                 timeout=profile["timeout"], follow_redirects=True)
+
+    async def start(self):
+        """إنشاء جميع العملاء (يُستدعى من lifespan)"""
+        self._loop = asyncio.get_running_loop()
+        for name in PROFILES:
+            if name not in self._clients:
+                self._clients[name] = self._create(name)
+
+    def get(self, name: str = "default") -> httpx.AsyncClient:
+        """العميل المشترك (يُنشأ عند أول استخدام إذا لم يمر التطبيق بـ lifespan)"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # العملاء مرتبطون بحلقة الأحداث: حلقة جديدة (اختبارات/سكربتات) تحصل على عملاء جدد
+            clients, self._clients = self._clients, {}
+            transports, self._transports = self._transports, {}
+            old_loop, self._loop = self._loop, loop
+            self._close_stale(clients, transports, old_loop)
+        client = self._clients.get(name)
+        if client is None:
+            client = self._clients[name] = self._create(name)
+        return client
+
+    @staticmethod
+    def _close_stale(clients: Dict[str, httpx.AsyncClient], transports: Dict[str, _LimitedTransport],
+                     loop: Optional[asyncio.AbstractEventLoop]):
+        """إغلاق عملاء حلقة سابقة: عبر حلقتهم إن كانت تعمل (في خيط آخر)، وإلا بإغلاق المآخذ مباشرة"""
+        if loop is not None and loop.is_running():
+            for client in clients.values():
+                asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+            return
+        for transport in transports.values():
+            transport.close_sockets()
+
+    async def aclose(self):
+        clients, self._clients = self._clients, {}
+        self._transports = {}
+        for client in clients.values():
+            await client.aclose()
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {
+            "http2": self.http2,
+            "max_connections": self.limits.max_connections,
+            "max_keepalive": self.limits.max_keepalive_connections,
+            "per_host": self.per_host,
+            "clients": {}
+        }
+        for name, transport in self._transports.items():
+            stats["clients"][name] = {
+                "in_flight": transport.in_flight,
+                "peak_in_flight": transport.peak_in_flight,
+                "utilisation": transport.in_flight / self.limits.max_connections,
+                "connections": transport.open_connections(),
+                "hosts": {
+                    host: {
+                        "in_flight": h.in_flight,
+                        "peak": h.peak,
+                        "requests": h.requests,
+                        "errors": h.errors,
+                        "avg_latency": h.total_latency / (h.requests - h.in_flight)
+                        if h.requests > h.in_flight else 0.0
+                    }
+                    for host, h in transport.hosts.items()
+                }
+            }
+        return stats
+
+
+# العملاء العالميون
+_global_http_clients: Optional[HttpClients] = None
+
+def get_global_http_clients() -> HttpClients:
+    """الحصول على مجموعة العملاء المشتركة"""
+    global _global_http_clients
+    if _global_http_clients is None:
+        _global_http_clients = HttpClients()
+    return _global_http_clients
+
+def get_client(name: str = "default") -> httpx.AsyncClient:
+    """اختصار: العميل المشترك بالاسم"""
+    return get_global_http_clients().get(name)
@@ -12,9 +12,9 @@ try:
 except Exception:
     WhisperModel = None  # fallback لو ما توفّر
 
-from engine.config import DATA_DIR
+from engine.config import cfg
 
-CORPUS_DIR = os.path.join(DATA_DIR, "corpus")
+CORPUS_DIR = os.path.join(cfg.DATA_DIR, "corpus")
 os.makedirs(CORPUS_DIR, exist_ok=True)
 
 def _video_id(url: str) -> str:
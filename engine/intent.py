@@ -1,19 +1,47 @@
-import os
-from typing import List, Tuple
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
+import os, re, copy, time, threading
+from collections import OrderedDict
+from typing import List, Tuple, Optional
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer
+from sklearn.linear_model import LogisticRegression, SGDClassifier
 import joblib
 from .config import cfg
 
+def _example_key(text: str) -> str:
+    return re.sub(r"\s+", " ", (text or "").strip())
+
 class IntentModel:
-    def __init__(self):
+    def __init__(self, online: Optional[bool] = None):
         self.model = None
         self.vec = None
         self.labels = []
+        # online=True: تعلم تزايدي بتكلفة ثابتة لكل رسالة بدل إعادة التدريب الكامل
+        self.online = cfg.INTENT_ONLINE if online is None else online
+        self._data: "OrderedDict[str, str]" = OrderedDict()  # نص → تصنيف (بدون تكرار)
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._last_checkpoint = 0.0
+        self._checkpoint_thread: Optional[threading.Thread] = None
+        self._checkpoint_write_lock = threading.Lock()
+        # متجهات محسوبة مسبقاً للنصوص المتكررة (تُفرّغ عند تغيّر المُحوِّل)
+        self._vec_cache: "OrderedDict[str, object]" = OrderedDict()
+        self._vec_cache_owner = None
+        self._vec_cache_lock = threading.Lock()  # يُستدعى من خيوط الطلبات المتزامنة
+        self.vec_cache_size = 4096
+
+    @property
+    def path(self) -> str:
+        return cfg.INTENT_ONLINE_PATH if self.online else cfg.INTENT_PATH
 
     def load_or_init(self):
-        if os.path.exists(cfg.INTENT_PATH):
-            self.vec, self.model, self.labels = joblib.load(cfg.INTENT_PATH)
+        if os.path.exists(self.path):
+            state = joblib.load(self.path)
+            self.vec, self.model, self.labels = state[:3]
+            if len(state) > 3:
+                # نافذة الأمثلة المحفوظة مع النموذج التزايدي (الأمثلة الأحدث في الذاكرة تبقى الأحدث)
+                restored = OrderedDict(state[3])
+                restored.update(self._data)
+                self._data = restored
         else:
             # نموذج بسيط افتراضي
             self.add_examples([
@@ -25,25 +53,192 @@ class IntentModel:
             ])
             self.train()
 
-    def add_examples(self, pairs: List[Tuple[str,str]]):
-        if not hasattr(self, "_data"):
-            self._data = []
-        self._data.extend(pairs)
+    def add_examples(self, pairs: List[Tuple[str,str]]) -> List[Tuple[str,str]]:
+        """يضيف الأمثلة الجديدة فقط ويُرجعها (المكررة بنفس التصنيف تُتجاهل)."""
+        added = []
+        with self._lock:
+            for text, label in pairs:
+                key = _example_key(text)
+                if not key or self._data.get(key) == label:
+                    continue
+                self._data[key] = label
+                self._data.move_to_end(key)
+                added.append((key, label))
+            if self.online:
+                # في الوضع التزايدي نحتفظ بنافذة محدودة تكفي لإعادة البناء عند ظهور تصنيف جديد
+                while len(self._data) > cfg.INTENT_MAX_EXAMPLES:
+                    self._data.popitem(last=False)
+        return added
+
+    def learn(self, pairs: List[Tuple[str,str]], new_class_epochs: int = 5) -> int:
+        """تعلم تزايدي: partial_fit على الأمثلة الجديدة فقط ثم حفظ غير متزامن."""
+        added = self.add_examples(pairs)
+        if not added:
+            return 0
+        with self._lock:
+            if self.model is None:
+                # النموذج المحفوظ (أو الافتراضي) أولاً: لا تدريب من الصفر على فئة واحدة
+                self.load_or_init()
+            if self.model is None:
+                return len(added)
+            new_labels = {y for _, y in added} - set(self.model.classes_)
+            model, labels = self.model, self.labels
+            if new_labels:
+                # التوسيع على نسخة تُنشر بإسناد واحد: التنبؤ المتزامن لا يرى أوزاناً وفئات بأحجام مختلفة
+                model, labels = self._grown(new_labels)
+            X = self.vec.transform([t for t, _ in added])
+            ys = [y for _, y in added]
+            # الفئة الجديدة تبدأ بأوزان صفرية: بضع تمريرات على أمثلتها فقط
+            for _ in range(new_class_epochs if new_labels else 1):
+                model.partial_fit(X, ys, classes=labels)
+            self.model, self.labels = model, labels
+        self._schedule_checkpoint()
+        return len(added)
+
+    def _grown(self, new_labels):
+        """نسخة من النموذج التزايدي بفئات إضافية: أوزان الفئات القديمة تبقى والجديدة تبدأ من الصفر."""
+        old = list(self.model.classes_)
+        coef, intercept = self.model.coef_, self.model.intercept_
+        if len(old) == 2:
+            # النموذج الثنائي يحفظ متجهاً واحداً للفئة الموجبة classes_[1]
+            coef = np.vstack([-coef[0], coef[0]])
+            intercept = np.array([-intercept[0], intercept[0]])
+        rows = {label: i for i, label in enumerate(old)}
+        labels = sorted(set(old) | set(new_labels))
+        grown_coef = np.zeros((len(labels), coef.shape[1]), dtype=coef.dtype, order="C")
+        grown_intercept = np.zeros(len(labels), dtype=intercept.dtype)
+        for j, label in enumerate(labels):
+            if label in rows:
+                grown_coef[j] = coef[rows[label]]
+                grown_intercept[j] = intercept[rows[label]]
+        model = copy.deepcopy(self.model)
+        model.coef_ = grown_coef
+        model.intercept_ = grown_intercept
+        model.classes_ = np.array(labels)
+        return model, labels
 
     def train(self):
-        texts = [t for t,_ in self._data]
-        ys = [y for _,y in self._data]
-        self.labels = sorted(list(set(ys)))
-        self.vec = TfidfVectorizer(max_features=20000, ngram_range=(1,2))
-        X = self.vec.fit_transform(texts)
-        self.model = LogisticRegression(max_iter=200).fit(X, ys)
-        joblib.dump((self.vec, self.model, self.labels), cfg.INTENT_PATH)
+        if self.online:
+            with self._lock:
+                self._fit_online()
+            self._schedule_checkpoint()
+            return
+        texts = list(self._data.keys())
+        ys = list(self._data.values())
+        labels = sorted(list(set(ys)))
+        vec = TfidfVectorizer(max_features=20000, ngram_range=(1,2))
+        X = vec.fit_transform(texts)
+        model = LogisticRegression(max_iter=200).fit(X, ys)
+        with self._lock:
+            self.vec, self.model, self.labels = vec, model, labels
+        joblib.dump((vec, model, labels), cfg.INTENT_PATH)
+
+    def _fit_online(self, epochs: int = 5):
+        texts = list(self._data.keys())
+        ys = list(self._data.values())
+        labels = sorted(set(ys) | set(self.labels))
+        if len(labels) < 2:
+            # SGDClassifier يحتاج فئتين على الأقل: نحتفظ بالأمثلة حتى تظهر فئة ثانية
+            return
+        vec = HashingVectorizer(n_features=2**16, ngram_range=(1,2), alternate_sign=False)
+        model = SGDClassifier(loss="log_loss", alpha=1e-5, random_state=0)
+        X = vec.transform(texts)
+        for _ in range(epochs):
+            model.partial_fit(X, ys, classes=labels)
+        self.vec, self.model, self.labels = vec, model, labels
+
+    def _schedule_checkpoint(self):
+        """حفظ النموذج في خيط خلفي مع حد أدنى للفاصل بين عمليات الكتابة."""
+        with self._lock:
+            self._dirty = True
+            if self._checkpoint_thread is not None:
+                return
+            self._checkpoint_thread = threading.Thread(target=self._checkpoint_loop, name="intent-checkpoint", daemon=True)
+            self._checkpoint_thread.start()
+
+    def _checkpoint_loop(self):
+        try:
+            while True:
+                with self._lock:
+                    if not self._dirty:
+                        # الإنهاء تحت القفل: أي جدولة لاحقة ترى الخيط منتهياً فتبدأ خيطاً جديداً
+                        self._checkpoint_thread = None
+                        return
+                wait = self._last_checkpoint + cfg.INTENT_CHECKPOINT_SECONDS - time.time()
+                if wait > 0:
+                    time.sleep(wait)
+                self.checkpoint()
+        except Exception:
+            # فشل الكتابة لا يمنع الحفظ لاحقاً: الجدولة التالية تبدأ خيطاً جديداً
+            with self._lock:
+                self._checkpoint_thread = None
+            raise
+
+    def checkpoint(self):
+        """كتابة نسخة من النموذج إلى القرص (ملف مؤقت ثم إعادة تسمية)."""
+        # الكتابات متسلسلة: لا يتشارك كاتبان الملف المؤقت ولا تُكتب لقطة أقدم فوق أحدث
+        with self._checkpoint_write_lock:
+            with self._lock:
+                if self.model is None:
+                    self._dirty = False
+                    return
+                state = (self.vec, self.model, self.labels)
+                if self.online:
+                    # نافذة الأمثلة تُحفظ مع النموذج لتُستعاد بعد إعادة التشغيل
+                    state += (list(self._data.items()),)
+                snapshot = copy.deepcopy(state)
+                self._dirty = False
+            tmp_path = f"{self.path}.tmp"
+            joblib.dump(snapshot, tmp_path)
+            os.replace(tmp_path, self.path)
+            self._last_checkpoint = time.time()
+
+    def _snapshot(self):
+        """(المُحوِّل، النموذج) كما نُشرا معاً: يُقرآن تحت القفل ثم يُستخدمان دونه."""
+        with self._lock:
+            if self.model is None:
+                self.load_or_init()
+            return self.vec, self.model
 
     def predict(self, text: str) -> str:
-        if not self.model:
-            self.load_or_init()
-        X = self.vec.transform([text])
-        return self.model.predict(X)[0]
+        vec, model = self._snapshot()
+        return model.predict(vec.transform([text]))[0]
+
+    def vectorize(self, text: str):
+        """متجه النص مع تخزين مؤقت؛ صالح طالما لم يُستبدل المُحوِّل (vec)."""
+        vec, _ = self._snapshot()
+        return self._vectorize(vec, text)
+
+    def _vectorize(self, vec, text: str):
+        key = _example_key(text)
+        with self._vec_cache_lock:
+            if self._vec_cache_owner is not vec:
+                self._vec_cache.clear()
+                self._vec_cache_owner = vec
+            X = self._vec_cache.get(key)
+            if X is not None:
+                self._vec_cache.move_to_end(key)
+                return X
+        # التحويل خارج القفل حتى لا تنتظر الخيوط بعضها
+        X = vec.transform([key])
+        with self._vec_cache_lock:
+            if self._vec_cache_owner is vec:
+                self._vec_cache[key] = X
+                if len(self._vec_cache) > self.vec_cache_size:
+                    self._vec_cache.popitem(last=False)
+        return X
+
+    def predict_with_confidence(self, text: str) -> Tuple[str, float]:
+        """التصنيف الأرجح مع احتماله."""
+        vec, model = self._snapshot()
+        proba = model.predict_proba(self._vectorize(vec, text))[0]
+        best = int(proba.argmax())
+        return str(model.classes_[best]), float(proba[best])
 
     def classes(self) -> List[str]:
         return self.labels or []
+
+    def num_examples(self) -> int:
+        """عدد أمثلة التدريب المعروفة (نافذة الوضع التزايدي أو ما أُضيف في هذه الجلسة)."""
+        with self._lock:
+            return len(self._data)
@@ -1,6 +1,8 @@
 # engine/iptv.py
 from __future__ import annotations
-import httpx, re
+import re
+
+from engine.http_clients import get_client
 
 # تخزين بسيط في الذاكرة (يمكنك لاحقًا حفظه في ملف/DB)
 CHANNELS: list[dict] = []
@@ -26,7 +28,7 @@ def parse_m3u(text: str) -> list[dict]:
 
 async def load_m3u_from_url(url: str) -> int:
     global CHANNELS
-    r = httpx.get(url, timeout=30)
+    r = await get_client().get(url, timeout=30)
     r.raise_for_status()
     CHANNELS = parse_m3u(r.text)
     return len(CHANNELS)
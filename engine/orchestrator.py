@@ -2,15 +2,22 @@
 import os, re, asyncio, hashlib
 from datetime import datetime
 from typing import List, Dict, Any, Optional
-import httpx
 
-from engine.config import DATA_DIR
+from engine.config import cfg
 from engine.retriever import Retriever
 from engine.generator import AnswerSynthesizer
 from engine.ingest_web import ingest_url
 from engine.ingest_youtube import ingest_youtube
+from core.budget import RequestBudget
+from utils.search import get_global_search
 
-CORPUS_DIR = os.path.join(DATA_DIR, "corpus")
+# ميزانية الطلب الافتراضية والحدود الدنيا لكل مرحلة (بالثواني)
+DEFAULT_BUDGET = 20.0
+MIN_SEARCH_SECONDS = 1.0
+MIN_INGEST_SECONDS = 2.0
+GENERATION_RESERVE = 3.0
+
+CORPUS_DIR = os.path.join(cfg.DATA_DIR, "corpus")
 os.makedirs(CORPUS_DIR, exist_ok=True)
 
 # —— أدوات بسيطة ——
@@ -25,57 +32,41 @@ def _dedup_links(links: List[str]) -> List[str]:
             seen.add(k); out.append(u)
     return out
 
-# —— بحث ويب (Google CSE إن وجد، وإلا DuckDuckGo عبر html) ——
-async def _google_cse(query: str, api_key: str, cx: str, n: int = 5) -> List[Dict[str, Any]]:
-    async with httpx.AsyncClient(timeout=20) as client:
-        r = await client.get("https://www.googleapis.com/customsearch/v1",
-            params={"key": api_key, "cx": cx, "q": query, "num": min(n,10)})
-        r.raise_for_status()
-        items = r.json().get("items", []) or []
-        return [{"title": i.get("title"), "link": i.get("link")} for i in items][:n]
-
-async def _ddg_lite(query: str, n: int = 5) -> List[Dict[str, Any]]:
-    # بديل بسيط (غير رسمي) — يُمكنك استبداله بمكتبة أخرى
-    async with httpx.AsyncClient(timeout=20) as client:
-        r = await client.get("https://duckduckgo.com/html/", params={"q": query, "kl":"wt-wt"})
-        r.raise_for_status()
-        html = r.text
-    # استخراج روابط بشكل مبسّط
-    links = re.findall(r'href="(https?://[^"]+)"', html)
-    out = []
-    for lk in _dedup_links(links)[:n*2]:
-        if "duckduckgo.com" in lk: 
-            continue
-        out.append({"title": lk.split("//",1)[-1][:80], "link": lk})
-        if len(out) >= n: break
-    return out
-
-async def web_search(query: str, n: int = 5) -> List[Dict[str, Any]]:
-    key = os.getenv("GOOGLE_API_KEY","").strip()
-    cx  = os.getenv("GOOGLE_CSE_ID","").strip()
+# —— بحث ويب (Google CSE إن وجد، وإلا DuckDuckGo) عبر البحث الموحّد وذاكرته المؤقتة ——
+async def web_search(query: str, n: int = 5, timeout: float = 20) -> List[Dict[str, Any]]:
     try:
-        if key and cx:
-            return await _google_cse(query, key, cx, n=n)
-        return await _ddg_lite(query, n=n)
+        results = await asyncio.to_thread(get_global_search().search, query, n=n, timeout=timeout)
     except Exception:
         return []
+    return [{"title": r["title"], "link": r["url"]} for r in results][:n]
 
 # —— بحث يوتيوب (إرجاع روابط فيديو) ——
-async def yt_search(query: str, n: int = 3) -> List[str]:
+async def yt_search(query: str, n: int = 3, timeout: float = 20) -> List[str]:
     # أبسط طريقة: استخدم بحث الويب مع site:youtube.com
-    rs = await web_search(f"site:youtube.com {query}", n=n)
+    rs = await web_search(f"site:youtube.com {query}", n=n, timeout=timeout)
     links = [r["link"] for r in rs if "watch?v=" in r.get("link","")]
     return _dedup_links(links)[:n]
 
 # —— التقاط المحتوى (ingest) ——
-async def ingest_links(links: List[str]) -> List[str]:
+def _ingest_one(url: str) -> str:
+    if "youtube.com/watch" in url or "youtu.be/" in url:
+        return ingest_youtube(url)
+    return ingest_url(url)
+
+async def ingest_links(links: List[str], budget: Optional[RequestBudget] = None,
+                       reserve: float = 0.0) -> List[str]:
+    """التقاط الروابط بالتتابع؛ مع الميزانية يتوقف عند نفادها ويُهمل الرابط المتأخر"""
     saved = []
-    for url in links:
+    for i, url in enumerate(links):
+        if budget is not None and not budget.allows(MIN_INGEST_SECONDS, reserve):
+            budget.skip("ingest", f"تم تخطي {len(links) - i} روابط")
+            break
         try:
-            if "youtube.com/watch" in url or "youtu.be/" in url:
-                p = ingest_youtube(url)
+            if budget is None:
+                p = _ingest_one(url)
             else:
-                p = ingest_url(url)
+                p = await asyncio.wait_for(asyncio.to_thread(_ingest_one, url),
+                                           timeout=budget.timeout(15, reserve))
             saved.append(p)
         except Exception:
             continue
@@ -95,24 +86,33 @@ class MultiSourceRAG:
         ingest_after_search: bool = True,
         k_ctx: int = 6,
         style: Optional[str] = None,
+        budget: Optional[RequestBudget] = None,
     ) -> Dict[str, Any]:
         q = _norm(query)
-        # 1) بحث متوازي
-        web_task = asyncio.create_task(web_search(q, n=top_web))
-        yt_task  = asyncio.create_task(yt_search(q, n=top_yt))
-        web_res, yt_links = await asyncio.gather(web_task, yt_task)
+        budget = budget or RequestBudget(DEFAULT_BUDGET)
+
+        # 1) بحث متوازي (يُتخطى إذا لم يبقَ وقت بعد حجز وقت التوليد)
+        web_res, yt_links = [], []
+        if budget.allows(MIN_SEARCH_SECONDS, GENERATION_RESERVE):
+            timeout = budget.timeout(8, GENERATION_RESERVE)
+            web_task = asyncio.create_task(web_search(q, n=top_web, timeout=timeout))
+            yt_task  = asyncio.create_task(yt_search(q, n=top_yt, timeout=timeout))
+            web_res, yt_links = await asyncio.gather(web_task, yt_task)
+        else:
+            budget.skip("web_search")
 
         links = [r["link"] for r in web_res] + yt_links
         links = _dedup_links(links)
 
-        # 2) ingest اختياري
+        # 2) ingest اختياري (بقدر ما تسمح به الميزانية)
         saved_paths = []
         if ingest_after_search and links:
-            saved_paths = await ingest_links(links)
-            try:
-                self.retriever.build_index()
-            except Exception:
-                pass
+            saved_paths = await ingest_links(links, budget=budget, reserve=GENERATION_RESERVE)
+            if saved_paths:
+                try:
+                    self.retriever.build_index()
+                except Exception:
+                    pass
 
         # 3) استرجاع سياق
         ctx_chunks = []
@@ -121,7 +121,12 @@ class MultiSourceRAG:
         except Exception:
             ctx_chunks = []
 
-        # 4) توليد مع مراجع (بسرد الروابط بالأخير)
-        answer = self.generator.generate(q, context_chunks=ctx_chunks, style=style, max_tokens=900)
+        # 4) توليد مع مراجع (بسرد الروابط بالأخير) — إجابة أقصر إذا تآكل وقت التوليد المحجوز
+        max_tokens = 900
+        if not budget.allows(GENERATION_RESERVE):
+            max_tokens = 400
+            budget.skip("generate", "max_tokens=400")
+        answer = self.generator.generate(q, context_chunks=ctx_chunks, style=style, max_tokens=max_tokens)
         cites  = links[: min(len(links), 8)]
-        return {"ok": True, "answer": answer, "sources": cites, "ingested": saved_paths}
+        return {"ok": True, "answer": answer, "sources": cites, "ingested": saved_paths,
+                "budget": budget.to_dict()}
@@ -5,6 +5,8 @@ from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 import joblib
 
+from utils.arabic_text import tokenize_for_index
+
 ALLOWED_EXT = {".txt", ".md"}
 
 def _read_text(path: Path) -> str:
@@ -18,6 +20,11 @@ def _read_text(path: Path) -> str:
         except Exception:
             return ""
 
+def _make_vectorizer(**kwargs) -> TfidfVectorizer:
+    # مقطّع عربي موحّد (توحيد الحروف + حذف كلمات التوقف + تجذيع خفيف) بدلاً من token_pattern الافتراضي
+    return TfidfVectorizer(analyzer="word", tokenizer=tokenize_for_index, token_pattern=None,
+                           lowercase=False, **kwargs)
+
 class Retriever:
     def __init__(self, index_dir: str, corpus_dir: str):
         self.index_dir = Path(index_dir)
@@ -40,11 +47,11 @@ class Retriever:
                     docs.append(txt)
                     self.paths.append(p)
         if not docs:
-            self.vectorizer = TfidfVectorizer()
+            self.vectorizer = _make_vectorizer()
             self.matrix = self.vectorizer.fit_transform([""])
             joblib.dump((self.vectorizer, self.matrix, self.paths), self.index_file)
             return
-        self.vectorizer = TfidfVectorizer(analyzer="word", ngram_range=(1,2), min_df=1, max_df=0.9)
+        self.vectorizer = _make_vectorizer(ngram_range=(1,2), min_df=1, max_df=0.9)
         self.matrix = self.vectorizer.fit_transform(docs)
         joblib.dump((self.vectorizer, self.matrix, self.paths), self.index_file)
 
@@ -57,7 +64,7 @@ class Retriever:
 
     def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
         self._ensure_loaded()
-        if not self.matrix or not self.vectorizer: return []
+        if self.matrix is None or self.vectorizer is None: return []
         qv = self.vectorizer.transform([query])
         sims = cosine_similarity(qv, self.matrix).ravel()
         idxs = sims.argsort()[::-1][:k]
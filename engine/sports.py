@@ -1,8 +1,10 @@
 # engine/sports.py
+import asyncio
 import datetime as dt
-import httpx
 from bs4 import BeautifulSoup
 
+from engine.http_clients import get_client
+
 # محاولة ربط المباراة بالقناة (اختياري)
 try:
     from engine.xtream_proxy import build_live_url
@@ -14,9 +16,9 @@ except Exception:
 def _today_iso():
     return dt.date.today().isoformat()
 
-def _scrape_filgoal():
+async def _scrape_filgoal():
     url = "https://www.filgoal.com/matches"
-    r = httpx.get(url, timeout=20)
+    r = await get_client().get(url, timeout=20)
     r.raise_for_status()
     soup = BeautifulSoup(r.text, "html.parser")
     out = []
@@ -38,9 +40,9 @@ def _scrape_filgoal():
             })
     return out
 
-def _scrape_yallakora():
+async def _scrape_yallakora():
     url = "https://www.yallakora.com/match-center"
-    r = httpx.get(url, timeout=20)
+    r = await get_client().get(url, timeout=20)
     r.raise_for_status()
     soup = BeautifulSoup(r.text, "html.parser")
     out = []
@@ -62,9 +64,9 @@ def _scrape_yallakora():
             })
     return out
 
-def _scrape_kooora():
+async def _scrape_kooora():
     url = "https://www.kooora.com/?region=-1&day=today"
-    r = httpx.get(url, timeout=20)
+    r = await get_client().get(url, timeout=20)
     r.raise_for_status()
     soup = BeautifulSoup(r.text, "html.parser")
     out = []
@@ -87,11 +89,12 @@ def _scrape_kooora():
 
 async def get_today_fixtures(league_filter: str | None = None):
     results = []
-    for fn in (_scrape_filgoal, _scrape_yallakora, _scrape_kooora):
-        try:
-            results.extend(fn())
-        except Exception:
-            pass
+    # المصادر الثلاثة تُجلب معاً عبر العميل المشترك بدل طلبات متزامنة متتالية
+    scraped = await asyncio.gather(_scrape_filgoal(), _scrape_yallakora(), _scrape_kooora(),
+                                   return_exceptions=True)
+    for matches in scraped:
+        if not isinstance(matches, BaseException):
+            results.extend(matches)
 
     # إزالة التكرار
     seen = set()
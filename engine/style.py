@@ -1,6 +1,9 @@
 # engine/style.py
 import re
 
+_SPACES_RE = re.compile(r"\s+")
+_SPACE_BEFORE_PUNCT_RE = re.compile(r"\s+([،؛:.!?,])")
+
 class StyleModel:
     """
     طبقة تنسيق الأسلوب البشري: عربي واضح، علامات ترقيم، خيارات أسلوب.
@@ -15,9 +18,8 @@ class StyleModel:
             self.mode = mode
 
     def _norm_ar(self, s: str) -> str:
-        s = re.sub(r"\s+", " ", s)
-        s = s.replace(" ,", ",").replace(" .", ".").replace(" ؛", "؛").replace(" :", ":")
-        s = re.sub(r"\s+([،؛:.!?])", r"\1", s)
+        s = _SPACES_RE.sub(" ", s)
+        s = _SPACE_BEFORE_PUNCT_RE.sub(r"\1", s)
         return s.strip()
 
     def postprocess(self, answer: str, intent: str = "", sentiment: str = "") -> str:
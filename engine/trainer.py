@@ -8,17 +8,23 @@ class AutoTrainer:
         self.counter = 0
 
     def maybe_learn(self, text: str, label: str):
-        # تدريب بسيط كل 25 رسالة
-        self.intent.add_examples([(text, label)])
-        self.counter += 1
-        if self.counter % 25 == 0:
-            self.intent.train()
+        # الوضع التزايدي: تحديث فوري بتكلفة ثابتة
+        if self.intent.online:
+            self.intent.learn([(text, label)])
+            return
+        # تدريب بسيط كل 25 رسالة جديدة
+        if self.intent.add_examples([(text, label)]):
+            self.counter += 1
+            if self.counter % 25 == 0:
+                self.intent.train()
 
     def learn_from_memory(self) -> int:
         rows = self.memory.all(limit=500)
         pairs = [(msg, intent) for (_, msg, _, intent, _, _) in rows if msg and intent]
-        for p in pairs:
-            self.intent.add_examples([p])
-        if pairs:
+        if self.intent.online:
+            return self.intent.learn(pairs)
+        # الأمثلة المكررة لا تُضاف مجدداً، ولا نعيد التدريب إن لم يتغير شيء
+        added = self.intent.add_examples(pairs)
+        if added:
             self.intent.train()
-        return len(pairs)
+        return len(added)
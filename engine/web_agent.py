@@ -1,56 +1,66 @@
 # engine/web_agent.py
 from __future__ import annotations
 import re, html, time
-from typing import List, Dict, Tuple, Optional
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, Iterator, List, Optional, Tuple
 import requests
 from bs4 import BeautifulSoup
 
-try:
-    from duckduckgo_search import DDGS
-except Exception:
-    DDGS = None  # اختياري
-
-from .web import google_cse_search  # يستخدم مفاتيح GOOGLE_... إن وُجدت
+from utils.http_cache import CachedResponse, cached_fetch_text, get_global_http_cache
+from utils.search import get_global_search
 
 USER_AGENT = "BassamWebAgent/1.0 (+https://render.com)"
 HEADERS = {"User-Agent": USER_AGENT, "Accept-Language": "ar,en;q=0.8"}
 
 _URL = re.compile(r"https?://[^\s\]]+")
 
+# المهلة الكلية لتعميق السنيبّتات وخلاصة ويكي (بالثواني)
+ENRICH_DEADLINE = 8.0
+# تعميق السنيبّتات الأقصر من هذا الطول بجلب الصفحة
+MIN_SNIPPET_CHARS = 160
+# عمال مشتركون: المهام التي بدأت قبل المهلة تكمل في الخلفية وتملأ الذاكرة المؤقتة للطلب التالي،
+# وما لم يبدأ بعدها يُلغى كي لا يسدّ الطابور أمام الطلبات التالية
+_ENRICH_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="web_agent")
+# ويكي على عماله الخاصة: لا ينتظر خلف جلب الصفحات
+_WIKI_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="web_agent_wiki")
+
 def _clean_text(t: str) -> str:
     t = html.unescape(t or "")
     t = re.sub(r"\s+", " ", t).strip()
     return t
 
+def _extract_text(r: CachedResponse) -> str:
+    if r.status != 200 or "text/html" not in r.content_type:
+        return ""
+    soup = BeautifulSoup(r.text, "html.parser")
+    # إزالة سكربت/ستايل
+    for tag in soup(["script", "style", "noscript"]): tag.decompose()
+    txt = soup.get_text(" ")
+    return _clean_text(txt)
+
 def _fetch_text(url: str, timeout: int = 15) -> str:
+    # الذاكرة المؤقتة المشتركة: لا إعادة جلب أو تحليل للصفحات الحديثة
+    return cached_fetch_text(url, _extract_text, "web_agent_text", timeout=timeout, headers=HEADERS)[:8000]  # حد أمان
+
+def _cached_text(url: str) -> Optional[str]:
+    """نص الصفحة من الذاكرة المؤقتة فقط (بلا شبكة)"""
     try:
-        r = requests.get(url, headers=HEADERS, timeout=timeout)
-        if r.status_code != 200 or "text/html" not in r.headers.get("content-type",""):
-            return ""
-        soup = BeautifulSoup(r.text, "html.parser")
-        # إزالة سكربت/ستايل
-        for tag in soup(["script", "style", "noscript"]): tag.decompose()
-        txt = soup.get_text(" ")
-        return _clean_text(txt)[:8000]  # حد أمان
+        text = get_global_http_cache().peek_text(url, "web_agent_text")
     except Exception:
-        return ""
+        return None
+    return text[:8000] if text is not None else None
+
+def _enriched(sn: str, body: str) -> str:
+    # خذ أول فقرة مفيدة
+    para = (body or "")[:400]
+    return para if len(para) > 60 else sn
 
 def _ddg_search(query: str, max_results: int = 5) -> List[Dict]:
-    if DDGS is None:
-        return []
     try:
-        with DDGS() as ddgs:
-            results = list(ddgs.text(query, max_results=max_results))
-        out = []
-        for r in results:
-            out.append({
-                "title": r.get("title",""),
-                "link": r.get("href") or r.get("link") or "",
-                "snippet": r.get("body") or r.get("snippet") or ""
-            })
-        return out
+        results = get_global_search().search(query, n=max_results, provider="ddg")
     except Exception:
         return []
+    return [{"title": r["title"], "link": r["url"], "snippet": r["snippet"]} for r in results]
 
 def wiki_summary_ar(query: str) -> str:
     try:
@@ -62,54 +72,77 @@ def wiki_summary_ar(query: str) -> str:
     except Exception:
         return ""
 
-def gather_web(query: str, num: int = 5, fetch_pages: bool = True) -> Tuple[List[str], List[Dict], str, str]:
+def iter_web_snippets(results: List[Dict], fetch_pages: bool = True,
+                      deadline: Optional[float] = None) -> Iterator[Tuple[str, Dict]]:
+    """
+    يُرجع (سطر_سنيبّت, مصدر) بترتيب النتائج فور جاهزية كل عنصر:
+    الصفحات تُجلب معاً، المخزنة مؤقتاً لا تُجلب، وبعد deadline (time.monotonic) يُستخدم السنيبّت الأصلي.
+    """
+    deadline = deadline if deadline is not None else time.monotonic() + ENRICH_DEADLINE
+    items: List[Tuple[str, str, str, Optional[Future]]] = []
+    for it in results:
+        title = _clean_text(it.get("title",""))
+        link  = it.get("link") or it.get("href") or ""
+        sn    = _clean_text(it.get("snippet",""))
+        if not link:
+            continue
+        future = None
+        # إن أردنا تعميق السنيبّت
+        if fetch_pages and len(sn) < MIN_SNIPPET_CHARS:
+            cached = _cached_text(link)
+            if cached is not None:
+                sn = _enriched(sn, cached)
+            else:
+                future = _ENRICH_POOL.submit(_fetch_text, link)
+        items.append((title, link, sn, future))
+
+    for title, link, sn, future in items:
+        if future is not None:
+            try:
+                sn = _enriched(sn, future.result(timeout=max(0.0, deadline - time.monotonic())))
+            except FutureTimeout:
+                future.cancel()
+        if sn:
+            yield f"- {title}: {sn} … [{link}]", {"title": title, "link": link}
+
+def gather_web(query: str, num: int = 5, fetch_pages: bool = True,
+               deadline: float = ENRICH_DEADLINE) -> Tuple[List[str], List[Dict], str, str]:
     """
     يُرجع:
     - web_snippets: قائمة سطور "- نص … [url]" لاستخدامها مع المولّد المحلي
     - sources: قائمة مصادر {title, link}
     - wiki: خلاصة ويكي بالعربية (إن وجدت)
     - engine_used: "google" | "ddg" | "none"
+    deadline: المهلة الكلية بالثواني لتعميق السنيبّتات وخلاصة ويكي
     """
+    # خلاصة ويكي لا تعتمد على نتائج البحث: تبدأ فوراً بالتوازي
+    expires = time.monotonic() + deadline
+    wiki_future = _WIKI_POOL.submit(wiki_summary_ar, query)
     results: List[Dict] = []
     engine_used = "none"
 
-    # 1) جرّب Google CSE إن المفاتيح مضبوطة
+    # 1+2) Google CSE و DuckDuckGo بالتحوّط: يُطلق الثاني إذا تأخر الأول وتفوز أول نتيجة جيدة (ضمن المهلة الكلية)
     try:
-        results = google_cse_search(query, num=num)
-        if results:
-            engine_used = "google"
+        found, provider = get_global_search().search_hedged(query, n=num,
+                                                            timeout=max(1, expires - time.monotonic()))
+        if found:
+            engine_used = provider
+            results = [{"title": r["title"], "link": r["url"], "snippet": r["snippet"]} for r in found]
     except Exception:
         results = []
 
-    # 2) وإلا جرّب DuckDuckGo
-    if not results:
-        ddg = _ddg_search(query, max_results=num)
-        if ddg:
-            engine_used = "ddg"
-            results = ddg
-
-    # 3) هيّئ السنيبّتات + (اختياري) جلب محتوى الصفحات وزيادة الانطباع
+    # 3) هيّئ السنيبّتات + (اختياري) تعميقها بجلب الصفحات معاً
     snippets: List[str] = []
     sources: List[Dict] = []
-    for it in results[:num]:
-        title = _clean_text(it.get("title",""))
-        link  = it.get("link") or it.get("href") or ""
-        sn    = _clean_text(it.get("snippet",""))
-        if not link: 
-            continue
-        # إن أردنا تعميق السنيبّت
-        if fetch_pages and len(sn) < 160:
-            body = _fetch_text(link)
-            if body:
-                # خذ أول فقرة مفيدة
-                para = body[:400]
-                if len(para) > 60:
-                    sn = para
-        if sn:
-            snippets.append(f"- {title}: {sn} … [{link}]")
-            sources.append({"title": title, "link": link})
+    for line, source in iter_web_snippets(results[:num], fetch_pages=fetch_pages, deadline=expires):
+        snippets.append(line)
+        sources.append(source)
 
-    # 4) ويكي عربي
-    wiki = wiki_summary_ar(query)
+    # 4) ويكي عربي (ضمن المهلة نفسها)
+    try:
+        wiki = wiki_future.result(timeout=max(0.0, expires - time.monotonic()))
+    except FutureTimeout:
+        wiki_future.cancel()
+        wiki = ""
 
     return snippets, sources, wiki, engine_used
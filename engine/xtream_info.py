@@ -3,7 +3,7 @@ from __future__ import annotations
 import os, json, time, hmac, hashlib, base64
 from pathlib import Path
 from typing import Optional, Dict, Any
-import httpx
+from engine.http_clients import get_client
 from fastapi import APIRouter, HTTPException, Request, Response
 from fastapi.responses import StreamingResponse, JSONResponse
 
@@ -82,11 +82,10 @@ async def status():
     if not all(st.get(k) for k in ("server","username","password")):
         return {"ok": False, "configured": False}
     url = _api_url(st["server"], st["username"], st["password"], "action=user_info")
-    async with httpx.AsyncClient(timeout=20) as client:
-        r = await client.get(url)
-        if r.status_code != 200:
-            raise HTTPException(502, "xtream status error")
-        data = r.json()
+    r = await get_client().get(url, timeout=20)
+    if r.status_code != 200:
+        raise HTTPException(502, "xtream status error")
+    data = r.json()
     # معلومات مختصرة مفيدة
     info = data.get("user_info", {})
     server_info = data.get("server_info", {})
@@ -110,10 +109,9 @@ async def live_categories():
     if not all(st.get(k) for k in ("server","username","password")):
         raise HTTPException(400, "xtream not configured")
     url = _api_url(st["server"], st["username"], st["password"], "action=get_live_categories")
-    async with httpx.AsyncClient(timeout=30) as client:
-        r = await client.get(url)
-        r.raise_for_status()
-        cats = r.json() or []
+    r = await get_client().get(url, timeout=30)
+    r.raise_for_status()
+    cats = r.json() or []
     # ترتيب مبسّط
     cats = sorted(cats, key=lambda c: (c.get("category_name") or "").lower())
     return {"ok": True, "count": len(cats), "categories": cats}
@@ -127,10 +125,9 @@ async def live_streams(category_id: Optional[str] = None, search: Optional[str]
     if category_id:
         q += f"&category_id={category_id}"
     url = _api_url(st["server"], st["username"], st["password"], q)
-    async with httpx.AsyncClient(timeout=60) as client:
-        r = await client.get(url)
-        r.raise_for_status()
-        items = r.json() or []
+    r = await get_client().get(url, timeout=60)
+    r.raise_for_status()
+    items = r.json() or []
     # تصفية/بحث اختياري
     if search:
         s = search.strip().lower()
@@ -153,10 +150,9 @@ async def proxy_hls(stream_id: str, token: str):
     if not all(st.get(k) for k in ("server","username","password")):
         raise HTTPException(400, "xtream not configured")
     src = _m3u8_url(st["server"], st["username"], st["password"], stream_id)
-    async with httpx.AsyncClient(timeout=60, headers={"User-Agent":"Mozilla/5.0"}) as client:
-        r = await client.get(src)
-        r.raise_for_status()
-        content = r.content
+    r = await get_client().get(src, timeout=60)
+    r.raise_for_status()
+    content = r.content
     # لا نعيد كتابة المسارات الداخلية هنا؛ أغلب السيرفرات تعطي روابط مطلقة.
     return Response(content, media_type="application/vnd.apple.mpegurl")
 
@@ -166,10 +162,21 @@ async def proxy_segment(url: str):
     ممرّ عام لتجزئات TS/TSV أو m4s إذا احتجنا (اختياري).
     استدعِه عند الحاجة بفك تشفير الروابط داخل m3u8 إن كانت نسبية.
     """
-    async with httpx.AsyncClient(timeout=60, headers={"User-Agent":"Mozilla/5.0"}) as client:
-        async with client.stream("GET", url) as r:
-            r.raise_for_status()
-            return StreamingResponse(r.aiter_bytes(), media_type=r.headers.get("Content-Type","video/mp2t"))
+    client = get_client("stream")
+    r = await client.send(client.build_request("GET", url), stream=True)
+    if r.is_error:
+        await r.aclose()
+        r.raise_for_status()
+
+    async def gen():
+        # الاستجابة تبقى مفتوحة حتى ينتهي البث ثم يعود الاتصال إلى المجمع
+        try:
+            async for chunk in r.aiter_bytes():
+                yield chunk
+        finally:
+            await r.aclose()
+
+    return StreamingResponse(gen(), media_type=r.headers.get("Content-Type","video/mp2t"))
 
 @xtream_router.delete("/config")
 async def clear_config():
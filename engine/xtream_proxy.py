@@ -1,7 +1,9 @@
 # engine/xtream_proxy.py
 from fastapi import APIRouter, Query, HTTPException, Response
 from fastapi.responses import StreamingResponse, JSONResponse
-import os, httpx, asyncio
+import os, asyncio
+
+from engine.http_clients import get_client
 
 router = APIRouter(prefix="/api/xtream", tags=["xtream"])
 
@@ -41,10 +43,9 @@ async def get_categories(
     host, u, p = resolve_params(host, u, p)
     qs = f"host={host}&u={u}&p={p}&endpoint=player_api.php&action=get_live_categories"
     url = f"{proxy_base()}/xtream?{qs}"
-    async with httpx.AsyncClient(timeout=30) as client:
-        r = await client.get(url)
-        r.raise_for_status()
-        return JSONResponse(r.json())
+    r = await get_client().get(url, timeout=30)
+    r.raise_for_status()
+    return JSONResponse(r.json())
 
 @router.get("/streams")
 async def get_streams(
@@ -57,10 +58,9 @@ async def get_streams(
         f"&endpoint=player_api.php&action=get_live_streams&category_id={category_id}"
     )
     url = f"{proxy_base()}/xtream?{qs}"
-    async with httpx.AsyncClient(timeout=60) as client:
-        r = await client.get(url)
-        r.raise_for_status()
-        return JSONResponse(r.json())
+    r = await get_client().get(url, timeout=60)
+    r.raise_for_status()
+    return JSONResponse(r.json())
 
 @router.get("/stream/{stream_id}.m3u8")
 async def hls_m3u8(
@@ -72,11 +72,10 @@ async def hls_m3u8(
     url = f"{proxy_base()}/xplay?{qs}"
 
     async def gen():
-        async with httpx.AsyncClient(timeout=None) as client:
-            async with client.stream("GET", url) as r:
-                r.raise_for_status()
-                async for chunk in r.aiter_bytes():
-                    yield chunk
+        async with get_client("stream").stream("GET", url) as r:
+            r.raise_for_status()
+            async for chunk in r.aiter_bytes():
+                yield chunk
 
     return StreamingResponse(gen(), media_type="application/vnd.apple.mpegURL")
 
@@ -91,10 +90,9 @@ async def ts_mpeg(
     url = f"{proxy_base()}/xplay?{qs}"
 
     async def gen():
-        async with httpx.AsyncClient(timeout=None) as client:
-            async with client.stream("GET", url) as r:
-                r.raise_for_status()
-                async for chunk in r.aiter_bytes():
-                    yield chunk
+        async with get_client("stream").stream("GET", url) as r:
+            r.raise_for_status()
+            async for chunk in r.aiter_bytes():
+                yield chunk
 
     return StreamingResponse(gen(), media_type="video/MP2T")
@@ -2,23 +2,44 @@ from fastapi import FastAPI, Request, UploadFile, File, HTTPException, Header
 from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from contextlib import asynccontextmanager
 from typing import Optional, Dict, Any
+import math
 import os
 from pathlib import Path
 
 from engine.retriever import Retriever
 from engine.generator import AnswerSynthesizer
+from core.learning_optimizer import get_global_learning_optimizer
+from core.tracing import get_global_tracer
+from core.budget import RequestBudget
+from utils.search import get_global_search
+from engine.http_clients import get_global_http_clients
 
 APP_DIR = Path(__file__).parent.resolve()
 DATA_DIR = APP_DIR / "data"
 CORPUS_DIR = DATA_DIR / "corpus"
 UPLOADS_DIR = DATA_DIR / "uploads"
 OWNER_PIN = os.environ.get("OWNER_PIN", "bassam1234")
+# أقصى ميزانية زمنية لطلب المحادثة بالثواني
+CHAT_TIMEOUT = float(os.environ.get("CHAT_TIMEOUT", "8"))
+# أقل ميزانية مقبولة من العميل (أقل منها لا يتسع لأي مرحلة)
+MIN_CHAT_TIMEOUT = 1.0
 
 CORPUS_DIR.mkdir(parents=True, exist_ok=True)
 UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
 
-app = FastAPI(title="AI Core Engine - Bassam Edition")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # عملاء HTTP المشتركون يعيشون طوال عمر التطبيق (اتصالات دائمة بدل اتصال جديد لكل طلب)
+    http_clients = get_global_http_clients()
+    await http_clients.start()
+    try:
+        yield
+    finally:
+        await http_clients.aclose()
+
+app = FastAPI(title="AI Core Engine - Bassam Edition", lifespan=lifespan)
 app.mount("/static", StaticFiles(directory=str(APP_DIR / "static")), name="static")
 templates = Jinja2Templates(directory=str(APP_DIR / "templates"))
 
@@ -41,6 +62,26 @@ async def ask(payload: Dict[str, Any]):
     meta = {"intent": "qa_local" if hits else "web_search", "sentiment": "neutral", "sources": [h["path"] for h in used]}
     return {"answer": answer, "meta": meta}
 
+@app.post("/api/chat")
+async def chat(payload: Dict[str, Any]):
+    q = (payload or {}).get("q") or ""
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="السؤال فارغ")
+    timeout = payload.get("timeout")
+    if timeout is None:
+        timeout = CHAT_TIMEOUT
+    try:
+        timeout = float(timeout)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="قيمة timeout غير صالحة")
+    if not math.isfinite(timeout) or timeout <= 0:
+        raise HTTPException(status_code=400, detail="قيمة timeout يجب أن تكون موجبة")
+    from core.brain import enhanced_chat_answer_async
+    # الميزانية تبدأ هنا وتُمرَّر إلى البحث والجلب والتوليد
+    budget = RequestBudget(min(max(timeout, MIN_CHAT_TIMEOUT), CHAT_TIMEOUT))
+    answer, sources = await enhanced_chat_answer_async(q, budget=budget)
+    return {"answer": answer, "sources": sources, "budget": budget.to_dict()}
+
 @app.post("/api/ingest/upload")
 async def ingest_upload(file: UploadFile = File(...), owner_pin: Optional[str] = Header(default=None, alias="X-Owner-Pin")):
     if not OWNER_PIN or owner_pin != OWNER_PIN:
@@ -53,3 +94,21 @@ async def ingest_upload(file: UploadFile = File(...), owner_pin: Optional[str] =
     except Exception:
         pass
     return {"ok": True, "saved": str(out_path)}
+
+@app.get("/api/learning/metrics")
+async def learning_metrics(domain: Optional[str] = None, window: Optional[float] = None,
+                           trend: Optional[int] = None):
+    return get_global_learning_optimizer().get_metrics_summary(domain=domain, window_seconds=window,
+                                                               trend_window=trend)
+
+@app.get("/api/metrics/latency")
+async def latency_metrics():
+    return get_global_tracer().get_report()
+
+@app.get("/api/metrics/search")
+async def search_metrics():
+    return get_global_search().get_stats()
+
+@app.get("/api/metrics/http")
+async def http_metrics():
+    return get_global_http_clients().get_stats()
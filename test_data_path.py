@@ -1,5 +1,7 @@
 import os
-from engine.config import DATA_DIR
+from engine.config import cfg
+
+DATA_DIR = cfg.DATA_DIR
 
 print("📁 مسار مجلد البيانات:", DATA_DIR)
 print("📂 المجلد موجود:", os.path.exists(DATA_DIR))
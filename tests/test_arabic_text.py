@@ -0,0 +1,68 @@
+# tests/test_arabic_text.py — التطبيع والتقطيع الموحّد مقارنة بـ _enhanced_normalize القديم في الذاكرة
+import re
+
+import pytest
+
+from utils import arabic_text
+from utils.arabic_text import STOPWORDS, clean, fold, fold_patterns, light_stem, normalize, tokenize
+
+# نسخة _enhanced_normalize الأصلية من core/memory.py (بكلمات التوقف بصيغتها الأصلية فقط)
+_LEGACY_STOP = set(arabic_text._RAW_STOPWORDS)
+_LEGACY_REPL = {"أ": "ا", "إ": "ا", "آ": "ا", "ة": "ه", "ى": "ي", "ـ": "",
+                "َ": "", "ُ": "", "ِ": "", "ّ": "", "ْ": "", "ً": "", "ٌ": "", "ٍ": ""}
+
+
+def _legacy_normalize(s):
+    if not s:
+        return ""
+    s = str(s).strip().lower()
+    for k, v in _LEGACY_REPL.items():
+        s = s.replace(k, v)
+    s = re.sub(r'[^\w\s]', ' ', s)
+    s = re.sub(r'\b\d+\b', ' ', s)
+    return " ".join(w for w in s.split() if w not in _LEGACY_STOP and len(w) > 1)
+
+
+SAMPLES = [
+    "السَّلامُ عليكم، هذه مكتبة لتحليل النصوص العربية في الذكاء الاصطناعي 2024!",
+    "ما هي عاصمة فرنسا؟ وما أكبر مدينة فيها",
+    "كتابةُ الكـــود بلغة بايثون",
+    "Python 3 and AI-based search, v2 release",
+    "x1 22 abc_def",
+    "",
+]
+
+
+@pytest.mark.parametrize("text", SAMPLES)
+def test_normalize_matches_legacy(text):
+    assert normalize(text) == _legacy_normalize(text)
+    assert normalize(text * 20) == _legacy_normalize(text * 20)  # المسار غير المخزّن مؤقتاً
+
+
+def test_deliberate_differences_from_legacy():
+    # كلمات التوقف تُطابق بعد التوحيد، والهمزات على الواو والياء تُوحَّد
+    assert _legacy_normalize("أو إلى أن هذا الموضوع مهم") == "او ان الموضوع مهم"
+    assert normalize("أو إلى أن هذا الموضوع مهم") == "الموضوع مهم"
+    assert normalize("مسؤول قائد ٱلكتاب") == "مسوول قايد الكتاب"
+
+
+def test_fold_and_clean():
+    assert fold("إسلامُ ــ أمّة") == "اسلام  امه"
+    assert clean("  مرحباً،   يا عالَم!  ") == "مرحبا يا عالم"
+    assert fold("") == clean("") == ""
+    assert fold_patterns({"a": ["أهلاً", {"b": "مدرسة"}], "n": 3}) == {"a": ["اهلا", {"b": "مدرسه"}], "n": 3}
+
+
+def test_tokenize_filters_and_stems():
+    text = "والكتابات في المدرسة 42 و ب"
+    assert tokenize(text) == ["والكتابات", "المدرسه"]
+    assert tokenize(text, stem=True) == ["كتاب", "مدرس"]
+    assert tokenize(text, remove_stopwords=False) == ["والكتابات", "في", "المدرسه"]
+    assert light_stem("الكتب") == "كتب" and light_stem("الي") == "الي"
+    assert all(fold(w) in STOPWORDS for w in ("إلى", "أيضًا", "هؤلاء"))
+
+
+def test_cached_tokens_are_not_shared():
+    first = tokenize("النصوص العربية")
+    first.append("x")
+    assert tokenize("النصوص العربية") == ["النصوص", "العربيه"]
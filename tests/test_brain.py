@@ -1 +1,32 @@
+# tests/test_brain.py — المسار غير المتزامن لا يحجب حلقة الأحداث بالتوجيه والتعلم
+import asyncio
+import threading
 
+import core.brain as brain
+
+
+class _Recorder:
+    def __init__(self):
+        self.threads = []
+
+    def route(self, text, context=None):
+        self.threads.append(threading.get_ident())
+        return {"type": "code", "confidence": 0.85, "stage": "keyword", "label": "code"}
+
+    def learn_from_message(self, text, analysis, user_id):
+        self.threads.append(threading.get_ident())
+
+
+def test_async_answer_routes_and_learns_off_the_event_loop(monkeypatch):
+    recorder = _Recorder()
+    monkeypatch.setattr(brain, "intent_router", recorder)
+    monkeypatch.setattr(brain, "get_global_learner", lambda: recorder)
+    monkeypatch.setattr(brain, "get_global_answer_prewarmer", lambda: None)
+    monkeypatch.setattr(brain, "handle_code_request", lambda q, intent: ("code", []))
+
+    async def run():
+        return threading.get_ident(), await brain.enhanced_chat_answer_async("اكتب لي كود بايثون")
+
+    loop_thread, answer = asyncio.run(run())
+    assert answer == ("code", [])
+    assert len(recorder.threads) == 2 and loop_thread not in recorder.threads
@@ -0,0 +1,63 @@
+# tests/test_budget.py — ميزانية الطلب: السماح بالمراحل، مهلها، وتسجيل التخطي
+import asyncio
+
+import pytest
+
+from core import budget as budget_module
+from core.budget import RequestBudget, current_budget, use_budget
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(budget_module.time, "monotonic", clock)
+    return clock
+
+
+def test_allows_keeps_reserve_for_later_stages(clock):
+    budget = RequestBudget(10.0)
+    assert budget.allows(7.0, reserve=3.0)
+    assert not budget.allows(7.5, reserve=3.0)
+
+    clock.now += 8.0
+    assert budget.allows(2.0) and not budget.allows(1.0, reserve=1.5)
+    clock.now += 5.0
+    assert budget.expired and budget.remaining() == 0.0
+
+
+def test_timeout_capped_by_stage_and_remaining(clock):
+    budget = RequestBudget(10.0)
+    assert budget.timeout(4.0) == 4.0
+    assert budget.timeout(15.0, reserve=3.0) == 7.0
+
+    clock.now += 9.0
+    assert budget.timeout(4.0, reserve=3.0) == 0.0
+
+
+def test_skip_records_degraded_stages(clock):
+    budget = RequestBudget(10.0)
+    clock.now += 2.5
+    budget.skip("web_search")
+    budget.skip("generate", "max_tokens=400")
+
+    report = budget.to_dict()
+    assert report["degraded"] == [{"stage": "web_search", "reason": "budget", "at": 2.5},
+                                  {"stage": "generate", "reason": "max_tokens=400", "at": 2.5}]
+    assert report["remaining"] == 7.5
+
+
+def test_budget_follows_request_into_threads():
+    budget = RequestBudget(5.0)
+    with use_budget(budget):
+        assert asyncio.run(asyncio.to_thread(current_budget)) is budget
+        with use_budget(None):
+            assert current_budget() is budget
+    assert current_budget() is None
@@ -0,0 +1,103 @@
+# tests/test_crawler.py — توحيد الروابط، وحدود الزاحف لكل مضيف وواجهته أمام ناقل httpx وهمي
+import asyncio
+from collections import Counter
+
+import httpx
+import pytest
+
+from core.crawler import AsyncCrawler, canonicalize_url
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("HTTPS://Example.COM:443/a//b/?z=1&a=2#top", "https://example.com/a/b?a=2&z=1"),
+    ("http://example.com:80", "http://example.com/"),
+    ("http://example.com:8080/docs/", "http://example.com:8080/docs"),
+    ("https://example.com/?q=&b=1", "https://example.com/?b=1&q="),
+    ("  https://example.com/x#frag  ", "https://example.com/x"),
+])
+def test_canonicalize_url(url, expected):
+    assert canonicalize_url(url) == expected
+    assert canonicalize_url(expected) == expected
+
+
+def _page(*links):
+    body = "".join(f'<a href="{link}">l</a>' for link in links)
+    return f"<html><body><p>صفحة</p>{body}</body></html>"
+
+
+class _Site:
+    """ناقل وهمي: صفحات لكل مسار مع قياس الطلبات المتزامنة لكل مضيف"""
+
+    def __init__(self, pages, delay=0.0):
+        self.pages = pages
+        self.delay = delay
+        self.requests = []
+        self.active = Counter()
+        self.peak = Counter()
+
+    async def __call__(self, request):
+        host = request.url.host
+        self.requests.append(str(request.url))
+        self.active[host] += 1
+        self.peak[host] = max(self.peak[host], self.active[host])
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active[host] -= 1
+        html = self.pages.get(request.url.path)
+        if html is None:
+            return httpx.Response(404)
+        return httpx.Response(200, text=html, headers={"content-type": "text/html; charset=utf-8"})
+
+
+def _crawl(site, seeds, **kwargs):
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(site)) as client:
+            crawler = AsyncCrawler(client=client, **kwargs)
+            return crawler, await crawler.crawl(seeds)
+    return asyncio.run(run())
+
+
+def test_duplicate_and_external_links_fetched_once():
+    site = _Site({
+        "/": _page("/a#x", "/a/", "/b?y=2&x=1", "https://other.test/", "/missing"),
+        "/a": _page("/", "/b?x=1&y=2"),
+        "/b": _page("/a"),
+    })
+    crawler, results = _crawl(site, ["https://site.test/"], max_pages=10)
+
+    assert sorted(r["url"] for r in results) == ["https://site.test/", "https://site.test/a",
+                                                 "https://site.test/b?x=1&y=2"]
+    assert len(site.requests) == 4 and not any("other.test" in url for url in site.requests)
+    assert crawler.stats["failed"] == 1
+    assert crawler.stats["skipped_duplicates"] >= 3
+
+
+def test_per_host_limit_caps_concurrent_requests():
+    links = [f"/p{i}" for i in range(12)]
+    pages = {"/": _page(*links), **{link: _page() for link in links}}
+    site = _Site(pages, delay=0.02)
+    _crawl(site, ["https://site.test/"], max_pages=13, concurrency=8, per_host=2)
+
+    assert len(site.requests) == 13
+    assert site.peak["site.test"] == 2
+
+
+def test_frontier_and_depth_limits():
+    site = _Site({
+        "/": _page(*[f"/p{i}" for i in range(10)]),
+        **{f"/p{i}": _page(f"/deep{i}") for i in range(10)},
+    })
+    crawler, results = _crawl(site, ["https://site.test/"], max_pages=20, max_frontier=4, max_depth=1)
+
+    # الواجهة لا تتجاوز 4 روابط منتظرة، والعمق 1 يمنع متابعة روابط الصفحات الفرعية
+    assert len(results) == 5
+    assert not any("deep" in url for url in site.requests)
+
+
+def test_pages_per_seed_shares_budget_between_hosts():
+    pages = {"/": _page(*[f"/p{i}" for i in range(10)]), **{f"/p{i}": _page() for i in range(10)}}
+    site = _Site(pages)
+    _, results = _crawl(site, ["https://one.test/", "https://two.test/"], max_pages=6, pages_per_seed=3)
+
+    assert Counter(httpx.URL(r["url"]).host for r in results) == {"one.test": 3, "two.test": 3}
@@ -0,0 +1,92 @@
+# tests/test_http_cache.py — الذاكرة المؤقتة لـ HTTP أمام خادم محلي
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from core.crawler import _page_extractor
+from utils.http_cache import HttpCache
+
+PAGE = b'<html><body><p>hello</p><a href="next">next</a></body></html>'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    requests_seen = []
+
+    def do_GET(self):
+        self.requests_seen.append((self.path, self.headers.get("If-None-Match")))
+        if self.path == "/moved":
+            self.send_response(302)
+            self.send_header("Location", "/docs/")
+            self.end_headers()
+            return
+        if self.path.startswith("/etag") and self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        if self.path.startswith("/etag"):
+            self.send_header("ETag", '"v1"')
+            self.send_header("Cache-Control", "no-cache")
+        self.send_header("Content-Length", str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    _Handler.requests_seen = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _blobs(cache):
+    return [name for _, _, files in os.walk(cache.blob_dir) for name in files]
+
+
+def test_fresh_hit_and_conditional_revalidation(tmp_path, server):
+    cache = HttpCache(cache_dir=str(tmp_path))
+    cache.get(f"{server}/plain")
+    assert cache.get(f"{server}/plain").from_cache
+    assert cache.stats["fresh_hits"] == 1
+
+    cache.get(f"{server}/etag")
+    revalidated = cache.get(f"{server}/etag")
+    assert revalidated.revalidated and revalidated.body == PAGE
+    assert _Handler.requests_seen[-1] == ("/etag", '"v1"')
+
+
+def test_url_dependent_text_follows_final_url(tmp_path, server):
+    cache = HttpCache(cache_dir=str(tmp_path))
+    first = json.loads(cache.fetch_text(f"{server}/a/", _page_extractor, "crawler_page", url_dependent=True))
+    second = json.loads(cache.fetch_text(f"{server}/b/", _page_extractor, "crawler_page", url_dependent=True))
+    assert first[1] == [f"{server}/a/next"]
+    assert second[1] == [f"{server}/b/next"]
+
+    # المدخل المخزن يحتفظ بالرابط بعد التحويل
+    for _ in range(2):
+        text = cache.fetch_text(f"{server}/moved", _page_extractor, "crawler_page", url_dependent=True)
+        assert json.loads(text)[1] == [f"{server}/docs/next"]
+    assert cache.get(f"{server}/moved").url == f"{server}/docs/"
+
+
+def test_size_counter_eviction_and_clear(tmp_path, server):
+    cache = HttpCache(cache_dir=str(tmp_path), max_bytes=len(PAGE) * 2)
+    for i in range(4):
+        cache.fetch_text(f"{server}/p{i}", lambda r: r.text, "raw")
+    assert cache.total_size() == cache._scan_size() <= cache.max_bytes
+    assert cache.stats["evictions"] > 0
+
+    cache.clear()
+    assert cache.total_size() == 0
+    assert _blobs(cache) == []
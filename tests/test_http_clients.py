@@ -0,0 +1,71 @@
+# tests/test_http_clients.py — حدود المضيف في العملاء المشتركين وإغلاقهم عند تغيّر حلقة الأحداث
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from engine.http_clients import HttpClients
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}/"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_per_host_wait_is_bounded_by_pool_timeout(server):
+    async def run():
+        clients = HttpClients(per_host=1)
+        client = clients.get()
+        async with client.stream("GET", server):
+            with pytest.raises(httpx.PoolTimeout):
+                await client.get(server, timeout=httpx.Timeout(5.0, pool=0.2))
+        assert (await client.get(server)).status_code == 200
+        await clients.aclose()
+
+    asyncio.run(run())
+
+
+def test_stream_client_does_not_hold_host_slot(server):
+    async def run():
+        clients = HttpClients(per_host=1)
+        client = clients.get("stream")
+        responses = [await client.send(client.build_request("GET", server), stream=True) for _ in range(3)]
+        assert [r.status_code for r in responses] == [200] * 3
+        for r in responses:
+            await r.aclose()
+        await clients.aclose()
+
+    asyncio.run(run())
+
+
+def test_new_event_loop_closes_previous_connections(server):
+    clients = HttpClients()
+
+    async def fetch():
+        await clients.get().get(server)
+        return clients._transports["default"]
+
+    old = asyncio.run(fetch())
+    assert old.open_connections()["open"] == 1
+    sockets = [c._connection._network_stream.get_extra_info("socket") for c in old._transport._pool.connections]
+    asyncio.run(fetch())
+    assert all(s.fileno() == -1 for s in sockets)
@@ -0,0 +1,63 @@
+# tests/test_intent_analyzer.py — ذاكرة التحليل المؤقتة ومفتاح السياق
+from core.intent_analyzer import AdvancedIntentAnalyzer, IntentType
+
+
+def test_cache_key_follows_context_intents():
+    analyzer = AdvancedIntentAnalyzer()
+    code_ctx = {"conversation_history": [{"user": "اكتب كود بايثون"}]}
+    info_ctx = {"conversation_history": [{"user": "ما هو الطقس"}]}
+
+    analyzer.analyze_intent("كيف اصنع موقع", code_ctx)
+    analyzer.analyze_intent("كيف اصنع موقع", info_ctx)
+    assert analyzer.cache_stats["hits"] == 0
+
+    analyzer.analyze_intent("كيف اصنع موقع", code_ctx)
+    assert analyzer.cache_stats["hits"] == 1
+
+
+def test_context_fingerprint_is_recent_intents():
+    analyzer = AdvancedIntentAnalyzer()
+    ctx = {"conversation_history": [{"user": ""}, {"user": "اكتب كود بايثون"}]}
+    assert analyzer._context_fingerprint(ctx) == (IntentType.CODE_GENERATION,)
+    assert analyzer._context_fingerprint({}) == ()
+
+
+def test_batch_across_processes_keeps_order_and_merges_stats():
+    analyzer = AdvancedIntentAnalyzer()
+    texts = ["اكتب كود بايثون", "ما هو الطقس", "مرحبا", "قارن بين بايثون وجافا", "احسب 5 + 7"] * 8
+    expected = [analyzer._run_analysis(text, {}).primary_intent for text in texts]
+    progress = []
+
+    results = list(analyzer.iter_analyze_batch(texts, workers=2, chunk_size=3,
+                                               progress=lambda done, total: progress.append(done)))
+
+    assert [r.primary_intent for r in results] == expected
+    assert progress == sorted(progress) and progress[-1] == len(texts)
+    stats = analyzer.analysis_stats
+    assert stats["total_analyses"] == len(texts)
+    assert sum(stats["intent_distribution"].values()) == len(texts)
+    for intent in set(expected):
+        assert stats["intent_distribution"][intent.value] == expected.count(intent)
+
+
+def test_bounded_map_limits_submitted_chunks():
+    from core.intent_analyzer import _bounded_map
+
+    class _Executor:
+        def __init__(self):
+            self.in_flight = self.peak = 0
+
+        def submit(self, fn, item):
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            executor = self
+
+            class _Future:
+                def result(self):
+                    executor.in_flight -= 1
+                    return fn(item)
+            return _Future()
+
+    executor = _Executor()
+    assert list(_bounded_map(executor, lambda x: x * 2, iter(range(20)), 4)) == [x * 2 for x in range(20)]
+    assert executor.peak == 4
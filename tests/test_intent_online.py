@@ -0,0 +1,78 @@
+# tests/test_intent_online.py — التعلم التزايدي لنموذج النوايا
+import threading
+
+import pytest
+
+from engine.config import cfg
+from engine.intent import IntentModel
+
+BASE = [
+    ("السلام عليكم", "greeting"),
+    ("اريد تلخيص هذا", "summarize"),
+    ("ابحث في الانترنت", "web_search"),
+    ("حلل لي هذا النص", "analyze"),
+    ("انشئ لي كود", "code"),
+]
+
+
+@pytest.fixture(autouse=True)
+def online_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(cfg, "INTENT_ONLINE_PATH", str(tmp_path / "intent_online.joblib"))
+    monkeypatch.setattr(cfg, "INTENT_CHECKPOINT_SECONDS", 0.0)
+    yield
+    # الحفظ الخلفي ينتهي قبل إعادة المسار الحقيقي
+    for thread in threading.enumerate():
+        if thread.name == "intent-checkpoint":
+            thread.join()
+
+
+def test_single_label_on_fresh_model_does_not_fit_one_class():
+    model = IntentModel(online=True)
+    model.add_examples([("مرحبا", "greeting")])
+    model.train()
+    assert model.model is None
+
+    assert model.learn([("كيف الطقس اليوم", "weather")]) == 1
+    assert "weather" in model.classes()
+    assert model.predict("كيف الطقس اليوم") == "weather"
+
+
+def test_new_label_after_restore_keeps_loaded_model():
+    trained = IntentModel(online=True)
+    trained.load_or_init()
+    trained.checkpoint()
+
+    restored = IntentModel(online=True)
+    restored.load_or_init()
+    assert len(restored._data) == len(BASE)
+
+    restored.learn([("كيف الطقس اليوم", "weather")])
+    assert restored.predict("كيف الطقس اليوم") == "weather"
+    for text, label in BASE:
+        assert restored.predict(text) == label
+
+
+def test_predict_during_class_growth_sees_consistent_model():
+    model = IntentModel(online=True)
+    model.load_or_init()
+    errors = []
+    stop = threading.Event()
+
+    def reader():
+        while not stop.is_set():
+            try:
+                model.predict_with_confidence("كيف الطقس اليوم")
+            except Exception as e:
+                errors.append(e)
+                return
+
+    threads = [threading.Thread(target=reader) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for i in range(30):
+        model.learn([(f"مثال جديد رقم {i}", f"label_{i}")], new_class_epochs=1)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert len(model.classes()) == len(BASE) + 30
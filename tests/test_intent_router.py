@@ -0,0 +1,54 @@
+# tests/test_intent_router.py — توجيه النوايا: الأكواد والمشاريع لا تضيع ومرحلة النموذج لا تعمل قبل تدريبه
+import pytest
+
+from core.intent_analyzer import IntentType
+from core.intent_router import ANALYZER_INTENT_MAP, IntentRouter
+
+
+class _StubModel:
+    def __init__(self, examples, label="greeting", confidence=0.9):
+        self.examples = examples
+        self.label = label
+        self.confidence = confidence
+        self.calls = 0
+
+    def num_examples(self):
+        return self.examples
+
+    def predict_with_confidence(self, text):
+        self.calls += 1
+        return self.label, self.confidence
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("اكتب لي كود بايثون", "code"),
+    ("python function to sort list", "code"),
+    ("انشئ مشروع موقع كامل", "project"),
+    ("ما هو الذكاء الاصطناعي", "question"),
+    ("مرحبا", "small_talk"),
+])
+def test_routes_like_keyword_analyzer_for_actions(text, expected):
+    router = IntentRouter(model=_StubModel(examples=5), min_model_examples=500)
+    assert router.route(text)["type"] == expected
+
+
+def test_every_intent_type_is_mapped():
+    assert set(ANALYZER_INTENT_MAP) == set(IntentType)
+
+
+def test_untrained_model_stage_is_skipped():
+    model = _StubModel(examples=5)
+    router = IntentRouter(model=model, min_model_examples=500)
+    router.route("كيف حالك اليوم")
+    assert model.calls == 0
+    assert not router.get_stats()["model_enabled"]
+
+
+def test_trained_model_answers_when_confident():
+    model = _StubModel(examples=1000, label="greeting", confidence=0.9)
+    router = IntentRouter(model=model, min_model_examples=500)
+    result = router.route("صباح الخير يا صديقي")
+    assert result == {"type": "small_talk", "confidence": 0.9, "stage": "model", "label": "greeting"}
+
+    # الكلمات المفتاحية تحسم طلبات الأكواد قبل النموذج
+    assert router.route("اكتب لي كود بايثون")["stage"] == "keyword"
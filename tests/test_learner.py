@@ -0,0 +1,36 @@
+# tests/test_learner.py — ملخص Space-Saving للأسئلة الشائعة وإعادة محاولة الحفظ الفاشل
+from core.learner import AdaptiveLearner, SpaceSavingTopK
+
+
+def test_top_follows_counts_and_recency():
+    sketch = SpaceSavingTopK(capacity=10)
+    for key, weight in [("a", 1), ("b", 3), ("c", 2), ("a", 2), ("d", 1)]:
+        sketch.add(key, weight)
+    assert [e["count"] for e in sketch.top(10)] == [3, 3, 2, 1]
+    assert sketch.top(1) == [sketch.entries["a"]]
+
+
+def test_eviction_replaces_min_and_keeps_bucket_order():
+    sketch = SpaceSavingTopK(capacity=2)
+    sketch.add("a", 5)
+    sketch.add("b", 1)
+    sketch.add("c")
+    assert "b" not in sketch
+    assert sketch.entries["c"] == {"count": 2, "error": 1}
+    assert [e["count"] for e in sketch.top(5)] == [5, 2]
+    assert sketch._min_count == 2
+
+
+def test_failed_flush_keeps_deltas_and_retries(tmp_path):
+    blocker = tmp_path / "blocker"
+    blocker.write_text("")
+    learner = AdaptiveLearner(path=str(blocker / "learning.json"), flush_interval=60)
+    learner.learn_from_message("ما هو التعلم الآلي", {"intent": "question"}, "u1")
+
+    learner.flush()
+    assert learner._pending_questions and learner._flush_timer is not None
+
+    learner.path = str(tmp_path / "learning.json")
+    learner.flush()
+    assert not learner._pending_questions
+    assert AdaptiveLearner(path=learner.path).get_common_questions(1)[0]["count"] == 1
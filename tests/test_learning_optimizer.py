@@ -0,0 +1,224 @@
+# tests/test_learning_optimizer.py — الدفعات التي فشلت كتابتها تُعاد مع الحفظ التالي، مختار الاستراتيجيات، والملخصات
+import random
+
+from core.learning_optimizer import KnowledgeDomain, LearningOptimizer, LearningStrategy, StrategyBandit
+
+
+class _FailingConnection:
+    """اتصال يفشل عند أول كتابة ثم يمرر كل شيء للاتصال الحقيقي"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.failed = False
+
+    def __enter__(self):
+        return self.conn.__enter__()
+
+    def __exit__(self, *exc):
+        return self.conn.__exit__(*exc)
+
+    def executemany(self, sql, rows):
+        if not self.failed:
+            self.failed = True
+            raise RuntimeError("disk I/O error")
+        return self.conn.executemany(sql, rows)
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+
+def test_failed_flush_keeps_rows_for_retry(tmp_path):
+    optimizer = LearningOptimizer(db_path=str(tmp_path / "learning.db"), flush_interval=3600)
+    try:
+        session_id = optimizer.start_learning_session(KnowledgeDomain.TECHNOLOGY, LearningStrategy.ACTIVE_LEARNING)
+        optimizer.end_learning_session(session_id, knowledge_gained=10, confidence_boost=0.2)
+
+        real = optimizer._conn
+        optimizer._conn = _FailingConnection(real)
+        optimizer.flush()
+        assert len(optimizer._pending_sessions) == 1
+        assert len(optimizer._pending_progress_updates) == 1
+        assert optimizer._pending_rollups
+        assert optimizer.strategy_bandit._dirty
+
+        optimizer.flush()
+        optimizer._conn = real
+        assert not optimizer._pending_sessions and not optimizer._pending_rollups
+        assert real.execute("SELECT COUNT(*) FROM learning_sessions").fetchone()[0] == 1
+        assert real.execute("SELECT sessions_count FROM learning_rollups").fetchone()[0] == 1
+        assert real.execute("SELECT usage_count FROM strategy_performance WHERE domain = ? AND strategy = ?",
+                            (KnowledgeDomain.TECHNOLOGY.value, LearningStrategy.ACTIVE_LEARNING.value)).fetchone()[0] >= 1
+    finally:
+        optimizer.close()
+
+
+class _BrokenConnection(_FailingConnection):
+    """اتصال تفشل كل كتاباته (قاعدة معطلة أو صف تالف)"""
+
+    def executemany(self, sql, rows):
+        raise RuntimeError("disk I/O error")
+
+
+def _end_session(optimizer):
+    session_id = optimizer.start_learning_session(KnowledgeDomain.TECHNOLOGY, LearningStrategy.ACTIVE_LEARNING)
+    optimizer.end_learning_session(session_id, knowledge_gained=10, confidence_boost=0.2)
+
+
+def test_rows_dropped_after_max_attempts(tmp_path):
+    optimizer = LearningOptimizer(db_path=str(tmp_path / "learning.db"), flush_interval=3600, max_attempts=3)
+    try:
+        _end_session(optimizer)
+        real = optimizer._conn
+        optimizer._conn = _BrokenConnection(real)
+        for _ in range(3):
+            optimizer.flush()
+        optimizer._conn = real
+
+        assert not optimizer._pending_sessions and not optimizer._pending_progress_updates
+        assert not optimizer._pending_rollups and not optimizer.strategy_bandit._dirty
+        stats = optimizer.persistence_stats
+        assert stats["flush_errors"] == 3
+        assert stats["dropped_sessions"] == 1 and stats["dropped_progress_updates"] == 1
+        assert stats["dropped_rollups"] == 1 and stats["dropped_strategies"] == 1
+
+        # الصفوف الجديدة بعد الإسقاط تُكتب عادياً
+        _end_session(optimizer)
+        optimizer.flush()
+        assert real.execute("SELECT COUNT(*) FROM learning_sessions").fetchone()[0] == 1
+    finally:
+        optimizer.close()
+
+
+def test_pending_rows_capped_while_database_is_down(tmp_path):
+    optimizer = LearningOptimizer(db_path=str(tmp_path / "learning.db"), flush_interval=3600,
+                                  flush_batch_size=1000, max_attempts=100, max_pending=5)
+    try:
+        real = optimizer._conn
+        optimizer._conn = _BrokenConnection(real)
+        for _ in range(8):
+            _end_session(optimizer)
+            optimizer.flush()
+        assert len(optimizer._pending_sessions) == 5
+        assert optimizer.persistence_stats["dropped_sessions"] == 3
+        optimizer._conn = real
+    finally:
+        optimizer.close()
+
+
+def test_bandit_prefers_rewarded_strategy():
+    random.seed(7)
+    bandit = StrategyBandit()
+    domain = KnowledgeDomain.SCIENCE
+    priors = {LearningStrategy.ACTIVE_LEARNING: 0.5, LearningStrategy.META_LEARNING: 0.5}
+    for _ in range(30):
+        bandit.update(domain, LearningStrategy.META_LEARNING, reward=1.5, efficiency=2.0, timestamp=1.0)
+        bandit.update(domain, LearningStrategy.ACTIVE_LEARNING, reward=-0.5, efficiency=0.5, timestamp=1.0)
+
+    assert bandit.mean(domain, LearningStrategy.META_LEARNING) == 32 / 34
+    assert bandit.mean(domain, LearningStrategy.ACTIVE_LEARNING) == 2 / 34
+    assert bandit.select(domain, priors, explore=False) == LearningStrategy.META_LEARNING
+    picks = [bandit.select(domain, priors) for _ in range(50)]
+    assert picks.count(LearningStrategy.META_LEARNING) == 50
+    # مجال آخر لا يتأثر بمكافآت هذا المجال
+    assert bandit.mean(KnowledgeDomain.BUSINESS, LearningStrategy.META_LEARNING) == 0.5
+
+
+def test_bandit_explores_untried_arms_from_priors():
+    random.seed(3)
+    bandit = StrategyBandit()
+    priors = {LearningStrategy.ACTIVE_LEARNING: 0.6, LearningStrategy.TRANSFER_LEARNING: 0.5}
+    assert bandit.select(KnowledgeDomain.SCIENCE, priors, explore=False) == LearningStrategy.ACTIVE_LEARNING
+    picks = {bandit.select(KnowledgeDomain.SCIENCE, priors) for _ in range(50)}
+    assert picks == set(priors)
+    assert not bandit._dirty
+
+
+def test_bandit_dirty_rows_and_capped_warm_start():
+    bandit = StrategyBandit(prior_strength=2.0, max_warm_start=50)
+    bandit.warm_start(KnowledgeDomain.SCIENCE, LearningStrategy.ACTIVE_LEARNING,
+                      success_rate=1.0, efficiency=0.5, usage_count=1000, last_used=5.0)
+    assert bandit.mean(KnowledgeDomain.SCIENCE, LearningStrategy.ACTIVE_LEARNING) == 52 / 54
+    assert not bandit._dirty
+
+    bandit.update(KnowledgeDomain.SCIENCE, LearningStrategy.ACTIVE_LEARNING, reward=0.0, efficiency=1.5, timestamp=9.0)
+    rows = bandit.pop_dirty_rows()
+    assert rows == [("active_learning", "science", 1000 / 1001, 501.5 / 1001, 1001, 9.0)]
+    assert bandit.pop_dirty_rows() == []
+
+    bandit.mark_dirty(rows)
+    assert bandit.pop_dirty_rows() == rows
+
+
+def test_bandit_state_survives_restart(tmp_path):
+    path = str(tmp_path / "learning.db")
+    optimizer = LearningOptimizer(db_path=path, flush_interval=3600)
+    try:
+        for _ in range(4):
+            optimizer.strategy_bandit.update(KnowledgeDomain.SCIENCE, LearningStrategy.META_LEARNING,
+                                             reward=1.0, efficiency=1.0, timestamp=1.0)
+        optimizer.flush()
+    finally:
+        optimizer.close()
+
+    restored = LearningOptimizer(db_path=path, flush_interval=3600)
+    try:
+        arm = restored.strategy_bandit.arms[(KnowledgeDomain.SCIENCE, LearningStrategy.META_LEARNING)]
+        assert arm["count"] == 4 and arm["reward_sum"] == 4.0
+        assert restored._get_strategy_performance(LearningStrategy.META_LEARNING, KnowledgeDomain.SCIENCE) > 0.5
+    finally:
+        restored.close()
+
+
+# معرّف الجلسة مبني على المجال والوقت بالمللي ثانية: مجال مختلف لكل جلسة متتالية
+_DOMAINS = (KnowledgeDomain.TECHNOLOGY, KnowledgeDomain.SCIENCE, KnowledgeDomain.BUSINESS)
+
+
+def _end_sessions(optimizer):
+    for domain in _DOMAINS:
+        session_id = optimizer.start_learning_session(domain, LearningStrategy.ACTIVE_LEARNING)
+        optimizer.end_learning_session(session_id, knowledge_gained=10, confidence_boost=0.2)
+    optimizer.flush()
+
+
+def _rollup_counts(optimizer):
+    summary = optimizer.get_rollup_summary(days=1)
+    return {domain: {strategy: stats["sessions_count"] for strategy, stats in strategies.items()}
+            for domain, strategies in summary.items()}
+
+
+def test_rollups_backfilled_once_from_existing_sessions(tmp_path):
+    path = str(tmp_path / "learning.db")
+    optimizer = LearningOptimizer(db_path=path, flush_interval=3600)
+    try:
+        _end_sessions(optimizer)
+        expected = _rollup_counts(optimizer)
+        # قاعدة قديمة: جلسات بلا ملخصات
+        with optimizer._conn:
+            optimizer._conn.execute("DELETE FROM learning_rollups")
+    finally:
+        optimizer.close()
+
+    assert expected == {domain.value: {"active_learning": 1} for domain in _DOMAINS}
+    for _ in range(2):
+        reopened = LearningOptimizer(db_path=path, flush_interval=3600)
+        try:
+            assert _rollup_counts(reopened) == expected
+            assert reopened.get_rollup_summary(days=1)["science"]["active_learning"]["knowledge_gained"] == 10
+        finally:
+            reopened.close()
+
+
+def test_compaction_keeps_rollups_of_deleted_sessions(tmp_path):
+    optimizer = LearningOptimizer(db_path=str(tmp_path / "learning.db"), flush_interval=3600, retention_days=30)
+    try:
+        _end_sessions(optimizer)
+        with optimizer._conn:
+            optimizer._conn.execute("UPDATE learning_sessions SET end_time = end_time - 40 * 86400 WHERE domain != ?",
+                                    (KnowledgeDomain.SCIENCE.value,))
+
+        assert optimizer.compact_sessions() == 2
+        assert optimizer._conn.execute("SELECT domain FROM learning_sessions").fetchall() == [("science",)]
+        assert optimizer.compact_sessions() == 0
+        assert _rollup_counts(optimizer) == {domain.value: {"active_learning": 1} for domain in _DOMAINS}
+    finally:
+        optimizer.close()
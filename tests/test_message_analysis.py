@@ -0,0 +1,72 @@
+# tests/test_message_analysis.py — تحليل الرسالة مرة واحدة: مجموعات الكلمات، الحفظ، ومطابقة المحلل القديم
+import re
+
+import pytest
+
+from core.analyzer import AdvancedAnalyzer
+from core.learning_optimizer import KnowledgeDomain, detect_query_domain
+from core.message_analysis import DOMAIN_KEYWORDS, KeywordGroups, MessageAnalysis
+
+MESSAGES = [
+    "اكتب لي كود بايثون لإنشاء مشروع جديد",
+    "مشكلة في راوتر الشبكة، الانترنت بطيء! عاجل",
+    "كيف أحمي سيرفر لينكس من الاختراق؟",
+    "اشرح لي قاعدة بيانات موقع web",
+    "Python script for IP scanning",
+    "",
+]
+
+
+def test_keyword_groups_scan_in_definition_order():
+    groups = KeywordGroups({"b": [r"اكتب.*كود"], "a": ["سكريبت", "script"], "empty": []})
+    assert groups.scan("اكتب لي سكريبت ثم كود") == ["b", "a"]
+    assert groups.scan("كود اكتب") == []
+    assert "empty" not in [key for key, _ in groups._compiled]
+
+
+def test_from_text_normalizes_once():
+    message = MessageAnalysis.from_text("مرحباً، Python!  جديد")
+    assert message.lowered == "مرحباً، python!  جديد"
+    assert message.normalized == "مرحبا python جديد"
+    assert message.tokens == ["مرحباً،", "python!", "جديد"]
+    assert MessageAnalysis.of(message) is message
+    assert MessageAnalysis.of(None).tokens == []
+
+
+def test_match_and_derive_are_cached():
+    groups = KeywordGroups({"greeting": ["مرحبا"]})
+    message = MessageAnalysis.from_text("مرحبا! بحث علمي")
+    calls = []
+
+    assert message.derive("len", lambda text: calls.append(text) or len(text)) == 15
+    assert message.derive("len", lambda text: calls.append(text) or 0) == 15
+    assert len(calls) == 1
+    assert message.match(groups) is message.match(groups)
+    assert message.match(groups, normalized=True) == ["greeting"]
+    assert message.domains == ["science"]
+
+
+def _legacy_analyze(message):
+    """المحلل قبل MessageAnalysis: تعبير منتظم لكل نمط والمطابقة الأخيرة هي المعتمدة"""
+    analyzer = AdvancedAnalyzer()
+    lowered = message.lower()
+    intent = "general"
+    for name, patterns in analyzer.patterns.groups.items():
+        if any(re.search(p, lowered) for p in patterns):
+            intent = name.replace("_request", "")
+    topics = [topic for topic, words in analyzer.topic_keywords.groups.items() if any(w in lowered for w in words)]
+    return intent, topics
+
+
+@pytest.mark.parametrize("text", MESSAGES)
+def test_analyzer_matches_legacy_regex_loop(text):
+    analysis = AdvancedAnalyzer().analyze(text)
+    assert (analysis["intent"], analysis["topics"]) == _legacy_analyze(text)
+
+
+@pytest.mark.parametrize("text", MESSAGES)
+def test_domain_detection_matches_legacy_scan(text):
+    lowered = text.lower()
+    legacy = [domain for domain, words in DOMAIN_KEYWORDS.groups.items() if any(w in lowered for w in words)]
+    expected = KnowledgeDomain(legacy[0]) if legacy else KnowledgeDomain.GENERAL
+    assert detect_query_domain(text) == detect_query_domain(MessageAnalysis.from_text(text)) == expected
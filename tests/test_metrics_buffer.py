@@ -0,0 +1,49 @@
+# tests/test_metrics_buffer.py — الحلقة العمودية: الالتفاف عند الامتلاء، الملخص لكل مجال، والمتوسط المتحرك
+import pytest
+
+from core.learning_optimizer import LearningOptimizer
+from core.metrics_buffer import MetricsRingBuffer
+
+
+def _buffer(capacity=4):
+    return MetricsRingBuffer(fields=["accuracy", "speed"], categories=["science", "sports"],
+                             capacity=capacity, weights={"accuracy": 1.0, "speed": 0.0})
+
+
+def test_wraparound_keeps_latest_records_in_order():
+    buffer = _buffer()
+    for i in range(6):
+        buffer.append("science", {"accuracy": i, "speed": 10 * i}, timestamp=1000.0 + i)
+
+    assert len(buffer) == 4
+    summary = buffer.summary()
+    assert summary["count"] == 4
+    assert summary["metrics"]["accuracy"]["mean"] == pytest.approx(3.5)
+    assert summary["metrics"]["speed"]["p50"] == pytest.approx(35.0)
+    assert buffer.rolling_mean("accuracy", window=1) == [2.0, 3.0, 4.0, 5.0]
+    assert buffer.rolling_mean(window=2) == [2.5, 3.5, 4.5]
+
+
+def test_summary_by_category_and_rolling_mean_per_category():
+    buffer = _buffer(capacity=10)
+    for i, category in enumerate(["science", "sports", "science", "unknown", "science"]):
+        buffer.append(category, {"accuracy": i}, timestamp=1000.0 + i)
+
+    by_category = buffer.summary_by_category()
+    assert set(by_category) == {"science", "sports"}
+    assert by_category["science"]["count"] == 3
+    assert by_category["science"]["overall_score"]["mean"] == pytest.approx(2.0)
+    assert by_category["sports"]["metrics"]["accuracy"] == {"mean": 1.0, "p50": 1.0, "p95": 1.0}
+    assert buffer.rolling_mean(category="science", window=2) == [1.0, 3.0]
+    assert buffer.summary("sports", window_seconds=60)["count"] == 0
+
+
+def test_metrics_summary_includes_trend_on_request(tmp_path):
+    optimizer = LearningOptimizer(db_path=str(tmp_path / "learning.db"))
+    buffer = optimizer.performance_history
+    for score in (0.2, 0.4, 0.6):
+        buffer.append("science", {"accuracy": score})
+
+    assert "trend" not in optimizer.get_metrics_summary()
+    trend = optimizer.get_metrics_summary(domain="science", trend_window=2)["trend"]
+    assert len(trend) == 2 and trend[0] < trend[1]
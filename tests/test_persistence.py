@@ -0,0 +1,44 @@
+# tests/test_persistence.py — عامل الحفظ الخلفي: الدفعات الفاشلة تُحتسب وتُعاد المحاولة
+from core.persistence import PersistenceWorker
+
+
+def _noop(rows):
+    return len(rows)
+
+
+def test_failed_batch_is_retried_then_written():
+    saved = []
+    calls = {"n": 0}
+
+    def flaky_save(rows):
+        calls["n"] += 1
+        if calls["n"] == 1:
+            raise RuntimeError("database is locked")
+        saved.extend(rows)
+        return len(rows)
+
+    worker = PersistenceWorker(flaky_save, _noop, batch_interval=0.01)
+    try:
+        worker.submit_conversation("سؤال", "جواب")
+        assert worker.flush(timeout=2.0)
+        stats = worker.get_stats()
+        assert len(saved) == 1
+        assert stats["errors"] == 1 and stats["retried"] == 1
+        assert stats["written_conversations"] == 1
+    finally:
+        worker.close()
+
+
+def test_batch_failing_every_attempt_is_counted_not_written():
+    def broken(rows):
+        raise RuntimeError("disk I/O error")
+
+    worker = PersistenceWorker(_noop, broken, batch_interval=0.01, max_attempts=2)
+    try:
+        worker.submit_fact("حقيقة طويلة بما يكفي للحفظ")
+        assert worker.flush(timeout=2.0)
+        stats = worker.get_stats()
+        assert stats["written_facts"] == 0
+        assert stats["failed_facts"] == 1 and stats["errors"] == 2
+    finally:
+        worker.close()
@@ -0,0 +1,31 @@
+# tests/test_prewarm.py — التسخين المسبق: مصادر الأسئلة المتكررة وحداثة الإجابات بالعمر
+from core.prewarm import AnswerPrewarmer, repeated_common_questions
+
+
+class _Learner:
+    def __init__(self, entries):
+        self.entries = entries
+
+    def get_common_questions(self, limit):
+        return self.entries[:limit]
+
+
+def test_learner_source_skips_questions_asked_once():
+    learner = _Learner([
+        {"question": "ما هو الذكاء الاصطناعي", "count": 4, "error": 0},
+        {"question": "سؤال بعد طرد", "count": 2, "error": 1},
+        {"question": "سؤال مرة واحدة", "count": 1},
+    ])
+    assert repeated_common_questions(learner, 10) == ["ما هو الذكاء الاصطناعي"]
+
+
+def test_warm_answer_served_until_refresh_interval():
+    calls = []
+    prewarmer = AnswerPrewarmer(answer_fn=lambda q: calls.append(q) or (f"جواب {q}", []),
+                                question_sources=[lambda n: ["سؤال شائع"]], refresh_interval=60)
+    assert prewarmer.warm_cycle(force=True) == 1
+    assert prewarmer.lookup("سؤال شائع") == ("جواب سؤال شائع", [])
+    assert prewarmer.warm_cycle(force=True) == 0 and calls == ["سؤال شائع"]
+
+    prewarmer.refresh_interval = 0
+    assert prewarmer.lookup("سؤال شائع") is None
@@ -0,0 +1,114 @@
+# tests/test_search.py — البحث الموحّد: الذاكرة المؤقتة لكل المزوّدين، تنظيفها، التحوّط، وقاطع الدائرة
+import time
+
+import pytest
+import requests
+
+from utils.search import (CircuitOpenError, SearchCache, SearchError, SearchProvider, UnifiedSearch,
+                          normalize_query)
+
+
+class _Provider(SearchProvider):
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+
+    def search(self, query, n, region, timeout):
+        self.calls += 1
+        return [{"title": query, "url": f"https://{self.name}.test/{self.calls}", "snippet": ""}]
+
+
+def test_cached_second_provider_skips_network(tmp_path):
+    cache = SearchCache(str(tmp_path / "search.db"))
+    google, ddg = _Provider("google"), _Provider("ddg")
+    cache.put(("ddg", normalize_query("سؤال"), "wt-wt", 5), [{"title": "t", "url": "u", "snippet": ""}])
+    search = UnifiedSearch([google, ddg], cache=cache)
+
+    assert search.search("سؤال")[0]["url"] == "u"
+    assert search.search_hedged("سؤال")[1] == "ddg"
+    assert google.calls == 0
+
+
+def test_stale_entries_purged_on_put(tmp_path):
+    cache = SearchCache(str(tmp_path / "search.db"))
+    old = ("ddg", "قديم", "wt-wt", 5)
+    cache.put(old, [{"title": "t", "url": "u", "snippet": ""}])
+    with cache._conn:
+        cache._conn.execute("UPDATE search_cache SET fetched_at = 0")
+    search = UnifiedSearch([_Provider("ddg")], cache=cache, purge_every=2)
+
+    search.search("a")
+    assert cache.get(old) is not None
+    search.search("b")
+    assert cache.get(old) is None
+
+
+class _SlowProvider(_Provider):
+    def __init__(self, name, delay):
+        super().__init__(name)
+        self.delay = delay
+
+    def search(self, query, n, region, timeout):
+        time.sleep(self.delay)
+        return super().search(query, n, region, timeout)
+
+
+class _FailingProvider(_Provider):
+    def search(self, query, n, region, timeout):
+        self.calls += 1
+        raise RuntimeError("rate limited")
+
+
+def _wait_idle(search):
+    search._executor.shutdown(wait=True)
+
+
+def test_saving_recorded_only_when_hedge_beats_primary():
+    fast_primary = UnifiedSearch([_SlowProvider("google", 0.0), _SlowProvider("ddg", 0.0)], hedge_default_delay=0.05)
+    assert fast_primary.search_hedged("a")[1] == "google"
+    _wait_idle(fast_primary)
+    assert fast_primary.get_stats()["hedging"]["latency_saved_count"] == 0
+
+    # الاحتياطي أُطلق لكن الأساسي فاز، أو فشل الأساسي قبل الاحتياطي: لا وقت موفّراً
+    for providers in ([_SlowProvider("google", 0.2), _SlowProvider("ddg", 0.6)],
+                      [_FailingProvider("google"), _SlowProvider("ddg", 0.0)]):
+        search = UnifiedSearch(providers, hedge_default_delay=0.05)
+        search.search_hedged("a")
+        _wait_idle(search)
+        assert search.get_stats()["hedging"]["latency_saved_count"] == 0
+
+    slow_primary = UnifiedSearch([_SlowProvider("google", 0.5), _SlowProvider("ddg", 0.0)], hedge_default_delay=0.05)
+    assert slow_primary.search_hedged("a")[1] == "ddg"
+    _wait_idle(slow_primary)
+    hedging = slow_primary.get_stats()["hedging"]
+    assert hedging["latency_saved_count"] == 1
+    assert 0.3 < hedging["latency_saved_total"] < 0.5
+
+
+class _TimeoutProvider(_Provider):
+    def search(self, query, n, region, timeout):
+        self.calls += 1
+        raise requests.Timeout("read timed out")
+
+
+def test_tight_budget_timeouts_do_not_trip_breaker():
+    search = UnifiedSearch([_TimeoutProvider("ddg")], failure_threshold=1)
+    with pytest.raises(SearchError):
+        search.search("a", timeout=1)
+    assert search.get_stats()["ddg"]["breaker"]["state"] == "closed"
+
+    with pytest.raises(SearchError):
+        search.search("a", timeout=10)
+    assert search.get_stats()["ddg"]["breaker"]["state"] == "open"
+
+
+def test_open_breaker_counts_one_rejection_per_request():
+    provider = _FailingProvider("ddg")
+    search = UnifiedSearch([provider], failure_threshold=1, base_backoff=60)
+    with pytest.raises(SearchError):
+        search.search("a")
+
+    with pytest.raises(CircuitOpenError):
+        search.search_hedged("b", regions=("wt-wt", "us-en"))
+    assert search.get_stats()["ddg"]["breaker"]["rejected"] == 1
+    assert provider.calls == 1
@@ -0,0 +1,76 @@
+# tests/test_tracing.py — المدرج التكراري للأزمنة: دقة النسب المئوية، والمراحل المتداخلة في الطلب المتتبع
+import math
+import random
+
+import pytest
+
+from core import tracing
+from core.tracing import LatencyHistogram, get_global_tracer, span, traced
+
+
+def _exact_percentile(values, p):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100.0 * len(ordered)) - 1)]
+
+
+@pytest.mark.parametrize("values", [
+    [float(ms) for ms in range(1, 1001)],
+    [random.Random(5).lognormvariate(3, 1.5) for _ in range(5000)],
+])
+def test_percentiles_within_bucket_error(values):
+    histogram = LatencyHistogram()
+    for ms in values:
+        histogram.record(ms)
+
+    summary = histogram.summary()
+    assert summary["count"] == len(values)
+    assert summary["mean_ms"] == pytest.approx(sum(values) / len(values))
+    assert summary["max_ms"] == max(values)
+    for p in (50, 95, 99):
+        exact = _exact_percentile(values, p)
+        # الحد الأعلى للسلة: لا يقل عن القيمة الحقيقية ولا يزيد عليها بأكثر من عرض السلة (20%)
+        assert exact <= summary[f"p{p}_ms"] <= exact * 1.2
+
+
+def test_percentiles_capped_by_max_and_overflow():
+    histogram = LatencyHistogram()
+    assert histogram.summary()["p99_ms"] == 0.0
+    histogram.record(0.01)
+    assert histogram.percentile(50) == 0.01
+
+    for ms in (10.0, 500000.0):
+        histogram.record(ms)
+    assert histogram.percentile(99) == 500000.0
+    assert histogram.counts[-1] == 1
+
+
+def test_nested_spans_record_parents(monkeypatch):
+    tracer = tracing.Tracer(sample_rate=1.0)
+    monkeypatch.setattr(tracing, "_global_tracer", tracer)
+
+    @traced("fetch")
+    def fetch():
+        with span("parse"):
+            pass
+
+    with get_global_tracer().trace_request("chat") as trace:
+        with span("search"):
+            fetch()
+    with span("outside"):
+        pass
+
+    parents = {s["stage"]: s["parent"] for s in trace.spans}
+    assert parents == {"parse": "fetch", "fetch": "search", "search": "chat", "chat": None}
+    report = tracer.get_report()
+    assert set(report["stages"]) == {"chat", "search", "fetch", "parse"}
+    assert report["recent_traces"][-1]["request_id"] == trace.request_id
+
+
+def test_unsampled_requests_are_not_traced(monkeypatch):
+    tracer = tracing.Tracer(sample_rate=0.0)
+    monkeypatch.setattr(tracing, "_global_tracer", tracer)
+    with tracer.trace_request("chat") as trace:
+        with span("search"):
+            pass
+    assert trace is None
+    assert tracer.get_report()["stages"] == {}
@@ -0,0 +1,29 @@
+# tests/test_web_agent.py — تعميق السنيبّتات: إلغاء الجلب الذي لم يبدأ بعد انتهاء المهلة
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from engine import web_agent
+
+
+def test_queued_fetches_cancelled_after_deadline(monkeypatch):
+    release = threading.Event()
+    started = []
+
+    def slow_fetch(url, timeout=15):
+        started.append(url)
+        release.wait(5)
+        return ""
+
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(web_agent, "_ENRICH_POOL", pool)
+    monkeypatch.setattr(web_agent, "_fetch_text", slow_fetch)
+    monkeypatch.setattr(web_agent, "_cached_text", lambda url: None)
+    results = [{"title": f"t{i}", "link": f"https://example.test/{i}", "snippet": "قصير"} for i in range(3)]
+
+    lines = list(web_agent.iter_web_snippets(results, deadline=time.monotonic() + 0.1))
+    assert [source["title"] for _, source in lines] == ["t0", "t1", "t2"]
+
+    release.set()
+    pool.shutdown(wait=True)
+    assert started == ["https://example.test/0"]
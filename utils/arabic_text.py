@@ -0,0 +1,161 @@
+# utils/arabic_text.py - تطبيع وتقطيع النص العربي (مُجمّع مسبقاً مع تخزين مؤقت)
+import re
+from functools import lru_cache
+from typing import Any, List
+
+# حذف التشكيل (الفتحتان .. السكون، الألف الخنجرية) والتطويل بتعبير واحد مُجمّع
+_STRIP_RE = re.compile("[\u064B-\u0652\u0670\u0640]+")
+
+# توحيد الألف والتاء المربوطة والألف المقصورة والهمزات على حروف
+# (str.replace المتتالي أسرع بخمس مرات تقريباً من str.translate للحروف غير ASCII في CPython)
+_FOLD_PAIRS = (
+    ("أ", "ا"), ("إ", "ا"), ("آ", "ا"), ("ٱ", "ا"),
+    ("ة", "ه"), ("ى", "ي"), ("ؤ", "و"), ("ئ", "ي"),
+)
+
+_PUNCT_RE = re.compile(r"[^\w\s]")
+_TOKEN_RE = re.compile(r"\w+")
+
+_RAW_STOPWORDS = """
+و في على من مع عن الى إلى أو أم ثم بل قد لقد كان كانت كانوا كن كنت كنتن يكون تكون تكونون تكونن
+هذا هذه ذلك تلك هناك هنا حيث كذلك كما كيف لماذا لما إن أن إنما أنما ألا إلا ما لا لم لن هل
+جدا جداً فقط أيضا أيضًا أي أيًّا أيها التي الذي الذين اللذان اللتان اللواتي اللائي أولئك هؤلاء
+حين عندما بينما أثناء بسبب لدى ضمن دون غير بين قبل بعد منذ حتى خلال فوق تحت أمام وراء
+لذلك لهذا لذا لأن كي لكي إذ إذا إلا إنّ أنّ ألا لكن اللي الي عند عنا عنه عليها عليه
+بعض كل اي اى بعد قبل حين دون غير سوى الا إلا بلا فلان انا انت انتم انتن نحن
+""".split()
+
+# كلمات التوقف بصيغتها الأصلية والموحّدة (التطبيع يسبق التصفية)
+def _fold(text: str) -> str:
+    text = _STRIP_RE.sub("", text.lower())
+    for old, new in _FOLD_PAIRS:
+        if old in text:
+            text = text.replace(old, new)
+    return text
+
+
+STOPWORDS = frozenset(_RAW_STOPWORDS) | frozenset(_fold(w) for w in _RAW_STOPWORDS)
+
+_PREFIXES = ("وال", "بال", "كال", "فال", "لل", "ال")
+_SUFFIXES = ("ها", "ان", "ات", "ون", "ين", "يه", "ه", "ي")
+
+# النصوص الأقصر من هذا الحد تُحفظ نتائجها في ذاكرة LRU
+_CACHE_MAX_LEN = 256
+
+
+def fold(text: str) -> str:
+    """تحويل إلى أحرف صغيرة وتوحيد الحروف العربية في تمريرة واحدة"""
+    if not text:
+        return ""
+    if len(text) <= _CACHE_MAX_LEN:
+        return _fold_cached(text)
+    return _fold(text)
+
+
+_fold_cached = lru_cache(maxsize=8192)(_fold)
+
+
+def clean(text: str) -> str:
+    """توحيد الحروف وإزالة علامات الترقيم والمسافات الزائدة"""
+    return " ".join(_PUNCT_RE.sub(" ", fold(text)).split())
+
+
+@lru_cache(maxsize=65536)
+def light_stem(token: str) -> str:
+    """تجذيع خفيف: حذف أداة التعريف والبادئات واللواحق الشائعة مع إبقاء 3 أحرف على الأقل"""
+    for prefix in _PREFIXES:
+        if token.startswith(prefix) and len(token) - len(prefix) >= 3:
+            token = token[len(prefix):]
+            break
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            token = token[:-len(suffix)]
+            break
+    return token
+
+
+def tokenize(text: str, remove_stopwords: bool = True, stem: bool = False,
+             min_len: int = 2) -> List[str]:
+    """تقطيع النص إلى كلمات موحّدة (تُحذف الأرقام المنفردة والكلمات القصيرة)"""
+    if not text:
+        return []
+    if len(text) <= _CACHE_MAX_LEN:
+        return list(_tokenize_cached(text, remove_stopwords, stem, min_len))
+    return _tokenize(text, remove_stopwords, stem, min_len)
+
+
+@lru_cache(maxsize=8192)
+def _tokenize_cached(text: str, remove_stopwords: bool, stem: bool, min_len: int) -> tuple:
+    return tuple(_tokenize(text, remove_stopwords, stem, min_len))
+
+
+def _tokenize(text: str, remove_stopwords: bool, stem: bool, min_len: int) -> List[str]:
+    tokens = _TOKEN_RE.findall(_fold(text))
+    if remove_stopwords:
+        tokens = [t for t in tokens if len(t) >= min_len and not t.isdigit() and t not in STOPWORDS]
+    else:
+        tokens = [t for t in tokens if len(t) >= min_len and not t.isdigit()]
+    if stem:
+        tokens = [light_stem(t) for t in tokens]
+    return tokens
+
+
+def normalize(text: str, stem: bool = False) -> str:
+    """النص بعد التطبيع والتقطيع وحذف كلمات التوقف (مفصولاً بمسافات)"""
+    return " ".join(tokenize(text, stem=stem))
+
+
+def tokenize_for_index(text: str) -> List[str]:
+    """مقطّع مخصص لـ TfidfVectorizer (مع التجذيع الخفيف)"""
+    return tokenize(text, stem=True)
+
+
+def fold_patterns(patterns: Any) -> Any:
+    """توحيد حروف أنماط البحث (قوائم/قواميس متداخلة) لتطابق النص الموحّد"""
+    if isinstance(patterns, str):
+        return fold(patterns)
+    if isinstance(patterns, list):
+        return [fold_patterns(p) for p in patterns]
+    if isinstance(patterns, dict):
+        return {key: fold_patterns(value) for key, value in patterns.items()}
+    return patterns
+
+
+def cache_info() -> dict:
+    """إحصائيات ذاكرة التخزين المؤقت"""
+    return {"fold": _fold_cached.cache_info()._asdict(), "tokenize": _tokenize_cached.cache_info()._asdict()}
+
+
+if __name__ == "__main__":
+    # قياس الإنتاجية: python -m utils.arabic_text
+    import time
+
+    sample = ("السَّلامُ عليكم، هذه مكتبة لتحليل النصوص العربية في الذكاء الاصطناعي والبرمجة بلغة بايثون. "
+              "إنّ المعالجة السريعة للّغة أساسية لمحركات البحث والمساعدات الذكية 2024! ")
+    doc = sample * 2000
+    size_mb = len(doc.encode("utf-8")) / 1e6
+
+    def _legacy(s: str) -> str:
+        s = s.strip().lower()
+        for k, v in {"أ": "ا", "إ": "ا", "آ": "ا", "ة": "ه", "ى": "ي", "ـ": "",
+                     "َ": "", "ُ": "", "ِ": "", "ّ": "", "ْ": "", "ً": "", "ٌ": "", "ٍ": ""}.items():
+            s = s.replace(k, v)
+        s = re.sub(r'[^\w\s]', ' ', s)
+        s = re.sub(r'\b\d+\b', ' ', s)
+        return " ".join(w for w in s.split() if w not in STOPWORDS and len(w) > 1)
+
+    for name, fn in (("legacy replace chain", _legacy), ("normalize", normalize),
+                     ("normalize+stem", lambda s: normalize(s, stem=True))):
+        start = time.perf_counter()
+        for _ in range(5):
+            fn(doc)
+        elapsed = (time.perf_counter() - start) / 5
+        print(f"{name:22s} {size_mb / elapsed:8.2f} MB/s")
+
+    queries = [sample[:60 + i % 40] for i in range(200)]
+    start = time.perf_counter()
+    for _ in range(50):
+        for q in queries:
+            normalize(q)
+    elapsed = time.perf_counter() - start
+    print(f"{'short (cached)':22s} {len(queries) * 50 / elapsed:8.0f} q/s")
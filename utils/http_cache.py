@@ -0,0 +1,389 @@
+# utils/http_cache.py - طبقة جلب مشتركة مع ذاكرة مؤقتة على القرص (محتوى معنون بالبصمة + طلبات شرطية)
+import email.utils
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+
+import requests
+
+# إعداد التسجيل
+logger = logging.getLogger(__name__)
+
+DEFAULT_UA = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+              "(KHTML, like Gecko) Chrome/124 Safari/537.36")
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+@dataclass
+class CachedResponse:
+    """استجابة HTTP (من الشبكة أو من الذاكرة المؤقتة)"""
+    url: str
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+    body_hash: str = ""
+    from_cache: bool = False
+    revalidated: bool = False
+    encoding: Optional[str] = field(default=None, repr=False)
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+    @property
+    def content_type(self) -> str:
+        return self.headers.get("content-type", "")
+
+    @property
+    def text(self) -> str:
+        return self.body.decode(self.encoding or "utf-8", errors="replace")
+
+
+def _encoding_of(headers: Dict[str, str]) -> Optional[str]:
+    match = re.search(r"charset=([\w-]+)", headers.get("content-type", ""), re.I)
+    return match.group(1) if match else None
+
+
+class HttpCache:
+    """ذاكرة HTTP مؤقتة على القرص: الأجسام ملفات مسماة ببصمة المحتوى، والفهرس في SQLite.
+    المدخل الحديث يُخدم دون شبكة، والقديم يُعاد التحقق منه بطلب شرطي (ETag/Last-Modified)،
+    والنص المستخرج يُحفظ لكل مستخرِج فلا يُعاد التحليل، والحجم محدود بإزالة الأقدم استخداماً"""
+
+    def __init__(self, cache_dir: str = "cache/http", max_bytes: int = 200 * 1024 * 1024,
+                 default_ttl: float = 3600.0, session: Optional[requests.Session] = None):
+        self.cache_dir = cache_dir
+        self.blob_dir = os.path.join(cache_dir, "blobs")
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.session = session or requests.Session()
+        self.session.headers.setdefault("User-Agent", DEFAULT_UA)
+
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(os.path.join(cache_dir, "index.db"), check_same_thread=False)
+        self._setup_database()
+        self._size = self._scan_size()  # عداد جارٍ للحجم بدل تجميع كامل عند كل حفظ
+        self.stats = {"fresh_hits": 0, "revalidated": 0, "misses": 0, "stale_served": 0,
+                      "text_hits": 0, "evictions": 0, "errors": 0}
+
+    def _setup_database(self):
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS http_entries (
+                    url TEXT PRIMARY KEY,
+                    final_url TEXT,
+                    status INTEGER NOT NULL,
+                    headers_json TEXT NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    body_hash TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            ''')
+            try:
+                # جداول أنشأتها نسخة سابقة بلا عمود الرابط النهائي
+                self._conn.execute("ALTER TABLE http_entries ADD COLUMN final_url TEXT")
+            except sqlite3.OperationalError:
+                pass
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_http_last_access ON http_entries(last_access)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_http_body_hash ON http_entries(body_hash)")
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS http_texts (
+                    body_hash TEXT NOT NULL,
+                    extractor TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    PRIMARY KEY (body_hash, extractor)
+                )
+            ''')
+
+    # ---------- الأجسام ----------
+
+    def _blob_path(self, body_hash: str) -> str:
+        return os.path.join(self.blob_dir, body_hash[:2], body_hash)
+
+    def _write_blob(self, body: bytes) -> str:
+        body_hash = hashlib.sha256(body).hexdigest()
+        path = self._blob_path(body_hash)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+        return body_hash
+
+    def _read_blob(self, body_hash: str) -> Optional[bytes]:
+        try:
+            with open(self._blob_path(body_hash), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    # ---------- الحداثة ----------
+
+    def _expires_at(self, headers: Dict[str, str], now: float, ttl: Optional[float]) -> float:
+        """وقت انتهاء الحداثة من Cache-Control/Expires (أو ttl الافتراضي)"""
+        cache_control = headers.get("cache-control", "").lower()
+        if "no-cache" in cache_control or "no-store" in cache_control:
+            return now
+        match = _MAX_AGE_RE.search(cache_control)
+        if match:
+            return now + int(match.group(1))
+        if "expires" in headers:
+            try:
+                return email.utils.parsedate_to_datetime(headers["expires"]).timestamp()
+            except (TypeError, ValueError):
+                return now
+        return now + (self.default_ttl if ttl is None else ttl)
+
+    def _load_entry(self, url: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, headers_json, etag, last_modified, body_hash, expires_at, final_url "
+                "FROM http_entries WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"status": row[0], "headers": json.loads(row[1]), "etag": row[2],
+                "last_modified": row[3], "body_hash": row[4], "expires_at": row[5], "final_url": row[6] or url}
+
+    def _response_from_entry(self, url: str, entry: dict, revalidated: bool = False) -> Optional[CachedResponse]:
+        body = self._read_blob(entry["body_hash"])
+        if body is None:
+            return None
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE http_entries SET last_access = ? WHERE url = ?", (time.time(), url))
+        return CachedResponse(entry["final_url"], entry["status"], entry["headers"], body, entry["body_hash"],
+                              from_cache=True, revalidated=revalidated, encoding=_encoding_of(entry["headers"]))
+
+    # ---------- الجلب ----------
+
+    def get(self, url: str, timeout: float = 12, ttl: Optional[float] = None,
+            headers: Optional[Dict[str, str]] = None) -> CachedResponse:
+        """جلب GET مع الذاكرة المؤقتة (قد يرفع استثناء الشبكة إذا لم يوجد مدخل قديم)"""
+        entry = self._load_entry(url)
+        now = time.time()
+        if entry and entry["expires_at"] > now:
+            cached = self._response_from_entry(url, entry)
+            if cached is not None:
+                self.stats["fresh_hits"] += 1
+                return cached
+            entry = None  # الجسم مفقود من القرص
+
+        request_headers = dict(headers or {})
+        if entry:
+            if entry["etag"]:
+                request_headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                request_headers["If-Modified-Since"] = entry["last_modified"]
+
+        try:
+            r = self.session.get(url, headers=request_headers, timeout=timeout)
+        except requests.RequestException:
+            self.stats["errors"] += 1
+            # عند تعذر الشبكة يُخدم المدخل القديم إن وجد
+            if entry:
+                cached = self._response_from_entry(url, entry)
+                if cached is not None:
+                    self.stats["stale_served"] += 1
+                    return cached
+            raise
+
+        response_headers = {k.lower(): v for k, v in r.headers.items()}
+        if r.status_code == 304 and entry:
+            merged = {**entry["headers"], **response_headers}
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "UPDATE http_entries SET headers_json = ?, fetched_at = ?, expires_at = ? WHERE url = ?",
+                    (json.dumps(merged), now, self._expires_at(merged, now, ttl), url)
+                )
+            cached = self._response_from_entry(url, {**entry, "headers": merged}, revalidated=True)
+            if cached is not None:
+                self.stats["revalidated"] += 1
+                return cached
+            r = self.session.get(url, headers=headers, timeout=timeout)
+            response_headers = {k.lower(): v for k, v in r.headers.items()}
+
+        self.stats["misses"] += 1
+        body = r.content
+        response = CachedResponse(r.url or url, r.status_code, response_headers, body,
+                                  encoding=r.encoding or _encoding_of(response_headers))
+        if r.status_code == 200 and "no-store" not in response_headers.get("cache-control", "").lower():
+            self._store(url, response, now, ttl)
+        return response
+
+    def _store(self, url: str, response: CachedResponse, now: float, ttl: Optional[float]):
+        try:
+            response.body_hash = self._write_blob(response.body)
+            with self._lock:
+                with self._conn:
+                    old = self._conn.execute("SELECT body_hash, size FROM http_entries WHERE url = ?",
+                                             (url,)).fetchone()
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO http_entries (url, final_url, status, headers_json, etag, "
+                        "last_modified, body_hash, size, fetched_at, expires_at, last_access) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (url, response.url, response.status, json.dumps(response.headers),
+                         response.headers.get("etag"), response.headers.get("last-modified"),
+                         response.body_hash, len(response.body),
+                         now, self._expires_at(response.headers, now, ttl), now)
+                    )
+                    self._size += len(response.body) - (old[1] if old else 0)
+                    if old and old[0] != response.body_hash:
+                        self._drop_unreferenced([old[0]])
+                self._evict_if_needed()
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error(f"❌ خطأ في حفظ الاستجابة في الذاكرة المؤقتة: {e}")
+
+    @staticmethod
+    def _text_key(extractor_name: str, final_url: str, url_dependent: bool) -> str:
+        """مفتاح المستخرِج: المستخرِج الذي يحل الروابط النسبية يعتمد على الرابط النهائي لا الجسم وحده"""
+        return f"{extractor_name}@{final_url}" if url_dependent else extractor_name
+
+    def fetch_text(self, url: str, extractor: Callable[[CachedResponse], str], extractor_name: str,
+                   timeout: float = 12, ttl: Optional[float] = None,
+                   headers: Optional[Dict[str, str]] = None, url_dependent: bool = False) -> str:
+        """نص الصفحة المستخرج (يُحفظ لكل بصمة جسم ومستخرِج فلا يُعاد التحليل ما لم يتغير المحتوى)"""
+        response = self.get(url, timeout=timeout, ttl=ttl, headers=headers)
+        key = self._text_key(extractor_name, response.url, url_dependent)
+        if response.body_hash:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT text FROM http_texts WHERE body_hash = ? AND extractor = ?",
+                    (response.body_hash, key)
+                ).fetchone()
+            if row is not None:
+                self.stats["text_hits"] += 1
+                return row[0]
+
+        text = extractor(response)
+        if response.body_hash:
+            with self._lock, self._conn:
+                old = self._conn.execute(
+                    "SELECT LENGTH(text) FROM http_texts WHERE body_hash = ? AND extractor = ?",
+                    (response.body_hash, key)
+                ).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO http_texts (body_hash, extractor, text) VALUES (?, ?, ?)",
+                    (response.body_hash, key, text)
+                )
+                self._size += len(text) - (old[0] if old else 0)
+        return text
+
+    def peek_text(self, url: str, extractor_name: str, url_dependent: bool = False) -> Optional[str]:
+        """النص المستخرج من مدخل حديث دون أي طلب شبكة (None إذا لم يوجد أو انتهت صلاحيته)"""
+        entry = self._load_entry(url)
+        if entry is None or entry["expires_at"] <= time.time():
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text FROM http_texts WHERE body_hash = ? AND extractor = ?",
+                (entry["body_hash"], self._text_key(extractor_name, entry["final_url"], url_dependent))
+            ).fetchone()
+        if row is None:
+            return None
+        self.stats["text_hits"] += 1
+        return row[0]
+
+    # ---------- الإزالة ----------
+
+    def _scan_size(self) -> int:
+        """الحجم الكلي بمسح كامل (مرة واحدة عند الفتح؛ بعدها يُحدَّث العداد مع كل تغيير)"""
+        with self._lock:
+            bodies = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM http_entries").fetchone()[0]
+            texts = self._conn.execute("SELECT COALESCE(SUM(LENGTH(text)), 0) FROM http_texts").fetchone()[0]
+        return bodies + texts
+
+    def total_size(self) -> int:
+        return self._size
+
+    def _drop_unreferenced(self, body_hashes):
+        """حذف النصوص وملفات الأجسام للبصمات التي لم يعد أي مدخل يشير إليها (داخل القفل والمعاملة)"""
+        for body_hash in set(body_hashes):
+            if self._conn.execute("SELECT 1 FROM http_entries WHERE body_hash = ? LIMIT 1",
+                                  (body_hash,)).fetchone():
+                continue
+            texts = self._conn.execute("SELECT COALESCE(SUM(LENGTH(text)), 0) FROM http_texts WHERE body_hash = ?",
+                                       (body_hash,)).fetchone()[0]
+            self._conn.execute("DELETE FROM http_texts WHERE body_hash = ?", (body_hash,))
+            self._size -= texts
+            try:
+                os.remove(self._blob_path(body_hash))
+            except OSError:
+                pass
+
+    def _evict_if_needed(self):
+        """إزالة الأقدم استخداماً حتى يعود الحجم إلى 90% من الحد"""
+        if self._size <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        with self._lock, self._conn:
+            evicted = []
+            for url, entry_size, body_hash in self._conn.execute(
+                    "SELECT url, size, body_hash FROM http_entries ORDER BY last_access"):
+                if self._size <= target:
+                    break
+                evicted.append((url, body_hash))
+                self._size -= entry_size
+            self._conn.executemany("DELETE FROM http_entries WHERE url = ?", [(u,) for u, _ in evicted])
+            self._drop_unreferenced(h for _, h in evicted)
+        self.stats["evictions"] += len(evicted)
+
+    def clear(self):
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM http_entries")
+                self._conn.execute("DELETE FROM http_texts")
+            self._size = 0
+            # حذف كل ملفات الأجسام (عدا الملفات المؤقتة لكتابات جارية)
+            for prefix in os.listdir(self.blob_dir):
+                directory = os.path.join(self.blob_dir, prefix)
+                for name in os.listdir(directory):
+                    if not name.endswith(".tmp"):
+                        try:
+                            os.remove(os.path.join(directory, name))
+                        except OSError:
+                            pass
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM http_entries").fetchone()[0]
+        return {**self.stats, "entries": entries, "size_bytes": self.total_size(), "max_bytes": self.max_bytes}
+
+
+# الذاكرة العالمية
+_global_http_cache: Optional[HttpCache] = None
+_global_lock = threading.Lock()
+
+def get_global_http_cache() -> HttpCache:
+    """الذاكرة المؤقتة المشتركة (HTTP_CACHE_DIR و HTTP_CACHE_MAX_MB)"""
+    global _global_http_cache
+    with _global_lock:
+        if _global_http_cache is None:
+            _global_http_cache = HttpCache(
+                cache_dir=os.environ.get("HTTP_CACHE_DIR", os.path.join("cache", "http")),
+                max_bytes=int(float(os.environ.get("HTTP_CACHE_MAX_MB", "200")) * 1024 * 1024)
+            )
+    return _global_http_cache
+
+def cached_fetch_text(url: str, extractor: Callable[[CachedResponse], str], extractor_name: str,
+                      timeout: float = 12, headers: Optional[Dict[str, str]] = None) -> str:
+    """جلب نص صفحة عبر الذاكرة المشتركة (يرجع "" عند أي خطأ)"""
+    try:
+        return get_global_http_cache().fetch_text(url, extractor, extractor_name, timeout=timeout, headers=headers)
+    except Exception:
+        return ""
@@ -0,0 +1,533 @@
+# utils/search.py - واجهة موحّدة لمزوّدي البحث مع ذاكرة مؤقتة دائمة (TTL + خدمة القديم مع التحديث في الخلفية)
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+import requests
+
+from utils.arabic_text import fold
+
+try:
+    from duckduckgo_search import DDGS
+except Exception:
+    DDGS = None  # اختياري
+
+# إعداد التسجيل
+logger = logging.getLogger(__name__)
+
+
+class SearchError(Exception):
+    """فشل جميع المزوّدين دون نتيجة مخزّنة"""
+
+
+class CircuitOpenError(SearchError):
+    """المزوّد معطّل مؤقتاً (القاطع مفتوح): فشل فوري بلا طلب شبكة"""
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """قاطع دائرة لمزوّد واحد: بعد failure_threshold أخطاء متتالية يُفتح لمدة تراجع أسي مع عشوائية،
+    ثم يسمح بطلب تجريبي واحد (half_open): نجاحه يغلقه وفشله يعيد فتحه بمدة مضاعفة. لا انتظار ولا نوم"""
+
+    def __init__(self, failure_threshold: int = 3, base_backoff: float = 2.0, max_backoff: float = 300.0,
+                 jitter: float = 0.5, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self._failures = 0
+        self._trips = 0  # مرات الفتح المتتالية (أس التراجع)
+        self._retry_at = 0.0
+        self._probe_in_flight = False
+        self.stats = {"opened": 0, "rejected": 0, "probes": 0}
+
+    def _backoff(self) -> float:
+        delay = min(self.max_backoff, self.base_backoff * (2 ** (self._trips - 1)))
+        # العشوائية تمنع عودة كل العمال إلى المزوّد في اللحظة نفسها
+        return delay * random.uniform(1.0 - self.jitter, 1.0)
+
+    def _open(self):
+        self._trips += 1
+        self.state = OPEN
+        self._retry_at = self._clock() + self._backoff()
+        self._probe_in_flight = False
+        self.stats["opened"] += 1
+
+    def rejecting(self, count: bool = False) -> bool:
+        """هل سيُرفض الطلب الآن؟ (دون حجز الطلب التجريبي؛ count يحتسبه ضمن المرفوضة)"""
+        with self._lock:
+            if self.state == OPEN:
+                rejected = self._clock() < self._retry_at
+            else:
+                rejected = self.state == HALF_OPEN and self._probe_in_flight
+            if rejected and count:
+                self.stats["rejected"] += 1
+            return rejected
+
+    def allow(self, count: bool = True) -> bool:
+        """حجز إذن بطلب؛ في half_open يُسمح بطلب تجريبي واحد فقط (count=False إذا احتُسب الرفض مسبقاً)"""
+        with self._lock:
+            if self.state == OPEN and self._clock() >= self._retry_at:
+                self.state = HALF_OPEN
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                self.stats["probes"] += 1
+                return True
+            if count:
+                self.stats["rejected"] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self._failures = 0
+            self._trips = 0
+            self._probe_in_flight = False
+
+    def release(self):
+        """إلغاء حجز الطلب التجريبي دون احتساب نجاح أو فشل"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._open()
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            state = self.state
+            retry_in = max(0.0, self._retry_at - self._clock()) if state == OPEN else 0.0
+            if state == OPEN and retry_in == 0.0:
+                state = HALF_OPEN  # الطلب التالي سيكون تجريبياً
+            return {"state": state, "consecutive_failures": self._failures, "retry_in": retry_in, **self.stats}
+
+
+class SearchProvider:
+    """مزوّد بحث: يرجع نتائج موحّدة {title, url, snippet} أو يرفع استثناء عند الفشل"""
+
+    name = "base"
+
+    @property
+    def available(self) -> bool:
+        return True
+
+    def search(self, query: str, n: int, region: str, timeout: float) -> List[Dict[str, str]]:
+        raise NotImplementedError
+
+
+class DuckDuckGoProvider(SearchProvider):
+    name = "ddg"
+
+    @property
+    def available(self) -> bool:
+        return DDGS is not None
+
+    def search(self, query: str, n: int, region: str, timeout: float) -> List[Dict[str, str]]:
+        with DDGS(timeout=max(1, int(timeout))) as ddg:
+            results = ddg.text(query, max_results=n, region=region)
+        out = []
+        for r in results or []:
+            url = r.get("href") or r.get("url")
+            if url:
+                out.append({"title": r.get("title") or url, "url": url,
+                            "snippet": r.get("body") or r.get("snippet") or ""})
+        return out
+
+
+class GoogleCSEProvider(SearchProvider):
+    name = "google"
+
+    def __init__(self, api_key: str = "", cx: str = ""):
+        self.api_key = (api_key or os.getenv("GOOGLE_API_KEY", "")).strip()
+        self.cx = (cx or os.getenv("GOOGLE_CSE_ID", "")).strip()
+
+    @property
+    def available(self) -> bool:
+        return bool(self.api_key and self.cx)
+
+    def search(self, query: str, n: int, region: str, timeout: float) -> List[Dict[str, str]]:
+        r = requests.get("https://www.googleapis.com/customsearch/v1", timeout=timeout, params={
+            "key": self.api_key, "cx": self.cx, "q": query,
+            "num": max(1, min(n, 10)), "safe": "off", "hl": "ar"
+        })
+        r.raise_for_status()
+        return [{"title": it.get("title", ""), "url": it.get("link", ""), "snippet": it.get("snippet", "")}
+                for it in r.json().get("items", []) or []]
+
+
+def _is_timeout(error: Exception) -> bool:
+    """انتهاء مهلة الطلب (requests و duckduckgo_search يرفعان أصنافاً مختلفة)"""
+    return isinstance(error, (requests.Timeout, TimeoutError)) or "timeout" in type(error).__name__.lower()
+
+
+def normalize_query(query: str) -> str:
+    """توحيد الاستعلام لمفتاح الذاكرة المؤقتة (أحرف صغيرة، بلا تشكيل، مسافات موحّدة)"""
+    return " ".join(fold(query or "").split())
+
+
+class SearchCache:
+    """ذاكرة نتائج البحث في SQLite (تبقى بعد إعادة التشغيل)"""
+
+    def __init__(self, db_path: str = "search_cache.db"):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS search_cache (
+                    provider TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    region TEXT NOT NULL,
+                    n INTEGER NOT NULL,
+                    results_json TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    PRIMARY KEY (provider, query, region, n)
+                )
+            ''')
+
+    def get(self, key: Tuple[str, str, str, int]) -> Optional[Tuple[List[Dict[str, str]], float]]:
+        """(النتائج، عمرها بالثواني) أو None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT results_json, fetched_at FROM search_cache "
+                "WHERE provider = ? AND query = ? AND region = ? AND n = ?", key
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), time.time() - row[1]
+
+    def put(self, key: Tuple[str, str, str, int], results: List[Dict[str, str]]):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search_cache (provider, query, region, n, results_json, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)", (*key, json.dumps(results, ensure_ascii=False), time.time())
+            )
+
+    def purge(self, max_age: float) -> int:
+        """حذف المدخلات الأقدم من max_age"""
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "DELETE FROM search_cache WHERE fetched_at < ?", (time.time() - max_age,)
+            ).rowcount
+
+
+class UnifiedSearch:
+    """بحث عبر المزوّدين بالترتيب مع ذاكرة مؤقتة:
+    حديث (< ttl) يُخدم مباشرة، قديم (< stale_ttl) يُخدم فوراً ويُحدَّث في الخلفية، وإلا يُجلب من المزوّد"""
+
+    def __init__(self, providers: Sequence[SearchProvider], cache: Optional[SearchCache] = None,
+                 ttl: float = 6 * 3600, stale_ttl: float = 7 * 24 * 3600,
+                 hedge_percentile: float = 90.0, hedge_min_delay: float = 0.2,
+                 hedge_max_delay: float = 3.0, hedge_default_delay: float = 1.0,
+                 failure_threshold: int = 3, base_backoff: float = 2.0, max_backoff: float = 300.0,
+                 purge_every: int = 200, timeout_failure_floor: float = 5.0):
+        self.providers = {p.name: p for p in providers}
+        self._breakers = {name: CircuitBreaker(failure_threshold, base_backoff, max_backoff)
+                          for name in self.providers}
+        # انتهاء مهلة أقصر من هذا الحد سببه ميزانيتنا الضيقة لا عطل المزوّد: لا يُحتسب فشلاً في القاطع
+        self.timeout_failure_floor = timeout_failure_floor
+        self.cache = cache
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        # حذف المدخلات الأقدم من stale_ttl كل purge_every كتابة (لا فائدة منها بعد انتهاء صلاحيتها)
+        self.purge_every = purge_every
+        self._cache_writes = 0
+        # التحوّط: يُطلق المزوّد الثاني إذا تجاوز الأول هذه النسبة المئوية من أزمنته السابقة
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_max_delay = hedge_max_delay
+        self.hedge_default_delay = hedge_default_delay
+        self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="search")
+        self._lock = threading.Lock()
+        self._revalidating = set()
+        self._latencies: Dict[str, Deque[float]] = {name: deque(maxlen=200) for name in self.providers}
+        self._metrics: Dict[str, Dict[str, float]] = {
+            name: {"hits": 0, "stale_hits": 0, "misses": 0, "errors": 0, "revalidations": 0,
+                   "calls": 0, "total_latency": 0.0, "wins": 0}
+            for name in self.providers
+        }
+        self._hedging = {"requests": 0, "hedged": 0, "latency_saved_total": 0.0, "latency_saved_count": 0}
+
+    def _count(self, provider: str, metric: str, value: float = 1):
+        with self._lock:
+            self._metrics[provider][metric] += value
+
+    def _call(self, provider: SearchProvider, key: Tuple[str, str, str, int], query: str,
+              timeout: float, count_rejection: bool = True) -> List[Dict[str, str]]:
+        """استدعاء المزوّد وتخزين النتائج غير الفارغة (يرفع CircuitOpenError فوراً إذا كان القاطع مفتوحاً)"""
+        breaker = self._breakers[provider.name]
+        if not breaker.allow(count=count_rejection):
+            raise CircuitOpenError(f"{provider.name}: circuit open")
+        start = time.perf_counter()
+        try:
+            results = provider.search(query, key[3], key[2], timeout)
+        except Exception as e:
+            if _is_timeout(e) and timeout < self.timeout_failure_floor:
+                breaker.release()
+            else:
+                breaker.record_failure()
+            self._count(provider.name, "errors")
+            raise
+        else:
+            breaker.record_success()
+        finally:
+            elapsed = time.perf_counter() - start
+            self._count(provider.name, "calls")
+            self._count(provider.name, "total_latency", elapsed)
+        with self._lock:
+            self._latencies[provider.name].append(elapsed)
+        for r in results:
+            r["provider"] = provider.name
+        # النتائج الفارغة غالباً حظر مؤقت: لا تُخزَّن
+        if results and self.cache is not None:
+            self.cache.put(key, results)
+            with self._lock:
+                self._cache_writes += 1
+                purge = self.purge_every > 0 and self._cache_writes % self.purge_every == 0
+            if purge:
+                try:
+                    self.cache.purge(self.stale_ttl)
+                except Exception as e:
+                    logger.error(f"❌ خطأ في تنظيف ذاكرة البحث: {e}")
+        return results
+
+    def _from_cache(self, lookups: Sequence[Tuple[SearchProvider, Tuple[str, str, str, int]]], query: str,
+                    timeout: float) -> Optional[Tuple[List[Dict[str, str]], str]]:
+        """أفضل نتيجة مخزّنة لدى كل المزوّدين قبل أي طلب شبكة: الحديثة أولاً ثم القديمة (مع تحديثها في الخلفية)"""
+        if self.cache is None:
+            return None
+        stale = None
+        for provider, key in lookups:
+            cached = self.cache.get(key)
+            if cached is None:
+                continue
+            results, age = cached
+            if age < self.ttl:
+                self._count(provider.name, "hits")
+                return results, provider.name
+            if stale is None and age < self.stale_ttl:
+                stale = (provider, key, results)
+        if stale is None:
+            return None
+        provider, key, results = stale
+        self._count(provider.name, "stale_hits")
+        self._revalidate(provider, key, query, timeout)
+        return results, provider.name
+
+    def _revalidate(self, provider: SearchProvider, key: Tuple[str, str, str, int], query: str, timeout: float):
+        """تحديث مدخل قديم في خيط خلفي (مرة واحدة لكل مفتاح، ولا تحديث والقاطع مفتوح)"""
+        if self._breakers[provider.name].rejecting():
+            return
+        with self._lock:
+            if key in self._revalidating:
+                return
+            self._revalidating.add(key)
+
+        def run():
+            try:
+                self._call(provider, key, query, timeout)
+                self._count(provider.name, "revalidations")
+            except Exception as e:
+                logger.error(f"❌ خطأ في تحديث نتائج البحث ({provider.name}): {e}")
+            finally:
+                with self._lock:
+                    self._revalidating.discard(key)
+
+        threading.Thread(target=run, name=f"search-revalidate-{provider.name}", daemon=True).start()
+
+    def search(self, query: str, n: int = 5, region: str = "wt-wt", provider: Optional[str] = None,
+               timeout: float = 10.0) -> List[Dict[str, str]]:
+        """نتائج {title, url, snippet, provider}؛ يرفع SearchError إذا فشل كل المزوّدين"""
+        names = [provider] if provider else list(self.providers)
+        lookups = [(p, (p.name, normalize_query(query), region, n))
+                   for p in (self.providers.get(name) for name in names) if p is not None and p.available]
+        # الذاكرة المؤقتة لكل المزوّدين أولاً: لا طلب شبكة للأول إذا كانت نتيجة الثاني مخزّنة
+        cached = self._from_cache(lookups, query, timeout)
+        if cached is not None:
+            return cached[0]
+
+        last_error: Optional[Exception] = None
+        for p, key in lookups:
+            self._count(p.name, "misses")
+            try:
+                results = self._call(p, key, query, timeout)
+            except Exception as e:
+                last_error = e
+                continue
+            if results:
+                return results
+        if last_error is not None:
+            raise SearchError(str(last_error))
+        return []
+
+    # ---------- التحوّط ----------
+
+    def hedge_delay(self, provider: str) -> float:
+        """مهلة إطلاق الطلب الاحتياطي: النسبة المئوية hedge_percentile من أزمنة المزوّد الأخيرة"""
+        with self._lock:
+            samples = sorted(self._latencies.get(provider, ()))
+        if len(samples) < 5:
+            return self.hedge_default_delay
+        index = min(len(samples) - 1, int(len(samples) * self.hedge_percentile / 100.0))
+        return min(self.hedge_max_delay, max(self.hedge_min_delay, samples[index]))
+
+    def _hedge_candidates(self, regions: Sequence[str]) -> List[Tuple[SearchProvider, str]]:
+        """المزوّدون المتاحون بالترتيب؛ مع مزوّد وحيد يكون الاحتياطي نفسه بمنطقة أخرى"""
+        available = [p for p in self.providers.values() if p.available]
+        candidates = [(p, regions[0]) for p in available]
+        if len(candidates) == 1:
+            candidates += [(available[0], region) for region in regions[1:]]
+        return candidates[:2]
+
+    def search_hedged(self, query: str, n: int = 5, regions: Sequence[str] = ("wt-wt",),
+                      timeout: float = 10.0) -> Tuple[List[Dict[str, str]], str]:
+        """بحث متحوّط: يبدأ بالمزوّد الأول، وإذا لم يجب خلال hedge_delay يُطلق الثاني،
+        وأول نتيجة جيدة تفوز ويُهمل الآخر. يرجع (النتائج، اسم المزوّد الفائز)"""
+        candidates = self._hedge_candidates(regions)
+        if not candidates:
+            return [], "none"
+
+        # الذاكرة المؤقتة أولاً: لا حاجة للتحوّط إذا كانت النتيجة مخزّنة
+        cached = self._from_cache([(p, (p.name, normalize_query(query), region, n)) for p, region in candidates],
+                                  query, timeout)
+        if cached is not None:
+            return cached
+
+        # المزوّدون ذوو القاطع المفتوح يُتخطون؛ إذا كانوا جميعاً معطّلين يفشل الطلب فوراً.
+        # الرفض يُحتسب هنا مرة لكل مزوّد (قد يتكرر المزوّد بمنطقة أخرى) ولا يُحتسب ثانية عند الإطلاق
+        rejected: Dict[str, bool] = {}
+        for p, _ in candidates:
+            if p.name not in rejected:
+                rejected[p.name] = self._breakers[p.name].rejecting(count=True)
+        candidates = [(p, region) for p, region in candidates if not rejected[p.name]]
+        if not candidates:
+            raise CircuitOpenError("all search providers: circuit open")
+
+        with self._lock:
+            self._hedging["requests"] += 1
+        start = time.perf_counter()
+        deadline = start + timeout
+        futures: Dict[Future, SearchProvider] = {}
+
+        def launch(provider: SearchProvider, region: str):
+            self._count(provider.name, "misses")
+            key = (provider.name, normalize_query(query), region, n)
+            futures[self._executor.submit(self._call, provider, key, query, timeout, False)] = provider
+
+        launch(*candidates[0])
+        pending = set(futures)
+        finished = set()
+        hedge_at = start + self.hedge_delay(candidates[0][0].name)
+        last_error: Optional[Exception] = None
+        winner: Optional[Future] = None
+
+        while pending:
+            now = time.perf_counter()
+            hedge_pending = len(futures) < len(candidates)
+            wait_until = min(hedge_at, deadline) if hedge_pending else deadline
+            done, pending = wait(pending, timeout=max(0.0, wait_until - now), return_when=FIRST_COMPLETED)
+            finished |= done
+            for future in done:
+                try:
+                    if future.result():
+                        winner = future
+                        break
+                except Exception as e:
+                    last_error = e
+            if winner is not None:
+                break
+            now = time.perf_counter()
+            # إطلاق الاحتياطي عند تجاوز المهلة أو فشل الأول مبكراً
+            if hedge_pending and (now >= hedge_at or not pending):
+                launch(*candidates[len(futures)])
+                pending = set(futures) - finished
+                with self._lock:
+                    self._hedging["hedged"] += 1
+                continue
+            if now >= deadline:
+                break
+
+        if winner is None:
+            for future in pending:
+                future.cancel()
+            if last_error is not None:
+                raise SearchError(str(last_error))
+            return [], candidates[0][0].name
+
+        winner_provider = futures[winner]
+        winner_elapsed = time.perf_counter() - start
+        self._count(winner_provider.name, "wins")
+        primary = next(iter(futures))
+        for future in futures:
+            if future is winner or future.done() or future.cancel():
+                continue
+            # الطلب الخاسر لا يمكن مقاطعته: تُهمل نتيجته (وتُخزَّن)؛ وإذا كان الأساسي فقد سبقه الاحتياطي
+            # والوقت الموفّر = زمن انتهاء الأساسي - زمن الفائز
+            if future is primary:
+                future.add_done_callback(lambda f: self._record_saving(start, winner_elapsed))
+        return winner.result(), winner_provider.name
+
+    def _record_saving(self, start: float, winner_elapsed: float):
+        """الوقت الموفّر بطلب احتياطي فاز قبل انتهاء الأساسي"""
+        with self._lock:
+            self._hedging["latency_saved_total"] += max(0.0, time.perf_counter() - start - winner_elapsed)
+            self._hedging["latency_saved_count"] += 1
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            stats = {}
+            for name, m in self._metrics.items():
+                lookups = m["hits"] + m["stale_hits"] + m["misses"]
+                stats[name] = {
+                    **{k: v for k, v in m.items() if k != "total_latency"},
+                    "available": self.providers[name].available,
+                    "breaker": self._breakers[name].snapshot(),
+                    "hit_rate": (m["hits"] + m["stale_hits"]) / lookups if lookups else 0.0,
+                    "avg_latency": m["total_latency"] / m["calls"] if m["calls"] else 0.0
+                }
+            hedging = dict(self._hedging)
+        hedging["hedge_rate"] = hedging["hedged"] / hedging["requests"] if hedging["requests"] else 0.0
+        hedging["avg_latency_saved"] = (hedging["latency_saved_total"] / hedging["latency_saved_count"]
+                                        if hedging["latency_saved_count"] else 0.0)
+        hedging["delays"] = {name: self.hedge_delay(name) for name in self.providers}
+        stats["hedging"] = hedging
+        return stats
+
+
+# البحث العالمي
+_global_search: Optional[UnifiedSearch] = None
+_global_lock = threading.Lock()
+
+def get_global_search() -> UnifiedSearch:
+    """البحث الموحّد المشترك: Google CSE (إن ضُبطت مفاتيحه) ثم DuckDuckGo، مع ذاكرة SEARCH_CACHE_DB"""
+    global _global_search
+    with _global_lock:
+        if _global_search is None:
+            _global_search = UnifiedSearch(
+                providers=[GoogleCSEProvider(), DuckDuckGoProvider()],
+                cache=SearchCache(os.environ.get("SEARCH_CACHE_DB", "search_cache.db")),
+                ttl=float(os.environ.get("SEARCH_CACHE_TTL", 6 * 3600)),
+                hedge_percentile=float(os.environ.get("SEARCH_HEDGE_PERCENTILE", "90")),
+                failure_threshold=int(os.environ.get("SEARCH_BREAKER_THRESHOLD", "3")),
+                max_backoff=float(os.environ.get("SEARCH_BREAKER_MAX_BACKOFF", "300"))
+            )
+    return _global_search